@@ -1 +1,9 @@
-# This file makes the app directory a Python package
\ No newline at end of file
+# This file makes the app directory a Python package
+import os
+import sys
+
+# Modules in this directory import each other by name, the way app.py does when
+# Streamlit runs it as a script, so keep them importable as app.<module> as well
+package_dir = os.path.dirname(os.path.abspath(__file__))
+if package_dir not in sys.path:
+    sys.path.append(package_dir)
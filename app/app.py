@@ -1,18 +1,27 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import folium
-from streamlit_folium import folium_static, st_folium
-import geopandas as gpd
 import os
 import sys
 import pickle
+import uuid
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
-from prediction import RentalPricePredictor
+# Only light modules are imported here; pandas, XGBoost, geopandas and folium
+# load on first use or in the background warm-up, so the page shell renders first
+import instrumentation
+import warmup
+from instrumentation import timer
+from model_registry import load_registry
+from intervals import DEFAULT_COVERAGE
+from utilts import format_feature_name
+from model_bundle import MANIFEST_FILE, load_bundle_metadata
+from geometry import (
+    DEFAULT_ZOOM, SIMPLIFICATION_LEVELS, build_region_map,
+    geometry_version, level_for_zoom, load_region_geometry
+)
 
 # Page config
 st.set_page_config(
@@ -49,55 +58,57 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Region mapping
-region_mapping = {
-    'lombardia': 'Lombardia',
-    'piemonte': 'Piemonte',
-    'veneto': 'Veneto',
-    'toscana': 'Toscana',
-    'friuli-venezia-giulia': 'Friuli-Venezia Giulia',
-    'umbria': 'Umbria',
-    'emilia-romagna': 'Emilia-Romagna',
-    'emilia-Romagna': 'Emilia-Romagna',
-    'liguria': 'Liguria',
-    'Liguria': 'Liguria',
-    'trentino-alto-adige': 'Trentino-Alto Adige/Südtirol',
-    'calabria': 'Calabria',
-    'lazio': 'Lazio',
-    'puglia': 'Puglia',
-    'campania': 'Campania',
-    'sicilia': 'Sicilia',
-    'marche': 'Marche',
-    'abruzzo': 'Abruzzo',
-    'molise': 'Molise',
-    'basilicata': 'Basilicata',
-    'sardegna': 'Sardegna',
-    'valle-d-aosta': "Valle d'Aosta/Vallée d'Aoste",
-    
-    # Cities mapped to their regions
-    'milano': 'Lombardia',
-    'torino': 'Piemonte',
-    'genova': 'Liguria',
-    'napoli': 'Campania',
-    'palermo': 'Sicilia',
-    'bari': 'Puglia',
-    'ancona': 'Marche',
-    'catanzaro': 'Calabria',
-    'l-aquila': 'Abruzzo',
-    'trieste': 'Friuli-Venezia Giulia',
-    'venezia': 'Veneto'
-}
-
-# Initialize the predictor
+def build_registry():
+    return load_registry(
+        os.path.join(project_root, 'models'),
+        use_fast_scorer=True, cache_size=1024, cache_ttl=3600
+    )
+
+def build_summary():
+    from rental_store import load_summary
+    return load_summary()
+
+def build_statistics():
+    from price_stats import load_statistics
+    return load_statistics()
+
+def build_comparables():
+    from comparables import load_comparables
+    return load_comparables()
+
+def import_map_libraries():
+    import folium
+    import streamlit_folium
+
+# Start loading everything slow in the background; each resource loads once per process
+def start_warmup():
+    warmup.start('model_registry', build_registry)
+    warmup.start('summary', build_summary)
+    warmup.start('price_statistics', build_statistics)
+    warmup.start('comparables', build_comparables)
+    warmup.start('map_libraries', import_map_libraries)
+    level = level_for_zoom(DEFAULT_ZOOM)
+    warmup.start(f'geometry_{level}', load_region_geometry, level)
+
+# Load the registry of models; it picks up new bundles in models/ by itself
 @st.cache_resource
+def load_model_registry():
+    return warmup.result('model_registry', build_registry)
+
+# Pick this session's predictor by the A/B weights; a session keeps its model
 def load_predictor():
-    model_path = os.path.join(project_root, 'models', 'best_xgb_model.pkl')
-    preprocessor_path = os.path.join(project_root, 'models', 'preprocessor.pkl')
-    return RentalPricePredictor(model_path, preprocessor_path)
+    routing_key = st.session_state.setdefault('routing_key', uuid.uuid4().hex)
+    return load_model_registry().route(routing_key).predictor
 
 # Load confidence metrics
 @st.cache_data
 def load_confidence_metrics():
+    bundle_path = os.path.join(project_root, 'models', 'bundle')
+    if os.path.exists(os.path.join(bundle_path, MANIFEST_FILE)):
+        metadata = load_bundle_metadata(bundle_path)
+        if 'confidence_metrics' in metadata:
+            return metadata['confidence_metrics']
+    
     confidence_path = os.path.join(project_root, 'models', 'confidence_metrics.pkl')
     try:
         with open(confidence_path, 'rb') as f:
@@ -106,64 +117,30 @@ def load_confidence_metrics():
     except:
         return {'confidence_percentage': 82.3}  # Default value based on the model's performance
 
-# Load the regional data for the map
+# Load the incrementally maintained price statistics for drill-downs
+@st.cache_resource
+def load_price_statistics():
+    return warmup.result('price_statistics', build_statistics)
+
+# Load the precomputed regional statistics and region-city index for the map
 @st.cache_data
 def load_map_data():
-    regions_gdf = gpd.read_file(os.path.join(project_root, 'data', 'limits_IT_regions.geojson'))
-    rental_data = pd.read_csv(os.path.join(project_root, 'data', 'italian_rental_processed.csv'))
-    
-    # Standardize region names during loading to avoid repeated operations
-    rental_data['region_standardized'] = rental_data['region'].map(region_mapping)
-    
-    # Pre-compute region-city mapping for faster filtering
-    region_city_map = {}
-    for region in rental_data['region_standardized'].unique():
-        region_city_map[region] = sorted(rental_data[rental_data['region_standardized'] == region]['city'].dropna().unique())
-    
-    region_stats = rental_data.groupby('region_standardized')['price'].agg(['mean', 'median', 'count']).reset_index()
-    region_stats.columns = ['reg_name', 'mean_price', 'median_price', 'property_count']
-    
-    merged_gdf = regions_gdf.merge(
-        region_stats, 
-        left_on='reg_name',
-        right_on='reg_name'
-    )
-    
-    return merged_gdf, rental_data, region_city_map
+    summary = warmup.result('summary', build_summary)
+    region_stats = load_price_statistics().region_table()
+    return region_stats, summary.regions, summary.region_cities
 
-# Create the interactive map
-def create_map(merged_gdf):
-    center = [41.8719, 12.5674]  # Center of Italy
-    m = folium.Map(location=center, zoom_start=6, tiles='CartoDB positron')
-    
-    # Add choropleth layer
-    folium.Choropleth(
-        geo_data=merged_gdf,
-        name='Regional Prices',
-        data=merged_gdf,
-        columns=['reg_name', 'mean_price'],
-        key_on='feature.properties.reg_name',
-        fill_color='YlOrRd',
-        fill_opacity=0.7,
-        line_opacity=0.2,
-        legend_name='Average Rental Price (€)'
-    ).add_to(m)
-    
-    # Add tooltips for regions
-    tooltip = folium.features.GeoJson(
-        merged_gdf,
-        style_function=lambda x: {'fillColor': '#ffffff', 'color': '#000000', 'fillOpacity': 0.1, 'weight': 0.1},
-        control=False,
-        highlight_function=lambda x: {'fillColor': '#000000', 'color': '#000000', 'fillOpacity': 0.50, 'weight': 0.1},
-        tooltip=folium.features.GeoJsonTooltip(
-            fields=['reg_name', 'mean_price', 'median_price', 'property_count'],
-            aliases=['Region', 'Average Price (€)', 'Median Price (€)', 'Number of Properties'],
-            style=("background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;")
-        )
-    )
-    m.add_child(tooltip)
-    
-    return m
+# Load the comparable-listings index, rebuilt when the data changes
+@st.cache_resource
+def load_comparables_index():
+    return warmup.result('comparables', build_comparables)
+
+# Create the interactive map, built once per geometry level and data version.
+# Only the folium Map is cached: st_folium still serializes it to HTML on every
+# rerun, which it needs to report the zoom that picks the geometry level
+@st.cache_resource(max_entries=len(SIMPLIFICATION_LEVELS))
+def create_map(level, region_stats, geometry_key):
+    regions_gdf = warmup.result(f'geometry_{level}', load_region_geometry, level)
+    return build_region_map(regions_gdf, region_stats)
 
 # Make prediction and display results
 def make_prediction(features, predictor, confidence_metrics):
@@ -182,11 +159,65 @@ def make_prediction(features, predictor, confidence_metrics):
         # Display confidence bounds
         st.markdown(f"#### Price Range: €{lower_bound:.2f} - €{upper_bound:.2f}")
         
-        # Confidence percentage
-        confidence_percentage = confidence_metrics.get('confidence_percentage', 82.32)
-        st.markdown(f"#### Prediction Confidence: {confidence_percentage:.1f}%")
+        # Coverage of the calibrated interval, or the global confidence percentage without one
+        if predictor.intervals is not None:
+            st.markdown(f"#### Calibrated so that {DEFAULT_COVERAGE:.0%} of comparable listings in {features.get('region_standardized')} fall in this range")
+        else:
+            confidence_percentage = confidence_metrics.get('confidence_percentage', 82.32)
+            st.markdown(f"#### Prediction Confidence: {confidence_percentage:.1f}%")
         st.markdown('</div>', unsafe_allow_html=True)
-            
+        
+        # Show what moved this estimate up or down, largest effects first
+        explanation = predictor.explain(features)
+        base_price = np.exp(explanation.pop('base_value'))
+        drivers = sorted(explanation.items(), key=lambda item: abs(item[1]), reverse=True)[:5]
+        with st.expander("What drives this estimate"):
+            st.markdown(f"Starting from a typical rent of €{base_price:.0f}:")
+            for feature, contribution in drivers:
+                st.markdown(f"- {format_feature_name(feature)}: {np.exp(contribution) - 1:+.0%}")
+
+        # Price curves and amenity effects, scored as one grid instead of one resubmission each
+        what_if = predictor.what_if(features)
+        with st.expander("What if..."):
+            import pandas as pd
+            area_curve = what_if['curves']['area']
+            st.markdown("**Rent by area**, everything else unchanged")
+            st.line_chart(pd.DataFrame(
+                {'Estimated rent (€)': area_curve['prices']},
+                index=pd.Index(area_curve['values'], name='Area (m²)')
+            ))
+
+            floor_curve = what_if['curves']['floor_to_height_ratio']
+            st.markdown("**Rent by floor**, from the ground floor (0) to the top floor (1)")
+            st.line_chart(pd.DataFrame(
+                {'Estimated rent (€)': floor_curve['prices']},
+                index=pd.Index(floor_curve['values'], name='Floor / total floors')
+            ))
+
+            st.markdown("**What each amenity adds to the rent**")
+            effects = what_if['amenities']
+            st.bar_chart(pd.Series(
+                {format_feature_name(amenity): effect['delta'] for amenity, effect in effects.items()},
+                name='Effect on rent (€)'
+            ))
+            for amenity, effect in sorted(effects.items(), key=lambda item: -item[1]['delta']):
+                if not effect['has'] and effect['delta'] > 0:
+                    st.markdown(f"- With {format_feature_name(amenity).replace('Has ', '').lower()}: €{effect['with']:.0f} ({effect['delta']:+.0f})")
+
+        # The most similar real listings, from the comparables index
+        try:
+            comparables = load_comparables_index().nearest(features)
+        except Exception as e:
+            comparables = []
+            st.info(f"Similar listings are unavailable: {e}")
+        if comparables:
+            with st.expander("Similar listings"):
+                import pandas as pd
+                table = pd.DataFrame(comparables).drop(columns=['distance'])
+                table = table.rename(columns={'region_standardized': 'region'})
+                table.columns = [format_feature_name(column) for column in table.columns]
+                st.dataframe(table, hide_index=True)
+
     except Exception as e:
         st.error(f"Error making prediction: {str(e)}")
         
@@ -197,16 +228,8 @@ def make_prediction(features, predictor, confidence_metrics):
 
 # Main app 
 def main():
-    # Load the model and confidence metrics
-    try:
-        predictor = load_predictor()
-        confidence_metrics = load_confidence_metrics()
-        model_loaded = True
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        model_loaded = False
-        predictor = None
-        confidence_metrics = None
+    # The predictor and map data load while the page shell renders
+    start_warmup()
 
     # App title and description
     st.markdown('<div class="main-header">🏠 Rentelligence AI</div>', unsafe_allow_html=True)
@@ -223,12 +246,13 @@ def main():
 
     # Load map data once for both columns
     try:
-        merged_gdf, rental_data, region_city_map = load_map_data()
+        with timer('data_load'):
+            region_stats, regions, region_city_map = load_map_data()
         data_loaded = True
     except Exception as e:
         st.error(f"Error loading data: {e}")
         data_loaded = False
-        merged_gdf, rental_data, region_city_map = None, None, {}
+        region_stats, regions, region_city_map = None, [], {}
 
     # Map column
     with col1:
@@ -236,8 +260,25 @@ def main():
         
         if data_loaded:
             try:
-                m = create_map(merged_gdf)
-                st_folium(m, width=700)
+                # Use the geometry detail that suits the zoom the user last left the map at
+                zoom = st.session_state.get('map_zoom', DEFAULT_ZOOM)
+                center = st.session_state.get('map_center')
+                level = level_for_zoom(zoom)
+                with timer('map_build'):
+                    m = create_map(level, region_stats, geometry_version())
+                from streamlit_folium import st_folium
+                with timer('map_render'):
+                    map_state = st_folium(
+                        m, width=700, key='region_map', zoom=zoom, center=center,
+                        returned_objects=['zoom', 'center']
+                    )
+                
+                if map_state and map_state.get('zoom'):
+                    st.session_state['map_zoom'] = map_state['zoom']
+                    if map_state.get('center'):
+                        st.session_state['map_center'] = (map_state['center']['lat'], map_state['center']['lng'])
+                    if level_for_zoom(map_state['zoom']) != level:
+                        st.rerun()
                 
                 # Map instructions
                 st.info("👆 Click on a region to see average rental prices and property counts.")
@@ -251,13 +292,9 @@ def main():
         st.markdown('<div class="sub-header">Property Details</div>', unsafe_allow_html=True)
         st.markdown('<div class="info-text">Enter the details of the property to get a price prediction.</div>', unsafe_allow_html=True)
         
-        # Get unique regions and cities from the data for the dropdown
-        if data_loaded:
-            regions = sorted(rental_data['region_standardized'].dropna().unique())
-            all_cities = sorted(rental_data['city'].dropna().unique())
-        else:
+        # Fall back to a default list of regions when the data is unavailable
+        if not data_loaded:
             regions = ["Lombardia", "Lazio", "Toscana", "Veneto", "Piemonte", "Emilia-Romagna", "Campania", "Sicilia"]
-            all_cities = ["Milano", "Roma", "Firenze", "Venezia", "Torino", "Bologna", "Napoli", "Palermo"]
         
         # Location selection outside the form for dynamic filtering
         st.markdown("#### Location")
@@ -317,34 +354,45 @@ def main():
             submitted = st.form_submit_button("Predict Rental Price")
         
         # Make prediction when form is submitted
-        if submitted and model_loaded:
+        if submitted:
             with st.spinner("Calculating your rental price estimate..."):
-                features = {
-                    'area': area,
-                    'log_area': log_area,
-                    'bathrooms': bathrooms,
-                    'num_bedrooms': num_bedrooms,
-                    'floor': current_floor,
-                    'total_floors': total_floors,
-                    'floor_to_height_ratio': floor_to_height_ratio,
-                    'parking_spaces': parking_spaces,
-                    'has_elevator': int(has_elevator),
-                    'has_doorman': int(has_doorman),
-                    'has_balcony': int(has_balcony),
-                    'has_external_exposure': int(has_external_exposure),
-                    'has_furnished': int(has_furnished),
-                    'has_terrace': int(has_terrace),
-                    'has_garden': int(has_garden),
-                    'has_air_conditioning': int(has_air_conditioning),
-                    'has_storage_room': int(has_storage_room),
-                    'has_cellar': int(has_cellar),
-                    'region': region,
-                    'region_standardized': region,
-                    'city': city
-                }
+                # Usually loaded by now; waits for the warm-up otherwise
+                try:
+                    predictor = load_predictor()
+                    confidence_metrics = load_confidence_metrics()
+                    model_loaded = True
+                except Exception as e:
+                    st.error(f"Error loading model: {e}")
+                    model_loaded = False
                 
-                # Get prediction
-                make_prediction(features, predictor, confidence_metrics)
+                if model_loaded:
+                    features = {
+                        'area': area,
+                        'log_area': log_area,
+                        'bathrooms': bathrooms,
+                        'num_bedrooms': num_bedrooms,
+                        'floor': current_floor,
+                        'total_floors': total_floors,
+                        'floor_to_height_ratio': floor_to_height_ratio,
+                        'parking_spaces': parking_spaces,
+                        'has_elevator': int(has_elevator),
+                        'has_doorman': int(has_doorman),
+                        'has_balcony': int(has_balcony),
+                        'has_external_exposure': int(has_external_exposure),
+                        'has_furnished': int(has_furnished),
+                        'has_terrace': int(has_terrace),
+                        'has_garden': int(has_garden),
+                        'has_air_conditioning': int(has_air_conditioning),
+                        'has_storage_room': int(has_storage_room),
+                        'has_cellar': int(has_cellar),
+                        'region': region,
+                        'region_standardized': region,
+                        'city': city
+                    }
+                
+                    # Get prediction
+                    with timer('prediction'):
+                        make_prediction(features, predictor, confidence_metrics)
 
     # Add model information section
     with st.expander("About this Model"):
@@ -368,6 +416,14 @@ def main():
         The more details you provide, the smarter our prediction will be!
         """)
 
+    # Stage timings, when instrumentation is enabled
+    if instrumentation.registry.enabled:
+        with st.expander("Performance"):
+            import pandas as pd
+            snapshot = instrumentation.registry.snapshot()
+            st.dataframe(pd.DataFrame(snapshot['latency_seconds']).T)
+            st.json(snapshot['counters'])
+
     # Add footer
     st.markdown("---")
     st.markdown("© 2025 Rentelligence AI")
@@ -0,0 +1,355 @@
+"""
+Comparable listings: the real listings most similar to a query.
+
+Every listing of the rental store is a point of scaled, weighted numeric and
+amenity features. The points are sorted by region and then city, so every
+city and every region is one contiguous block of rows. A query searches the
+block of its city, or of its region when the city has fewer than k listings,
+or every listing when the region is unknown, with a KD-tree over that block
+built on its first query.
+
+The sorted points and the listing columns shown next to a prediction are
+persisted to an .npz file (no pickle) tagged with the version of the data
+they were built from; load_comparables rebuilds the file when the rental
+store changes.
+
+Build the index with:
+    python -m app.comparables
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+COMPARABLES_PATH = os.path.join(project_root, 'data', 'italian_rental_comparables.npz')
+
+COMPARABLES_FORMAT_VERSION = 1
+
+DEFAULT_K = 5
+
+# Most comparables a single query may ask for
+MAX_K = 100
+
+# Features that place a listing, with their weight in the distance; area
+# matters most, and each amenity counts half as much as a numeric feature
+FEATURE_WEIGHTS = {
+    'log_area': 2.0, 'bathrooms': 1.0, 'floor_to_height_ratio': 1.0,
+    'total_floors': 0.5, 'parking_spaces': 0.5,
+}
+AMENITIES = [
+    'has_elevator', 'has_doorman', 'has_balcony', 'has_external_exposure', 'has_furnished',
+    'has_terrace', 'has_garden', 'has_air_conditioning', 'has_storage_room', 'has_cellar',
+]
+AMENITY_WEIGHT = 0.5
+
+# Listing columns returned with each comparable, when the data has them
+LISTING_COLUMNS = ['price', 'area', 'bathrooms', 'floor', 'total_floors', 'parking_spaces'] + AMENITIES
+
+# Points per KD-tree leaf
+LEAF_SIZE = 16
+
+def record_value(record, feature):
+    """
+    Return one feature of a feature dict; absent amenities are 0, other
+    absent features are missing.
+    """
+    if feature == 'log_area' and 'log_area' not in record and record.get('area') is not None:
+        return np.log1p(record['area'])
+    value = record.get(feature)
+    if value is None:
+        return 0 if feature in AMENITIES else np.nan
+    return value
+
+class ComparablesIndex:
+    """
+    Nearest-neighbour search over the listings, partitioned by region and city.
+    """
+    def __init__(self, points, columns, regions, cities, region_codes, city_codes,
+                 features, means, scales, weights, version=None):
+        self.points = points
+        self.columns = columns
+        self.regions = list(regions)
+        self.cities = list(cities)
+        self.region_codes = region_codes
+        self.city_codes = city_codes
+        self.features = list(features)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.version = version
+
+        # Block of rows of every region and every (region, city); rows are sorted by both codes
+        self.blocks = {}
+        pairs = region_codes.astype(np.int64) * len(self.cities) + city_codes
+        starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]]) if len(pairs) else np.zeros(0, dtype=np.int64)
+        stops = np.r_[starts[1:], len(pairs)]
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            region, city = self.regions[region_codes[start]], self.cities[city_codes[start]]
+            self.blocks[(region, city)] = (start, stop)
+            region_start, _ = self.blocks.get((region,), (start, stop))
+            self.blocks[(region,)] = (region_start, stop)
+
+        self._trees = {}
+        self._trees_lock = threading.Lock()
+
+    @classmethod
+    def from_listings(cls, listings, version=None):
+        """
+        Build the index from a DataFrame of listings with region_standardized and city.
+        """
+        from score import derive_features
+
+        listings = derive_features(listings.dropna(subset=['region_standardized', 'city', 'price']).copy())
+        region = listings['region_standardized'].astype(str).astype('category')
+        city = listings['city'].astype(str).astype('category')
+        region_codes = region.cat.codes.to_numpy(dtype=np.int32)
+        city_codes = city.cat.codes.to_numpy(dtype=np.int32)
+        # Sorted by region, then city, so each of them is a contiguous block of rows
+        order = np.lexsort((city_codes, region_codes))
+
+        features = [feature for feature in FEATURE_WEIGHTS if feature in listings.columns]
+        features += [amenity for amenity in AMENITIES if amenity in listings.columns]
+        values = listings[features].to_numpy(dtype=np.float64)[order]
+        means = np.nanmean(values, axis=0) if len(values) else np.zeros(len(features))
+        scales = np.nanstd(values, axis=0) if len(values) else np.ones(len(features))
+        scales[~(scales > 0)] = 1.0
+        weights = [FEATURE_WEIGHTS.get(feature, AMENITY_WEIGHT) for feature in features]
+
+        columns = {
+            column: listings[column].to_numpy(dtype=np.float32)[order]
+            for column in LISTING_COLUMNS if column in listings.columns
+        }
+
+        index = cls(
+            np.empty((0, len(features)), dtype=np.float32), columns,
+            region.cat.categories, city.cat.categories, region_codes[order], city_codes[order],
+            features, means, scales, weights, version
+        )
+        index.points = index.scale(values)
+        return index
+
+    def scale(self, values):
+        """
+        Map raw feature values to index space; missing values sit at the mean.
+        """
+        scaled = (values - self.means) / self.scales * self.weights
+        return np.nan_to_num(scaled, nan=0.0).astype(np.float32)
+
+    def query_values(self, records):
+        """
+        Return the raw feature values of a list of feature dicts or a DataFrame.
+
+        Like the app form, log_area is derived from area when only area is given.
+        """
+        values = np.empty((len(records), len(self.features)), dtype=np.float64)
+        for i, feature in enumerate(self.features):
+            if isinstance(records, list):
+                values[:, i] = [record_value(record, feature) for record in records]
+            elif feature in records.columns:
+                values[:, i] = records[feature].to_numpy(dtype=np.float64)
+            elif feature == 'log_area' and 'area' in records.columns:
+                values[:, i] = np.log1p(records['area'].to_numpy(dtype=np.float64))
+            else:
+                values[:, i] = 0 if feature in AMENITIES else np.nan
+        return values
+
+    def block(self, region, city, k):
+        """
+        Return the rows to search for a listing: its city, else its region, else all.
+        """
+        for key in ((region, city), (region,)):
+            block = self.blocks.get(key)
+            if block is not None and block[1] - block[0] >= k:
+                return block
+        return 0, len(self.points)
+
+    def tree(self, block):
+        """
+        Return the KD-tree of a block of rows, building it on first use.
+        """
+        tree = self._trees.get(block)
+        if tree is None:
+            from scipy.spatial import cKDTree
+
+            with self._trees_lock:
+                tree = self._trees.get(block)
+                if tree is None:
+                    start, stop = block
+                    tree = cKDTree(self.points[start:stop], leafsize=LEAF_SIZE, balanced_tree=False)
+                    self._trees[block] = tree
+        return tree
+
+    def query(self, records, k=DEFAULT_K):
+        """
+        Find the k nearest listings of every query.
+
+        Queries are grouped by the block they search, with one tree query per
+        block. Returns two (n, k) arrays: the rows of the comparables, -1
+        where there are fewer than k listings in all, and their distances.
+        """
+        n_rows = len(records)
+        rows = np.full((n_rows, k), -1, dtype=np.int64)
+        distances = np.full((n_rows, k), np.inf, dtype=np.float64)
+        if n_rows == 0 or len(self.points) == 0:
+            return rows, distances
+
+        points = self.scale(self.query_values(records))
+        if isinstance(records, list):
+            keys = [(record.get('region_standardized'), record.get('city')) for record in records]
+        else:
+            regions = records['region_standardized'] if 'region_standardized' in records.columns else [None] * n_rows
+            cities = records['city'] if 'city' in records.columns else [None] * n_rows
+            keys = list(zip(regions, cities))
+
+        groups = {}
+        for i, (region, city) in enumerate(keys):
+            groups.setdefault(self.block(region, city, k), []).append(i)
+
+        for block, members in groups.items():
+            members = np.asarray(members)
+            found = min(k, block[1] - block[0])
+            block_distances, block_rows = self.tree(block).query(points[members], k=found)
+            if found == 1:
+                block_distances, block_rows = block_distances[:, None], block_rows[:, None]
+            rows[members, :found] = block_rows + block[0]
+            distances[members, :found] = block_distances
+        return rows, distances
+
+    def listing(self, row):
+        listing = {
+            'region_standardized': self.regions[self.region_codes[row]],
+            'city': self.cities[self.city_codes[row]],
+        }
+        for column, values in self.columns.items():
+            listing[column] = values[row].item()
+        return listing
+
+    def nearest(self, features, k=DEFAULT_K):
+        """
+        Return the k listings most similar to one feature dict, nearest first,
+        each with its distance.
+        """
+        return self.nearest_each([features], k)[0]
+
+    def nearest_each(self, records, k=DEFAULT_K):
+        """
+        Return the comparables of every feature dict in a list, as nearest
+        would, searched with one tree query per block.
+        """
+        rows, distances = self.query(records, k)
+        return [
+            [dict(self.listing(row), distance=distance) for row, distance in zip(query_rows, query_distances) if row >= 0]
+            for query_rows, query_distances in zip(rows.tolist(), distances.tolist())
+        ]
+
+    def nearest_batch(self, features, k=DEFAULT_K):
+        """
+        Find the comparables of every listing in a batch.
+
+        Accepts a DataFrame or a list of feature dicts. Returns a DataFrame
+        with one row per (query, comparable) pair: the query's position,
+        the comparable's rank (0 is nearest), its distance and its columns.
+        """
+        import pandas as pd
+
+        rows, distances = self.query(features, k)
+        query, rank = np.nonzero(rows >= 0)
+        found = rows[query, rank]
+        comparables = {
+            'query': query,
+            'rank': rank,
+            'distance': distances[query, rank],
+            'region_standardized': np.asarray(self.regions, dtype=object)[self.region_codes[found]],
+            'city': np.asarray(self.cities, dtype=object)[self.city_codes[found]],
+        }
+        for column, values in self.columns.items():
+            comparables[column] = values[found]
+        return pd.DataFrame(comparables)
+
+    def save(self, path=COMPARABLES_PATH):
+        """
+        Write the index to a NumPy .npz file (no pickle).
+        """
+        metadata = {
+            'format_version': COMPARABLES_FORMAT_VERSION,
+            'version': self.version,
+            'features': self.features,
+            'regions': self.regions,
+            'cities': self.cities,
+            'columns': list(self.columns),
+        }
+        temporary_path = path + '.tmp.npz'
+        np.savez(
+            temporary_path,
+            metadata=np.array(json.dumps(metadata, ensure_ascii=False)),
+            points=self.points, region_codes=self.region_codes, city_codes=self.city_codes,
+            means=self.means, scales=self.scales, weights=self.weights,
+            **{f'column_{column}': values for column, values in self.columns.items()}
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path=COMPARABLES_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != COMPARABLES_FORMAT_VERSION:
+                raise ValueError(f"Unsupported comparables format version: {metadata.get('format_version')}")
+            columns = {column: data[f'column_{column}'] for column in metadata['columns']}
+            return cls(
+                data['points'], columns, metadata['regions'], metadata['cities'],
+                data['region_codes'], data['city_codes'], metadata['features'],
+                data['means'], data['scales'], data['weights'], metadata['version']
+            )
+
+def build_comparables():
+    """
+    Build the index from the rental store, tagged with the store's data version.
+    """
+    from rental_store import load_rows, load_summary
+
+    return ComparablesIndex.from_listings(load_rows(), version=load_summary().version)
+
+def load_comparables(path=COMPARABLES_PATH):
+    """
+    Load the saved index, rebuilding and saving it if it is missing or was
+    built from another version of the data.
+    """
+    from rental_store import load_summary
+
+    version = load_summary().version
+    if os.path.exists(path):
+        index = ComparablesIndex.load(path)
+        if index.version == version:
+            return index
+        logger.warning(f"{path} was built from data version {index.version}, rebuilding for {version}")
+    else:
+        logger.warning(f"{path} not found, building the comparables index")
+
+    index = build_comparables()
+    index.save(path)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the comparable listings index.")
+    parser.add_argument('--output', default=COMPARABLES_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_comparables()
+    index.save(args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Indexed {len(index.points)} listings on {len(index.features)} features in {elapsed:.1f}s "
+          f"(data version {index.version})")
+    print(f"  {args.output}: {os.path.getsize(args.output) / 1e6:.1f} MB, "
+          f"{sum(1 for key in index.blocks if len(key) == 2)} cities in {len(index.regions)} regions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+"""
+Input and prediction drift monitoring against a training reference profile.
+
+A DriftProfile fixes, for every model feature and for the predictions, the
+bins a value can fall in: quantile bins of the training values (plus one for
+missing values) for numeric features and the log predicted price, 0/1 for
+the binary features, the model's vocabulary plus an unseen bucket for the
+categoricals, and below / within / above the typical price range. It also
+holds the share of the training rows in every bin.
+
+A DriftMonitor counts live values into the same bins, all held in one flat
+int64 array, so memory is fixed whatever the traffic, an observation costs a
+few microseconds, and monitors of different workers merge by adding their
+exported snapshots. PSI and binned KS scores are computed from the counts on
+demand, in one pass over the bins.
+
+The profile of a bundle is saved as drift_profile.npz in the bundle (no
+pickle) by the trainer, or built for an existing bundle with:
+    python -m app.drift profile --bundle models/bundle --data data/italian_rental.parquet
+
+Merge the snapshots exported by several workers into one report with:
+    python -m app.drift report worker1.json worker2.json --profile models/bundle/drift_profile.npz
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import math
+import os
+import threading
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+DRIFT_PROFILE_FILE = 'drift_profile.npz'
+DRIFT_PROFILE_FORMAT_VERSION = 1
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Quantiles of the training values that bound the numeric bins (5% steps)
+PROFILE_QUANTILES = np.linspace(0, 1, 21)[1:-1]
+
+# Training rows a profile is built from
+PROFILE_ROWS = 100000
+
+# Predicted rents outside this range, in €, are flagged as unusual in the app
+TYPICAL_PRICE_RANGE = (200, 10000)
+
+# Pseudo-features tracking the predictions
+PREDICTION = 'predicted_log_price'
+PRICE_RANGE = 'price_range'
+
+# Bin share substituted for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+# Conventional PSI levels of moderate and significant drift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Observations needed before drift is reported
+MIN_OBSERVATIONS = 500
+
+# Most common categories of the reference scored on their own; the rest share one bin
+CATEGORY_PSI_BINS = 20
+
+# Pending bins of single observations a monitor adds to its counts at once
+FLUSH_BINS = 8192
+
+def feature_values(features, name, default, n_rows):
+    """
+    Return one feature of a batch as a list or array, filling default where absent.
+
+    Accepts the batch forms of predict_batch: a DataFrame, a mapping of
+    column names to arrays, or a list of feature dicts.
+    """
+    if isinstance(features, list):
+        return [record.get(name, default) for record in features]
+    if name in features:
+        values = features[name]
+        return values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+    return np.full(n_rows, default, dtype=object if isinstance(default, str) else np.float64)
+
+class DriftProfile:
+    """
+    Bin layout of the monitored features and the training share of every bin.
+    """
+    def __init__(self, numeric_edges, binary_features, categories, rare_amenities,
+                 reference=None, model_version=None):
+        """
+        numeric_edges maps each numeric feature, and PREDICTION, to its
+        sorted interior bin edges; categories maps each categorical feature
+        to its vocabulary. reference holds the training counts of every bin.
+        """
+        self.numeric_edges = {name: [float(edge) for edge in edges] for name, edges in numeric_edges.items()}
+        self.binary_features = list(binary_features)
+        self.categories = {name: [str(value) for value in values] for name, values in categories.items()}
+        self.rare_amenities = list(rare_amenities)
+        self.model_version = model_version
+
+        # Bins are laid out feature after feature in one flat array
+        self.slices = {}
+        size = 0
+        for name, edges in self.numeric_edges.items():
+            # Value bins, then the missing-value bin
+            self.slices[name] = slice(size, size + len(edges) + 2)
+            size += len(edges) + 2
+        for name in self.binary_features:
+            self.slices[name] = slice(size, size + 2)
+            size += 2
+        self.category_index = {}
+        for name, values in self.categories.items():
+            # Vocabulary bins, then the unseen-value bin
+            self.category_index[name] = {value: size + i for i, value in enumerate(values)}
+            self.slices[name] = slice(size, size + len(values) + 1)
+            size += len(values) + 1
+        self.slices[PRICE_RANGE] = slice(size, size + 3)
+        size += 3
+        self.size = size
+
+        self.reference = np.zeros(size, dtype=np.int64) if reference is None else np.asarray(reference, dtype=np.int64)
+        if len(self.reference) != size:
+            raise ValueError(f"Reference has {len(self.reference)} bins, the layout {size}")
+
+        self.digest = hashlib.sha256(json.dumps(
+            [self.numeric_edges, self.binary_features, self.categories, self.rare_amenities]
+        ).encode('utf-8')).hexdigest()[:12]
+
+        # Flattened layout for the per-record path
+        self._numeric = [
+            (name, self.numeric_edges[name], self.slices[name].start, self.slices[name].stop - 1)
+            for name in self.numeric_edges if name != PREDICTION
+        ]
+        self._binary = [(name, self.slices[name].start) for name in self.binary_features]
+        self._categorical = [
+            (name, self.category_index[name], self.slices[name].stop - 1) for name in self.categories
+        ]
+        self._log_price_range = (math.log(TYPICAL_PRICE_RANGE[0]), math.log(TYPICAL_PRICE_RANGE[1]))
+
+    def record_bins(self, features, prediction):
+        """
+        Return the bin of every monitored value of one feature dict and its prediction.
+        """
+        bins = []
+        for name, edges, start, missing in self._numeric:
+            if name == 'luxury_score':
+                value = sum(1 for amenity in self.rare_amenities if features.get(amenity) == 1)
+            else:
+                value = features.get(name, 0)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                # Like pd.to_numeric in batch_bins, unreadable values count as missing
+                value = math.nan
+            bins.append(missing if value != value else start + bisect.bisect_right(edges, value))
+        for name, start in self._binary:
+            bins.append(start + (features.get(name, 0) == 1))
+        for name, index, unseen in self._categorical:
+            bins.append(index.get(features.get(name, "unknown"), unseen))
+
+        edges = self.numeric_edges[PREDICTION]
+        prediction_slice = self.slices[PREDICTION]
+        range_start = self.slices[PRICE_RANGE].start
+        if prediction > 0:
+            log_price = math.log(prediction)
+            bins.append(prediction_slice.start + bisect.bisect_right(edges, log_price))
+            low, high = self._log_price_range
+            bins.append(range_start + (0 if log_price < low else 2 if log_price > high else 1))
+        else:
+            bins.append(prediction_slice.stop - 1)
+            bins.append(range_start)
+        return bins
+
+    def batch_bins(self, features, predictions):
+        """
+        Return the bins of a batch of listings and their predictions as one flat array.
+        """
+        import pandas as pd
+
+        predictions = np.asarray(predictions, dtype=np.float64)
+        n_rows = len(predictions)
+        bins = []
+        for name, edges, start, missing in self._numeric:
+            if name == 'luxury_score':
+                values = np.zeros(n_rows)
+                for amenity in self.rare_amenities:
+                    values += np.asarray(feature_values(features, amenity, 0, n_rows), dtype=object) == 1
+            else:
+                values = pd.to_numeric(pd.Series(feature_values(features, name, 0, n_rows)), errors='coerce').to_numpy(dtype=np.float64)
+            column = start + np.searchsorted(edges, values, side='right')
+            bins.append(np.where(np.isnan(values), missing, column))
+        for name, start in self._binary:
+            values = np.asarray(feature_values(features, name, 0, n_rows), dtype=object)
+            bins.append(start + (values == 1))
+        for name, index, unseen in self._categorical:
+            values = feature_values(features, name, "unknown", n_rows)
+            bins.append(np.fromiter((index.get(value, unseen) for value in values), dtype=np.int64, count=n_rows))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_prices = np.log(predictions)
+        valid = predictions > 0
+        prediction_slice = self.slices[PREDICTION]
+        bins.append(np.where(valid, prediction_slice.start + np.searchsorted(self.numeric_edges[PREDICTION], log_prices, side='right'),
+                             prediction_slice.stop - 1))
+        low, high = self._log_price_range
+        bins.append(self.slices[PRICE_RANGE].start + np.where(valid, (log_prices >= low).astype(np.int64) + (log_prices > high), 0))
+        return np.concatenate(bins).astype(np.int64)
+
+    def single_bin_features(self):
+        """
+        Return the numeric features whose training values all fell in one bin.
+
+        Drift in such a feature cannot be detected, which is expected for a
+        feature that is constant in the training data and a sign of a broken
+        sample otherwise.
+        """
+        return [
+            name for name in self.numeric_edges
+            if np.count_nonzero(self.reference[self.slices[name]]) <= 1
+        ]
+
+    def save(self, path):
+        """
+        Write the profile to a NumPy .npz file (no pickle).
+        """
+        metadata = {
+            'format_version': DRIFT_PROFILE_FORMAT_VERSION,
+            'model_version': self.model_version,
+            'numeric_edges': self.numeric_edges,
+            'binary_features': self.binary_features,
+            'categories': self.categories,
+            'rare_amenities': self.rare_amenities,
+        }
+        temporary_path = path + '.tmp.npz'
+        np.savez(temporary_path, metadata=np.array(json.dumps(metadata, ensure_ascii=False)), reference=self.reference)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != DRIFT_PROFILE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported drift profile format version: {metadata.get('format_version')}")
+            return cls(
+                metadata['numeric_edges'], metadata['binary_features'], metadata['categories'],
+                metadata['rare_amenities'], data['reference'], metadata['model_version']
+            )
+
+def psi(counts, reference):
+    """
+    Population stability index of live bin counts against reference counts.
+    """
+    actual = np.maximum(counts / max(counts.sum(), 1), PSI_EPSILON)
+    expected = np.maximum(reference / max(reference.sum(), 1), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def binned_ks(counts, reference):
+    """
+    Largest gap between the live and reference CDFs at the bin edges.
+
+    A lower bound of the KS statistic of the raw values, exact at the edges.
+    """
+    if counts.sum() == 0 or reference.sum() == 0:
+        return None
+    return float(np.max(np.abs(np.cumsum(counts) / counts.sum() - np.cumsum(reference) / reference.sum())))
+
+def collapse_categories(counts, reference, top=CATEGORY_PSI_BINS):
+    """
+    Merge the category bins outside the top most common of the reference into one.
+
+    With thousands of categories most bins are nearly empty at any traffic
+    level and PSI would flag sampling noise; the unseen bin stays apart.
+    """
+    if len(reference) - 1 <= top:
+        return counts, reference
+    order = np.argsort(reference[:-1], kind='stable')[::-1]
+    kept, rest = order[:top], order[top:]
+    return (
+        np.concatenate([counts[kept], [counts[rest].sum(), counts[-1]]]),
+        np.concatenate([reference[kept], [reference[rest].sum(), reference[-1]]]),
+    )
+
+def drift_status(score, observations):
+    if observations < MIN_OBSERVATIONS:
+        return 'insufficient data'
+    if score >= PSI_SIGNIFICANT:
+        return 'drift'
+    if score >= PSI_MODERATE:
+        return 'warning'
+    return 'ok'
+
+class DriftMonitor:
+    """
+    Fixed-memory counts of the live values of every monitored feature.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+        self.counts = np.zeros(profile.size, dtype=np.int64)
+        self.observations = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+        # Bins of single observations not yet added to counts
+        self._pending = []
+
+    def _flush(self):
+        # Called with the lock held
+        if self._pending:
+            self.counts += np.bincount(self._pending, minlength=self.profile.size)
+            self._pending = []
+
+    def observe(self, features, prediction):
+        """
+        Count one feature dict and its predicted price.
+
+        The bins are appended to a plain list and added to counts in bulk,
+        which is cheaper than indexing the array once per observation.
+        """
+        try:
+            bins = self.profile.record_bins(features, prediction)
+        except (TypeError, ValueError):
+            # A listing the monitor cannot bin must never fail its prediction
+            self.errors += 1
+            return
+        with self._lock:
+            self._pending.extend(bins)
+            self.observations += 1
+            if len(self._pending) >= FLUSH_BINS:
+                self._flush()
+
+    def observe_batch(self, features, predictions):
+        """
+        Count a batch accepted by predict_batch and its predicted prices.
+
+        Lists of feature dicts, the service's micro-batches, go through the
+        per-record path; DataFrames and column mappings are binned a column
+        at a time.
+        """
+        if isinstance(features, list):
+            for record, prediction in zip(features, np.asarray(predictions, dtype=np.float64).tolist()):
+                self.observe(record, prediction)
+            return
+        try:
+            bins = self.profile.batch_bins(features, predictions)
+        except (TypeError, ValueError):
+            self.errors += len(predictions)
+            return
+        added = np.bincount(bins, minlength=self.profile.size)
+        with self._lock:
+            self.counts += added
+            self.observations += len(predictions)
+
+    def reset(self):
+        with self._lock:
+            self.counts[:] = 0
+            self._pending = []
+            self.observations = 0
+            self.errors = 0
+
+    def snapshot(self):
+        """
+        Export the counts as a JSON-ready dict that merge() accepts.
+        """
+        with self._lock:
+            self._flush()
+            return {
+                'format_version': SNAPSHOT_FORMAT_VERSION,
+                'profile': self.profile.digest,
+                'model_version': self.profile.model_version,
+                'observations': self.observations,
+                'errors': self.errors,
+                'counts': self.counts.tolist(),
+            }
+
+    def merge(self, snapshot):
+        """
+        Add the counts of a snapshot, e.g. from another worker, to this monitor.
+        """
+        if snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported drift snapshot format version: {snapshot.get('format_version')}")
+        if snapshot.get('profile') != self.profile.digest:
+            raise ValueError(f"Snapshot was taken with profile {snapshot.get('profile')}, not {self.profile.digest}")
+        counts = np.asarray(snapshot['counts'], dtype=np.int64)
+        with self._lock:
+            self.counts += counts
+            self.observations += int(snapshot['observations'])
+            self.errors += int(snapshot.get('errors', 0))
+
+    def report(self):
+        """
+        Score every monitored feature against the reference profile.
+
+        Numeric features get PSI over the value bins, the binned KS
+        statistic and the share of missing values; categoricals get PSI over
+        their most common categories and the share of values outside the
+        model's vocabulary, which the model encodes as unknown.
+        """
+        profile = self.profile
+        with self._lock:
+            self._flush()
+            counts = self.counts.copy()
+            observations = self.observations
+
+        features = {}
+        for name, bins in profile.slices.items():
+            live, reference = counts[bins], profile.reference[bins]
+            if name in profile.categories:
+                entry = {'psi': psi(*collapse_categories(live, reference))}
+            else:
+                entry = {'psi': psi(live, reference)}
+            if name in profile.numeric_edges:
+                entry['ks'] = binned_ks(live[:-1], reference[:-1])
+                entry['missing_share'] = float(live[-1] / max(live.sum(), 1))
+            elif name in profile.categories:
+                entry['unseen_share'] = float(live[-1] / max(live.sum(), 1))
+                entry['reference_unseen_share'] = float(reference[-1] / max(reference.sum(), 1))
+            elif name == PRICE_RANGE:
+                entry['out_of_range_share'] = float((live[0] + live[2]) / max(live.sum(), 1))
+                entry['reference_out_of_range_share'] = float((reference[0] + reference[2]) / max(reference.sum(), 1))
+            entry['status'] = drift_status(entry['psi'], observations)
+            features[name] = entry
+
+        drifted = sorted(name for name, entry in features.items() if entry['status'] == 'drift')
+        return {
+            'model_version': profile.model_version,
+            'profile': profile.digest,
+            'observations': observations,
+            'errors': self.errors,
+            'status': 'insufficient data' if observations < MIN_OBSERVATIONS else ('drift' if drifted else 'ok'),
+            'drifted': drifted,
+            'features': features,
+        }
+
+def build_profile(predictor, features, predictions=None):
+    """
+    Build the reference profile of a predictor's model from a sample of its training rows.
+
+    features is a batch accepted by predict_batch; predictions default to
+    the predictor's own.
+    """
+    import pandas as pd
+
+    if predictions is None:
+        predictions = predictor.predict_batch(features)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    n_rows = len(predictions)
+    if n_rows == 0:
+        raise ValueError("Need at least one listing to build a drift profile")
+
+    def quantile_edges(values):
+        values = values[~np.isnan(values)]
+        return np.unique(np.quantile(values, PROFILE_QUANTILES)) if len(values) else np.empty(0)
+
+    numeric_edges = {}
+    for name in predictor.numeric_features:
+        if name == 'luxury_score':
+            values = np.zeros(n_rows)
+            for amenity in predictor.rare_amenities:
+                values += np.asarray(feature_values(features, amenity, 0, n_rows), dtype=object) == 1
+        else:
+            values = pd.to_numeric(pd.Series(feature_values(features, name, 0, n_rows)), errors='coerce').to_numpy(dtype=np.float64)
+        numeric_edges[name] = quantile_edges(values)
+    with np.errstate(divide='ignore'):
+        numeric_edges[PREDICTION] = quantile_edges(np.log(np.where(predictions > 0, predictions, np.nan)))
+
+    layout = predictor.layout()
+    categories = {name: values.tolist() for name, values in zip(layout.categorical_features, layout.categories)}
+    profile = DriftProfile(
+        numeric_edges, predictor.binary_features, categories, predictor.rare_amenities,
+        model_version=predictor.model_version
+    )
+
+    # The reference counts come from the same binning as the live ones
+    monitor = DriftMonitor(profile)
+    monitor.observe_batch(features, predictions)
+    profile.reference = monitor.counts.copy()
+    for name in profile.single_bin_features():
+        logger.warning(f"Every profile value of {name} falls in one bin; its drift cannot be detected")
+    return profile
+
+def load_monitor(path, model_version=None):
+    """
+    Return a DriftMonitor for the profile at path, or None if it is missing
+    or was built for a different model version.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        profile = DriftProfile.load(path)
+    except Exception as e:
+        logger.error(f"Error loading drift profile: {str(e)}")
+        return None
+    if model_version is not None and profile.model_version not in (None, model_version):
+        logger.warning(f"{path} was built for model {profile.model_version}, not {model_version}; ignoring it")
+        return None
+    return DriftMonitor(profile)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build drift reference profiles and merge drift snapshots.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('profile', help="Build the reference profile of a bundle from its training data")
+    build.add_argument('--bundle', default=os.path.join('models', 'bundle'))
+    build.add_argument('--data', required=True, help="Listing .csv or .parquet file the model was trained on")
+    build.add_argument('--rows', type=int, default=PROFILE_ROWS, help="Random rows the profile is built from")
+    build.add_argument('--seed', type=int, default=0)
+
+    report = commands.add_parser('report', help="Merge snapshots and report drift")
+    report.add_argument('snapshots', nargs='+', help="Snapshot .json files, e.g. saved from GET /drift?snapshot=1")
+    report.add_argument('--profile', default=os.path.join('models', 'bundle', DRIFT_PROFILE_FILE))
+    args = parser.parse_args()
+
+    if args.command == 'profile':
+        from prediction import RentalPricePredictor
+        from train import RowSample, amenity_flags, prepare_chunk
+        from score import read_chunks
+
+        predictor = RentalPricePredictor(args.bundle)
+        sample = RowSample(args.rows, args.seed)
+        for chunk in read_chunks(args.data, 100000):
+            features, log_prices = prepare_chunk(chunk)
+            sample.add(features.assign(**amenity_flags(chunk))[np.isfinite(log_prices)])
+        profile = build_profile(predictor, sample.rows())
+        path = os.path.join(args.bundle, DRIFT_PROFILE_FILE)
+        profile.save(path)
+        print(f"Wrote drift profile {profile.digest} for model {profile.model_version} to {path} "
+              f"({int(profile.reference.sum() / len(profile.slices))} listings, {profile.size} bins)")
+    else:
+        monitor = DriftMonitor(DriftProfile.load(args.profile))
+        for path in args.snapshots:
+            with open(path, encoding='utf-8') as f:
+                exported = json.load(f)
+            # A /drift?snapshot=1 response holds one snapshot per model; keep the profile's
+            snapshots = exported['models'].values() if 'models' in exported else [exported]
+            for snapshot in snapshots:
+                if snapshot.get('profile') == monitor.profile.digest:
+                    monitor.merge(snapshot)
+        print(json.dumps(monitor.report(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import math
+import threading
+import numpy as np
+
+from instrumentation import timer
+
+class FastScorer:
+    """
+    Single-row scorer that bypasses pandas and the ColumnTransformer.
+    
+    The fitted scaler statistics and one-hot vocabularies are taken from an
+    ArrayPreprocessor once. Each prediction then writes the features straight into a
+    preallocated float32 row and passes it to the booster.
+    """
+    def __init__(self, model, layout, rare_amenities):
+        """
+        Compile a scorer from a fitted model and the ArrayPreprocessor
+        describing its input columns.
+        """
+        self.numeric_features = layout.numeric_features
+        self.binary_features = layout.binary_features
+        self.categorical_features = layout.categorical_features
+        self.rare_amenities = list(rare_amenities)
+        
+        # Scaler statistics as plain floats, applied in the same order as StandardScaler
+        self.means = layout.means.tolist()
+        self.scales = layout.scales.tolist()
+        self.numeric_offset = layout.numeric_offset
+        self.binary_offset = layout.binary_offset
+        
+        # One-hot vocabularies mapped directly to their output column
+        self.category_columns = layout.category_columns
+        self.n_columns = layout.n_columns
+        
+        # A sparse transform output leaves zeros unset, which the model treats as missing
+        self.zero_is_missing = layout.sparse_output
+        
+        self.booster = model.get_booster()
+        try:
+            self.iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+        
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        """
+        Return the row buffer owned by the calling thread.
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = np.empty((1, self.n_columns), dtype=np.float32)
+            self._local.row = row
+        return row
+
+    def _set(self, row, column, value):
+        if value is None:
+            value = math.nan
+        if value != 0 or not self.zero_is_missing:
+            row[0, column] = value
+
+    def _batch_buffer(self, n_rows):
+        """
+        Return a buffer of at least n_rows rows owned by the calling thread.
+        """
+        rows = getattr(self._local, 'rows', None)
+        if rows is None or len(rows) < n_rows:
+            rows = np.empty((n_rows, self.n_columns), dtype=np.float32)
+            self._local.rows = rows
+        return rows[:n_rows]
+
+    def fill_row(self, features, row):
+        """
+        Write one feature dict into a row laid out like the preprocessor output.
+        """
+        row.fill(np.nan)
+        
+        luxury_score = sum(1 for amenity in self.rare_amenities if features.get(amenity) == 1)
+        
+        for i, feature in enumerate(self.numeric_features):
+            value = luxury_score if feature == 'luxury_score' else features.get(feature, 0)
+            if value is not None:
+                value = (float(value) - self.means[i]) / self.scales[i]
+            self._set(row, self.numeric_offset + i, value)
+        
+        for i, feature in enumerate(self.binary_features):
+            value = features.get(feature, 0)
+            self._set(row, self.binary_offset + i, None if value is None else float(value))
+        
+        for feature, columns in zip(self.categorical_features, self.category_columns):
+            # Unknown categories encode as all zeros, like handle_unknown='ignore'
+            column = columns.get(features.get(feature, "unknown"))
+            if column is not None:
+                self._set(row, column, 1.0)
+        
+        return row
+
+    def transform(self, features):
+        """
+        Return one feature dict as a new row laid out like the preprocessor output.
+        """
+        return self.fill_row(features, np.empty((1, self.n_columns), dtype=np.float32))
+
+    def score(self, features):
+        """
+        Predict the price for one feature dict.
+        """
+        with timer('preprocess'):
+            row = self.fill_row(features, self._row_buffer())
+        with timer('booster'):
+            log_prediction = self.booster.inplace_predict(
+                row, iteration_range=self.iteration_range, missing=np.nan
+            )[0]
+        
+        # Convert from log scale back to original scale
+        return np.exp(log_prediction)
+
+    def score_batch(self, records):
+        """
+        Predict prices for a small list of feature dicts with one booster call.
+        
+        Rows are dense, so this suits micro-batches; use the predictor's
+        predict_batch for large inputs.
+        """
+        if len(records) == 0:
+            return np.empty(0, dtype=np.float32)
+        
+        rows = self._batch_buffer(len(records))
+        with timer('preprocess'):
+            for i, features in enumerate(records):
+                self.fill_row(features, rows[i:i + 1])
+        
+        with timer('booster'):
+            log_predictions = self.booster.inplace_predict(
+                rows, iteration_range=self.iteration_range, missing=np.nan
+            )
+        return np.exp(log_predictions)
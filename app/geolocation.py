@@ -0,0 +1,269 @@
+"""
+Bulk geocoding of coordinates to the region names of the regions GeoJSON.
+
+Italy's bounding box is cut into a grid of square cells. A cell that lies
+inside one region resolves every point in it by an array lookup; only the
+cells a border or the coast crosses keep geometry, as the region polygons
+clipped to the cell. Points in those cells are tested exactly against the
+clipped pieces through an STRtree, which are small enough that each test
+touches a few dozen vertices instead of a whole region outline.
+
+The grid and the pieces (as WKB) are persisted to an .npz file (no pickle)
+tagged with a digest of the GeoJSON they were built from; load_region_index
+rebuilds the file when the GeoJSON changes.
+
+Build the index with:
+    python -m app.geolocation
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+SOURCE_PATH = os.path.join(project_root, 'data', 'limits_IT_regions.geojson')
+REGION_INDEX_PATH = os.path.join(project_root, 'data', 'regions_index.npz')
+
+REGION_INDEX_FORMAT_VERSION = 1
+
+# Grid cell side, in degrees (about 5 km)
+CELL_SIZE = 0.05
+
+# Columns a listing feed gives its coordinates in
+LATITUDE_COLUMN = 'latitude'
+LONGITUDE_COLUMN = 'longitude'
+
+# Grid codes of the cells that are not inside a single region
+OUTSIDE = -1
+BORDER = -2
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+class RegionIndex:
+    """
+    Grid of region codes with clipped border geometry, for point-in-polygon lookups.
+    """
+    def __init__(self, regions, origin, cell_size, grid, pieces, piece_regions, version=None):
+        import shapely
+
+        self.regions = list(regions)
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.cell_size = float(cell_size)
+        self.grid = np.asarray(grid, dtype=np.int16)
+        self.pieces = np.asarray(pieces, dtype=object)
+        self.piece_regions = np.asarray(piece_regions, dtype=np.int16)
+        self.version = version
+
+        shapely.prepare(self.pieces)
+        self.tree = shapely.STRtree(self.pieces)
+        self.region_names = np.array(self.regions + [None], dtype=object)
+
+    @classmethod
+    def from_regions(cls, regions_gdf, cell_size=CELL_SIZE, version=None):
+        """
+        Build the index from a GeoDataFrame of region polygons with reg_name.
+        """
+        import shapely
+
+        geometries = regions_gdf.geometry.values
+        xmin, ymin, xmax, ymax = regions_gdf.total_bounds
+        nx = int(np.ceil((xmax - xmin) / cell_size))
+        ny = int(np.ceil((ymax - ymin) / cell_size))
+
+        ys, xs = np.divmod(np.arange(nx * ny), nx)
+        x0, y0 = xmin + xs * cell_size, ymin + ys * cell_size
+        cells = shapely.box(x0, y0, x0 + cell_size, y0 + cell_size)
+
+        # Pair every cell with the regions it touches, then keep the cells wholly inside one
+        shapely.prepare(geometries)
+        cell_rows, region_codes = shapely.STRtree(geometries).query(cells, predicate='intersects')
+        inside = shapely.contains(geometries[region_codes], cells[cell_rows])
+        inside &= np.bincount(cell_rows, minlength=len(cells))[cell_rows] == 1
+
+        grid = np.full(len(cells), OUTSIDE, dtype=np.int16)
+        grid[cell_rows[inside]] = region_codes[inside]
+        grid[cell_rows[~inside]] = BORDER
+
+        # Border cells keep every region that crosses them, clipped to the cell
+        cell_rows, region_codes = cell_rows[~inside], region_codes[~inside]
+        # clip_by_rect takes one rectangle per call, but is much faster than a general intersection
+        pieces = np.array([
+            shapely.clip_by_rect(geometries[region], x0[cell], y0[cell], x0[cell] + cell_size, y0[cell] + cell_size)
+            for cell, region in zip(cell_rows, region_codes)
+        ], dtype=object)
+        kept = ~shapely.is_empty(pieces)
+
+        return cls(
+            regions_gdf['reg_name'].astype(str).tolist(), (xmin, ymin), cell_size,
+            grid.reshape(ny, nx), pieces[kept], region_codes[kept], version
+        )
+
+    def locate(self, longitudes, latitudes):
+        """
+        Return the region code of every point, -1 for points outside every region.
+
+        Points on a border between two regions go to the first region of the GeoJSON.
+        """
+        import shapely
+
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        ny, nx = self.grid.shape
+
+        # NaN coordinates fall outside the grid
+        with np.errstate(invalid='ignore'):
+            xs = np.floor((longitudes - self.origin[0]) / self.cell_size)
+            ys = np.floor((latitudes - self.origin[1]) / self.cell_size)
+            on_grid = (xs >= 0) & (xs < nx) & (ys >= 0) & (ys < ny)
+
+        codes = np.full(len(longitudes), OUTSIDE, dtype=np.int16)
+        codes[on_grid] = self.grid[ys[on_grid].astype(np.int64), xs[on_grid].astype(np.int64)]
+
+        border = np.flatnonzero(codes == BORDER)
+        codes[border] = OUTSIDE
+        if len(border):
+            points, pieces = self.tree.query(
+                shapely.points(longitudes[border], latitudes[border]), predicate='intersects'
+            )
+            # Where pieces meet, keep the lowest region code of each point
+            matched = self.piece_regions[pieces]
+            order = np.lexsort((matched, points))
+            points, first = np.unique(points[order], return_index=True)
+            codes[border[points]] = matched[order][first]
+        return codes
+
+    def region_names_of(self, longitudes, latitudes):
+        """
+        Return the reg_name of every point as an object array, None outside every region.
+        """
+        return self.region_names[self.locate(longitudes, latitudes)]
+
+    def region_of(self, longitude, latitude):
+        return self.region_names_of([longitude], [latitude])[0]
+
+    def save(self, path=REGION_INDEX_PATH):
+        """
+        Write the index to a NumPy .npz file (no pickle), with the pieces as WKB.
+        """
+        import shapely
+
+        wkb = shapely.to_wkb(self.pieces)
+        metadata = {
+            'format_version': REGION_INDEX_FORMAT_VERSION,
+            'version': self.version,
+            'regions': self.regions,
+            'origin': self.origin,
+            'cell_size': self.cell_size,
+        }
+        temporary_path = path + '.tmp.npz'
+        np.savez(
+            temporary_path,
+            metadata=np.array(json.dumps(metadata, ensure_ascii=False)),
+            grid=self.grid, piece_regions=self.piece_regions,
+            wkb=np.frombuffer(b''.join(wkb), dtype=np.uint8),
+            wkb_offsets=np.cumsum([0] + [len(piece) for piece in wkb]),
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path=REGION_INDEX_PATH):
+        import shapely
+
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != REGION_INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported region index format version: {metadata.get('format_version')}")
+            wkb, offsets = data['wkb'].tobytes(), data['wkb_offsets']
+            pieces = shapely.from_wkb([wkb[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])])
+            return cls(
+                metadata['regions'], metadata['origin'], metadata['cell_size'],
+                data['grid'], pieces, data['piece_regions'], metadata['version']
+            )
+
+def build_region_index(source_path=SOURCE_PATH, cell_size=CELL_SIZE):
+    """
+    Build the index from the regions GeoJSON, tagged with a digest of the file.
+    """
+    import geopandas as gpd
+
+    regions_gdf = gpd.read_file(source_path)[['reg_name', 'geometry']]
+    return RegionIndex.from_regions(regions_gdf, cell_size, version=_file_digest(source_path))
+
+def load_region_index(path=REGION_INDEX_PATH, source_path=SOURCE_PATH):
+    """
+    Load the saved index, rebuilding it if it is missing or was built from
+    another version of the GeoJSON.
+    """
+    version = _file_digest(source_path)
+    if os.path.exists(path):
+        index = RegionIndex.load(path)
+        if index.version == version:
+            return index
+        logger.warning(f"{path} was built from regions version {index.version}, rebuilding for {version}")
+    else:
+        logger.warning(f"{path} not found, building the region index")
+
+    index = build_region_index(source_path)
+    try:
+        index.save(path)
+    except OSError as e:
+        logger.error(f"Error saving the region index: {str(e)}")
+    return index
+
+# Index shared by every caller in the process, loaded on first use
+_region_index = None
+_region_index_lock = threading.Lock()
+
+def get_region_index():
+    global _region_index
+    if _region_index is None:
+        with _region_index_lock:
+            if _region_index is None:
+                _region_index = load_region_index()
+    return _region_index
+
+def has_coordinates(frame):
+    return {LATITUDE_COLUMN, LONGITUDE_COLUMN} <= set(frame.columns)
+
+def geocode_regions(frame):
+    """
+    Return the reg_name of every row of a DataFrame with latitude and longitude columns.
+    """
+    import pandas as pd
+
+    longitudes = pd.to_numeric(frame[LONGITUDE_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+    latitudes = pd.to_numeric(frame[LATITUDE_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+    return get_region_index().region_names_of(longitudes, latitudes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the point-in-polygon region index.")
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--output', default=REGION_INDEX_PATH)
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE, help="Grid cell side in degrees")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_region_index(args.source, args.cell_size)
+    index.save(args.output)
+    elapsed = time.perf_counter() - start
+
+    border_cells = int((index.grid == BORDER).sum())
+    print(f"Indexed {len(index.regions)} regions on a {index.grid.shape[1]}x{index.grid.shape[0]} grid in {elapsed:.1f}s "
+          f"(regions version {index.version})")
+    print(f"  {args.output}: {os.path.getsize(args.output) / 1e6:.1f} MB, "
+          f"{border_cells} border cells split into {len(index.pieces)} pieces")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Simplified regional geometry and the cached region map.
+
+The full-resolution regions GeoJSON is simplified offline at a few tolerance
+levels, with shared borders kept shared, and stored as GeoParquet. The app
+then loads only the level that suits the current zoom.
+
+Build the simplified geometry with:
+    python -m app.geometry
+"""
+import argparse
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+SOURCE_PATH = os.path.join(project_root, 'data', 'limits_IT_regions.geojson')
+SIMPLIFIED_PATH = os.path.join(project_root, 'data', 'regions_simplified.parquet')
+
+# Simplification tolerance per level, in degrees
+SIMPLIFICATION_LEVELS = {
+    'high': 0.001,
+    'medium': 0.005,
+    'low': 0.02,
+}
+
+# Coordinates are rounded to this grid (about a metre), which also shrinks the payload
+COORDINATE_PRECISION = 1e-5
+
+ITALY_CENTER = [41.8719, 12.5674]
+DEFAULT_ZOOM = 6
+
+def simplify_regions(regions_gdf, tolerance):
+    """
+    Simplify region polygons without opening gaps or overlaps between neighbours.
+    """
+    import shapely
+
+    geometries = regions_gdf.geometry.values
+    if hasattr(shapely, 'coverage_simplify'):
+        # Simplifies shared borders once, so adjacent regions still meet exactly
+        simplified = shapely.coverage_simplify(geometries, tolerance)
+    else:
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    simplified = shapely.set_precision(simplified, COORDINATE_PRECISION)
+
+    result = regions_gdf.copy()
+    result['geometry'] = simplified
+    return result
+
+def build_simplified_geometry(source_path=SOURCE_PATH, output_path=SIMPLIFIED_PATH, levels=None):
+    """
+    Simplify the source regions at every level and store them in one GeoParquet file.
+
+    Returns the number of coordinates per level.
+    """
+    import geopandas as gpd
+    import pandas as pd
+    import shapely
+
+    levels = levels or SIMPLIFICATION_LEVELS
+    regions_gdf = gpd.read_file(source_path)[['reg_name', 'reg_istat_code', 'geometry']]
+
+    parts = []
+    coordinates = {'full': int(shapely.get_num_coordinates(regions_gdf.geometry.values).sum())}
+    for level, tolerance in levels.items():
+        simplified = simplify_regions(regions_gdf, tolerance)
+        simplified['level'] = level
+        coordinates[level] = int(shapely.get_num_coordinates(simplified.geometry.values).sum())
+        parts.append(simplified)
+
+    combined = gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), crs=regions_gdf.crs)
+    combined.to_parquet(output_path, index=False)
+    return coordinates
+
+def geometry_version(path=SIMPLIFIED_PATH):
+    """
+    Identify the current simplified geometry file, for use in cache keys.
+    """
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (SOURCE_PATH, None, None)
+
+def level_for_zoom(zoom):
+    """
+    Pick the coarsest level whose tolerance is below one screen pixel at the zoom.
+    """
+    degrees_per_pixel = 360 / (256 * 2 ** (zoom or DEFAULT_ZOOM))
+    fitting = [level for level, tolerance in SIMPLIFICATION_LEVELS.items() if tolerance <= degrees_per_pixel]
+    if not fitting:
+        return min(SIMPLIFICATION_LEVELS, key=SIMPLIFICATION_LEVELS.get)
+    return max(fitting, key=SIMPLIFICATION_LEVELS.get)
+
+def load_region_geometry(level, path=SIMPLIFIED_PATH):
+    """
+    Load the region polygons at one simplification level.
+
+    Falls back to the full-resolution GeoJSON if the simplified file has not
+    been built.
+    """
+    import geopandas as gpd
+
+    if not os.path.exists(path):
+        logger.warning(f"{path} not found, using full-resolution regions; run python -m app.geometry")
+        return gpd.read_file(SOURCE_PATH)
+
+    regions_gdf = gpd.read_parquet(path)
+    regions_gdf = regions_gdf[regions_gdf['level'] == level]
+    if regions_gdf.empty:
+        raise ValueError(f"Unknown geometry level: {level}")
+    return regions_gdf.drop(columns='level').reset_index(drop=True)
+
+def build_region_map(regions_gdf, region_stats, center=ITALY_CENTER, zoom=DEFAULT_ZOOM):
+    """
+    Build the regional price map.
+
+    The region geometry is serialized once: the tooltip is attached to the
+    choropleth's own GeoJson layer instead of a second copy of the polygons.
+    """
+    import folium
+
+    merged_gdf = regions_gdf.merge(region_stats, on='reg_name')
+
+    m = folium.Map(location=center, zoom_start=zoom, tiles='CartoDB positron')
+
+    choropleth = folium.Choropleth(
+        geo_data=merged_gdf,
+        name='Regional Prices',
+        data=merged_gdf,
+        columns=['reg_name', 'mean_price'],
+        key_on='feature.properties.reg_name',
+        fill_color='YlOrRd',
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        legend_name='Average Rental Price (€)',
+        highlight=True
+    )
+    fields = ['reg_name', 'mean_price', 'median_price', 'property_count']
+    aliases = ['Region', 'Average Price (€)', 'Median Price (€)', 'Number of Properties']
+    # Spread of prices, when the stats come from PriceStatistics
+    if {'p10_price', 'p90_price'} <= set(merged_gdf.columns):
+        fields += ['p10_price', 'p90_price']
+        aliases += ['10th Percentile (€)', '90th Percentile (€)']
+
+    choropleth.geojson.add_child(
+        folium.features.GeoJsonTooltip(
+            fields=fields,
+            aliases=aliases,
+            style=("background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;")
+        )
+    )
+    choropleth.add_to(m)
+
+    return m
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the simplified region geometry.")
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--output', default=SIMPLIFIED_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    coordinates = build_simplified_geometry(args.source, args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1e3:.0f} KB) in {elapsed:.1f}s")
+    for level, count in coordinates.items():
+        tolerance = SIMPLIFICATION_LEVELS.get(level)
+        label = f"tolerance {tolerance}" if tolerance else "source"
+        print(f"  {level:7s} {count:7d} coordinates ({label})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Lightweight timing and counters for the prediction and map pipelines.
+
+Stages are timed with `with timer('stage'):` and counted with increment() and
+observe(). Measurements go into in-process histograms with fixed buckets and
+can be rendered in the Prometheus text exposition format. Everything is off
+by default: while disabled, timer() hands back a shared no-op context and the
+other calls return after one attribute check, so instrumented code pays well
+under a microsecond per call.
+
+Enable with RENTELLIGENCE_METRICS=1 or enable(). The sampling profiler is
+separate and opt-in, via RENTELLIGENCE_PROFILE=<interval ms> or
+start_profiler().
+"""
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Upper bounds of the size histogram buckets, e.g. rows per batch
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536)
+
+METRIC_PREFIX = 'rentelligence'
+
+class Histogram:
+    """
+    Fixed-bucket histogram with a running count and sum.
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'start')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.registry.observe_latency(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class MetricsRegistry:
+    """
+    Thread-safe store of stage latencies, counters and size histograms.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.sizes = {}
+        self.counters = collections.Counter()
+
+    def timer(self, stage):
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe_latency(self, stage, seconds):
+        with self._lock:
+            histogram = self.latencies.get(stage)
+            if histogram is None:
+                histogram = self.latencies[stage] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.sizes.get(name)
+            if histogram is None:
+                histogram = self.sizes[name] = Histogram(SIZE_BUCKETS)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += amount
+
+    def reset(self):
+        with self._lock:
+            self.latencies.clear()
+            self.sizes.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """
+        Return the current measurements as plain dicts, with estimated percentiles.
+        """
+        with self._lock:
+            def summarize(histogram):
+                return {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else None,
+                    'p50': histogram.quantile(0.5),
+                    'p99': histogram.quantile(0.99),
+                }
+            return {
+                'latency_seconds': {stage: summarize(h) for stage, h in sorted(self.latencies.items())},
+                'sizes': {name: summarize(h) for name, h in sorted(self.sizes.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def render_prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f'{METRIC_PREFIX}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value}')
+
+            if self.latencies:
+                metric = f'{METRIC_PREFIX}_stage_seconds'
+                lines.append(f'# HELP {metric} Time spent per pipeline stage.')
+                lines.append(f'# TYPE {metric} histogram')
+                for stage, histogram in sorted(self.latencies.items()):
+                    lines.extend(_histogram_lines(metric, f'stage="{stage}"', histogram))
+
+            for name, histogram in sorted(self.sizes.items()):
+                metric = f'{METRIC_PREFIX}_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                lines.extend(_histogram_lines(metric, '', histogram))
+        return '\n'.join(lines) + '\n'
+
+def _histogram_lines(metric, labels, histogram):
+    separator = ',' if labels else ''
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f'{metric}_bucket{{{labels}{separator}le="{bound:g}"}} {cumulative}'
+    yield f'{metric}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}'
+    label_block = f'{{{labels}}}' if labels else ''
+    yield f'{metric}_sum{label_block} {histogram.sum:.9g}'
+    yield f'{metric}_count{label_block} {histogram.count}'
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples the stacks of all other threads.
+
+    A daemon thread wakes every interval seconds and counts each thread's
+    current call stack, so the cost is set by the interval rather than by the
+    code being profiled. Results come out in the collapsed-stack format read
+    by flame graph tools.
+    """
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def restart_after_fork(self):
+        """
+        Restart sampling in a forked child, which inherits a running profiler
+        but not its thread; the child starts from empty counts.
+        """
+        if self._thread is None:
+            return
+        self._thread = None
+        self._stop = threading.Event()
+        # The lock may have been held by the parent's sampler at fork time
+        self._lock = threading.Lock()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                sampled.append(';'.join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self):
+        """
+        Return the sampled stacks as 'frame;frame;frame count' lines.
+        """
+        # Copy under the lock; formatting the live Counter races the sampler
+        with self._lock:
+            stacks = collections.Counter(self.stacks)
+        return '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common()) + '\n'
+
+registry = MetricsRegistry(enabled=os.environ.get('RENTELLIGENCE_METRICS', '') not in ('', '0'))
+profiler = None
+
+def enable():
+    registry.enabled = True
+
+def disable():
+    registry.enabled = False
+
+def timer(stage):
+    """
+    Time a pipeline stage: `with timer('transform'): ...`
+    """
+    if not registry.enabled:
+        return NULL_TIMER
+    return _Timer(registry, stage)
+
+def increment(name, amount=1):
+    if registry.enabled:
+        registry.increment(name, amount)
+
+def observe(name, value):
+    if registry.enabled:
+        registry.observe(name, value)
+
+def start_profiler(interval=0.005):
+    """
+    Start the process-wide sampling profiler and return it.
+    """
+    global profiler
+    if profiler is None:
+        profiler = SamplingProfiler(interval)
+    profiler.start()
+    return profiler
+
+def stop_profiler():
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def _restart_profiler_after_fork():
+    if profiler is not None:
+        profiler.restart_after_fork()
+
+# Forked service workers would otherwise keep the profiler without its sampling thread
+os.register_at_fork(after_in_child=_restart_profiler_after_fork)
+
+if os.environ.get('RENTELLIGENCE_PROFILE'):
+    start_profiler(float(os.environ['RENTELLIGENCE_PROFILE']) / 1000)
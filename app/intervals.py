@@ -0,0 +1,292 @@
+"""
+Calibrated prediction intervals per region and price band.
+
+Split-conformal calibration: on listings held out from training, the log
+residuals log(actual) - log(predicted) are grouped by region and by band of
+predicted price, and each group's residual quantiles for a few coverage
+levels are stored in a small table. At prediction time the bounds are the
+point prediction times the stored factors, looked up with array indexing for
+a whole batch, so intervals need no extra model pass. Groups with too few
+calibration listings fall back to the band across all regions.
+
+Build the table from the notebook's held-out test split and print a coverage
+and throughput report with:
+    python -m app.intervals --csv data/italian_rental_processed.csv
+"""
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+INTERVALS_FILE = 'intervals.npz'
+INTERVALS_FORMAT_VERSION = 1
+
+COVERAGE_LEVELS = (0.8, 0.9, 0.95)
+DEFAULT_COVERAGE = 0.9
+
+PRICE_BANDS = 5
+
+# Groups with fewer calibration listings use the band across all regions
+MIN_GROUP_SIZE = 200
+
+# Train/test split of the training notebook; only the test rows are unseen by the model
+NOTEBOOK_TEST_SIZE = 0.2
+NOTEBOOK_RANDOM_STATE = 7
+
+class IntervalTable:
+    """
+    Residual-quantile factors per (region, price band, coverage level).
+    """
+    def __init__(self, regions, band_edges, levels, offsets, counts, model_version=None):
+        """
+        offsets holds the lower and upper log residual quantiles, shaped
+        (regions + 1, bands, levels, 2); the last region row covers all regions.
+        band_edges are the inner edges between price bands.
+        """
+        self.regions = list(regions)
+        self.band_edges = np.asarray(band_edges, dtype=np.float64)
+        self.levels = tuple(float(level) for level in levels)
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.model_version = model_version
+
+        self.region_index = {region: i for i, region in enumerate(self.regions)}
+        self.factors = np.exp(self.offsets).astype(np.float32)
+
+    def level_index(self, coverage=None):
+        coverage = DEFAULT_COVERAGE if coverage is None else coverage
+        for i, level in enumerate(self.levels):
+            if math.isclose(level, coverage):
+                return i
+        raise ValueError(f"Coverage {coverage} not calibrated; available: {self.levels}")
+
+    def region_codes(self, regions):
+        """
+        Map region names to table rows, unknown regions to the all-regions row.
+        """
+        import pandas as pd
+
+        codes = pd.Categorical(np.asarray(regions, dtype=object), categories=self.regions).codes.astype(np.int64)
+        codes[codes < 0] = len(self.regions)
+        return codes
+
+    def bounds(self, predicted_prices, regions, coverage=None):
+        """
+        Return lower and upper bounds for arrays of predicted prices and regions.
+        """
+        predicted_prices = np.asarray(predicted_prices)
+        bands = np.searchsorted(self.band_edges, predicted_prices, side='right')
+        factors = self.factors[self.region_codes(regions), bands, self.level_index(coverage)]
+        return predicted_prices * factors[:, 0], predicted_prices * factors[:, 1]
+
+    def bounds_one(self, predicted_price, region, coverage=None):
+        """
+        Return the bounds of a single prediction, without building arrays.
+        """
+        row = self.region_index.get(region, len(self.regions))
+        band = int(np.searchsorted(self.band_edges, predicted_price, side='right'))
+        lower, upper = self.factors[row, band, self.level_index(coverage)]
+        return predicted_price * lower, predicted_price * upper
+
+    def save(self, path):
+        temporary_path = path + '.tmp.npz'
+        np.savez(
+            temporary_path,
+            format_version=np.array(INTERVALS_FORMAT_VERSION),
+            regions=np.array(json.dumps(self.regions)),
+            model_version=np.array(json.dumps(self.model_version)),
+            band_edges=self.band_edges, levels=np.array(self.levels),
+            offsets=self.offsets, counts=self.counts
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != INTERVALS_FORMAT_VERSION:
+                raise ValueError(f"Unsupported intervals format version: {int(data['format_version'])}")
+            return cls(
+                json.loads(str(data['regions'])), data['band_edges'], data['levels'].tolist(),
+                data['offsets'], data['counts'], model_version=json.loads(str(data['model_version']))
+            )
+
+def conformal_offsets(residuals, levels):
+    """
+    Lower and upper residual quantiles per level, with the split-conformal
+    finite-sample correction so coverage holds on exchangeable new listings.
+    """
+    n = len(residuals)
+    offsets = np.empty((len(levels), 2))
+    for i, level in enumerate(levels):
+        alpha = 1 - level
+        lower_rank = max(math.floor((n + 1) * alpha / 2), 1)
+        upper_rank = min(math.ceil((n + 1) * (1 - alpha / 2)), n)
+        ordered = np.partition(residuals, [lower_rank - 1, upper_rank - 1])
+        offsets[i] = ordered[lower_rank - 1], ordered[upper_rank - 1]
+    return offsets
+
+def calibrate(predicted_prices, actual_prices, regions, levels=COVERAGE_LEVELS,
+              n_bands=PRICE_BANDS, min_group_size=MIN_GROUP_SIZE, model_version=None):
+    """
+    Build an IntervalTable from predictions on held-out listings.
+    """
+    import pandas as pd
+
+    predicted_prices = np.asarray(predicted_prices, dtype=np.float64)
+    actual_prices = np.asarray(actual_prices, dtype=np.float64)
+    regions = pd.Series(np.asarray(regions, dtype=object))
+
+    valid = (predicted_prices > 0) & (actual_prices > 0) & regions.notna().to_numpy()
+    predicted_prices, actual_prices = predicted_prices[valid], actual_prices[valid]
+    region_values = regions[valid].astype(str).to_numpy()
+    if len(predicted_prices) < min_group_size:
+        raise ValueError(f"Need at least {min_group_size} calibration listings, got {len(predicted_prices)}")
+
+    residuals = np.log(actual_prices) - np.log(predicted_prices)
+    band_edges = np.unique(np.quantile(predicted_prices, np.arange(1, n_bands) / n_bands))
+    bands = np.searchsorted(band_edges, predicted_prices, side='right')
+    n_bands = len(band_edges) + 1
+
+    region_names = sorted(set(region_values))
+    codes = pd.Categorical(region_values, categories=region_names).codes
+
+    offsets = np.empty((len(region_names) + 1, n_bands, len(levels), 2))
+    counts = np.zeros((len(region_names) + 1, n_bands), dtype=np.int64)
+    all_regions = len(region_names)
+    for band in range(n_bands):
+        in_band = bands == band
+        counts[all_regions, band] = in_band.sum()
+        # Bands are price quantiles, so every band holds about 1/n_bands of the listings
+        band_offsets = conformal_offsets(residuals[in_band], levels)
+        offsets[all_regions, band] = band_offsets
+        for region in range(all_regions):
+            in_group = in_band & (codes == region)
+            counts[region, band] = in_group.sum()
+            if counts[region, band] >= min_group_size:
+                offsets[region, band] = conformal_offsets(residuals[in_group], levels)
+            else:
+                offsets[region, band] = band_offsets
+
+    return IntervalTable(region_names, band_edges, levels, offsets, counts, model_version)
+
+def load_intervals(path, model_version=None):
+    """
+    Load an interval table, or return None if it is missing or was calibrated
+    for a different model version.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        table = IntervalTable.load(path)
+    except Exception as e:
+        logger.error(f"Error loading prediction intervals: {str(e)}")
+        return None
+    if model_version is not None and table.model_version not in (None, model_version):
+        logger.warning(f"{path} was calibrated for model {table.model_version}, not {model_version}; ignoring it")
+        return None
+    return table
+
+def notebook_test_rows(n_rows):
+    """
+    Return the positions of the rows the training notebook held out as its test set.
+    """
+    from sklearn.model_selection import train_test_split
+
+    _, test_rows = train_test_split(
+        np.arange(n_rows), test_size=NOTEBOOK_TEST_SIZE, random_state=NOTEBOOK_RANDOM_STATE
+    )
+    return np.sort(test_rows)
+
+def coverage_report(table, predicted_prices, actual_prices, regions):
+    """
+    Return the observed coverage and mean relative width per level, overall
+    and per region.
+    """
+    import pandas as pd
+
+    regions = np.asarray(regions, dtype=object)
+    rows = []
+    for level in table.levels:
+        lower, upper = table.bounds(predicted_prices, regions, level)
+        covered = (actual_prices >= lower) & (actual_prices <= upper)
+        width = (upper - lower) / predicted_prices
+        frame = pd.DataFrame({'region': regions, 'covered': covered, 'width': width})
+        overall = pd.DataFrame({'region': ['All regions'], 'covered': [covered.mean()],
+                                'width': [width.mean()], 'listings': [len(frame)]})
+        per_region = frame.groupby('region').agg(
+            covered=('covered', 'mean'), width=('width', 'mean'), listings=('covered', 'size')
+        ).reset_index()
+        report = pd.concat([overall, per_region], ignore_index=True)
+        report.insert(0, 'level', level)
+        rows.append(report)
+    return pd.concat(rows, ignore_index=True)
+
+def main():
+    from prediction import load_default_predictor
+    from rental_store import read_csv
+    from score import derive_features
+
+    parser = argparse.ArgumentParser(description="Calibrate prediction intervals and report their coverage.")
+    parser.add_argument('--csv', default=os.path.join(project_root, 'data', 'italian_rental_processed.csv'))
+    parser.add_argument('--models-dir', default=os.path.join(project_root, 'models'))
+    parser.add_argument('--output', default=None, help="Table path (default: <models-dir>/intervals.npz)")
+    parser.add_argument('--evaluation-share', type=float, default=0.5,
+                        help="Share of the held-out listings kept back to measure coverage")
+    parser.add_argument('--min-group-size', type=int, default=MIN_GROUP_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    output = args.output or os.path.join(args.models_dir, INTERVALS_FILE)
+
+    predictor = load_default_predictor(args.models_dir)
+    listings = derive_features(read_csv(args.csv))
+    held_out = listings.iloc[notebook_test_rows(len(listings))].reset_index(drop=True)
+
+    rng = np.random.default_rng(args.seed)
+    evaluation = rng.random(len(held_out)) < args.evaluation_share
+    regions = held_out['region_standardized'].astype(object).to_numpy()
+    actual_prices = held_out['price'].to_numpy(dtype=np.float64)
+
+    predicted_prices = predictor.predict_batch(held_out)
+    table = calibrate(
+        predicted_prices[~evaluation], actual_prices[~evaluation], regions[~evaluation],
+        min_group_size=args.min_group_size, model_version=predictor.model_version
+    )
+    table.save(output)
+    print(f"Calibrated on {(~evaluation).sum()} held-out listings, saved {output}")
+
+    report = coverage_report(table, predicted_prices[evaluation], actual_prices[evaluation], regions[evaluation])
+    print(f"\nCoverage on {evaluation.sum()} other held-out listings:")
+    print(report[report['region'] == 'All regions'].to_string(index=False, float_format='{:.3f}'.format))
+    print(f"\nPer region at {DEFAULT_COVERAGE:.0%}:")
+    print(report[(report['level'] == DEFAULT_COVERAGE) & (report['region'] != 'All regions')]
+          .to_string(index=False, float_format='{:.3f}'.format))
+
+    # Throughput of the point prediction alone and with calibrated bounds, best of three
+    sample = held_out[evaluation]
+    predictor.intervals = table
+    cases = {
+        'point only': lambda: predictor.predict_batch(sample),
+        'with intervals': lambda: predictor.predict_batch_with_confidence(sample),
+        'bounds only': lambda: table.bounds(predicted_prices[evaluation], regions[evaluation]),
+    }
+    timings = {}
+    for name, run in cases.items():
+        elapsed = []
+        for _ in range(3):
+            start = time.perf_counter()
+            run()
+            elapsed.append(time.perf_counter() - start)
+        timings[name] = min(elapsed)
+    print(f"\nThroughput on {len(sample)} listings:")
+    for name, elapsed in timings.items():
+        print(f"  {name:15s} {elapsed * 1000:9.1f} ms  {len(sample) / elapsed:12.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Versioned model bundle that loads without pickle.
+
+A bundle is a directory holding:
+    booster.ubj                 the XGBoost booster in its native UBJSON format
+    <name>.npy                  fitted preprocessor parameters as plain arrays
+    metadata.json               confidence metrics and feature importance
+    manifest.json               format version, feature layout and file checksums
+
+manifest.json is written last, so a directory without one is not a bundle.
+
+Convert the existing pickled artifacts with:
+    python -m app.model_bundle --models-dir models --output models/bundle
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+BOOSTER_FILE = 'booster.ubj'
+METADATA_FILE = 'metadata.json'
+
+class ArrayPreprocessor:
+    """
+    Fitted preprocessor parameters held as plain arrays.
+
+    Mirrors the training ColumnTransformer (StandardScaler on the numeric
+    features, passthrough binary features, one-hot encoded categoricals that
+    ignore unknown values) and produces the same output without sklearn.
+    """
+    def __init__(self, numeric_features, binary_features, categorical_features,
+                 means, scales, categories, sparse_output=True):
+        self.numeric_features = list(numeric_features)
+        self.binary_features = list(binary_features)
+        self.categorical_features = list(categorical_features)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.categories = [np.asarray(values) for values in categories]
+        self.sparse_output = sparse_output
+
+        # Output columns are laid out numeric, binary, then one block per categorical
+        self.numeric_offset = 0
+        self.binary_offset = len(self.numeric_features)
+        self.category_columns = []
+        column = self.binary_offset + len(self.binary_features)
+        for values in self.categories:
+            self.category_columns.append({value: column + i for i, value in enumerate(values.tolist())})
+            column += len(values)
+        self.n_columns = column
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor, numeric_features, binary_features, categorical_features):
+        """
+        Extract the parameters of a fitted ColumnTransformer.
+        """
+        transformers = {name: (transformer, columns) for name, transformer, columns in preprocessor.transformers_}
+        offsets = preprocessor.output_indices_
+
+        try:
+            scaler, scaled_columns = transformers['num']
+            _, passthrough_columns = transformers['bin']
+            encoder, encoded_columns = transformers['cat']
+        except KeyError as e:
+            raise ValueError(f"Preprocessor has no '{e.args[0]}' transformer")
+
+        if (list(scaled_columns) != list(numeric_features)
+                or list(passthrough_columns) != list(binary_features)
+                or list(encoded_columns) != list(categorical_features)):
+            raise ValueError("Preprocessor columns do not match the predictor feature groups")
+        if not offsets['num'].start < offsets['bin'].start < offsets['cat'].start:
+            raise ValueError("Preprocessor output must be ordered numeric, binary, categorical")
+        if encoder.drop is not None or encoder.handle_unknown != 'ignore':
+            raise ValueError("Only one-hot encoders without dropped categories that ignore unknown values are supported")
+
+        n_numeric = len(numeric_features)
+        means = scaler.mean_ if scaler.with_mean else np.zeros(n_numeric)
+        scales = scaler.scale_ if scaler.with_std else np.ones(n_numeric)
+
+        return cls(
+            numeric_features, binary_features, categorical_features,
+            means, scales, encoder.categories_, sparse_output=preprocessor.sparse_output_
+        )
+
+    def transform(self, features_df):
+        """
+        Transform a DataFrame of model features like the ColumnTransformer does.
+        """
+        from scipy import sparse
+
+        n_rows = len(features_df)
+        n_numeric = len(self.numeric_features)
+
+        dense = np.empty((n_rows, n_numeric + len(self.binary_features)), dtype=np.float64)
+        dense[:, :n_numeric] = features_df[self.numeric_features].to_numpy(dtype=np.float64)
+        dense[:, :n_numeric] -= self.means
+        dense[:, :n_numeric] /= self.scales
+        dense[:, n_numeric:] = features_df[self.binary_features].to_numpy(dtype=np.float64)
+
+        # One-hot columns; values outside the vocabulary encode as all zeros
+        rows, columns = [], []
+        for feature, vocabulary in zip(self.categorical_features, self.category_columns):
+            codes = features_df[feature].map(vocabulary).to_numpy(dtype=np.float64)
+            known = ~np.isnan(codes)
+            rows.append(np.flatnonzero(known))
+            columns.append(codes[known].astype(np.int64) - dense.shape[1])
+        rows = np.concatenate(rows)
+        columns = np.concatenate(columns)
+        one_hot = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(n_rows, self.n_columns - dense.shape[1])
+        )
+
+        if not self.sparse_output:
+            return np.hstack([dense, one_hot.toarray()])
+        # Like the ColumnTransformer, zeros are left out of the sparse output
+        return sparse.hstack([sparse.csr_matrix(dense), one_hot], format='csr')
+
+class BundledModel:
+    """
+    Booster loaded from a bundle, exposing the parts of XGBRegressor the
+    predictor relies on.
+    """
+    def __init__(self, booster, best_iteration=None):
+        self.booster = booster
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        self._best_iteration = best_iteration
+
+    @property
+    def best_iteration(self):
+        if self._best_iteration is None:
+            raise AttributeError("Model was trained without early stopping")
+        return self._best_iteration
+
+    def get_booster(self):
+        return self.booster
+
+    def predict(self, X):
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range, missing=np.nan)
+
+class ModelBundle:
+    """
+    A loaded model bundle.
+    """
+    def __init__(self, model, preprocessor, metadata, manifest):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.metadata = metadata
+        self.manifest = manifest
+
+    @property
+    def version(self):
+        return self.manifest['model_version']
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _json_ready(value):
+    """
+    Convert NumPy scalars and containers to plain JSON types.
+    """
+    if isinstance(value, dict):
+        return {str(key): _json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_json_ready(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def export_bundle(output_dir, model, preprocessor, metadata=None):
+    """
+    Write a model bundle for a fitted model and ArrayPreprocessor.
+
+    metadata is any JSON-serializable dict, e.g. confidence metrics and
+    feature importance. Returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        # Invalidate the old bundle before overwriting its files
+        os.remove(manifest_path)
+
+    booster = model.get_booster()
+    booster.save_model(os.path.join(output_dir, BOOSTER_FILE))
+    try:
+        best_iteration = model.best_iteration
+    except AttributeError:
+        best_iteration = None
+
+    arrays = {'scaler_mean': preprocessor.means, 'scaler_scale': preprocessor.scales}
+    for feature, values in zip(preprocessor.categorical_features, preprocessor.categories):
+        arrays[f'categories_{feature}'] = np.asarray(values.tolist(), dtype=str)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f'{name}.npy'), array, allow_pickle=False)
+
+    with open(os.path.join(output_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(_json_ready(metadata or {}), f, indent=2, ensure_ascii=False)
+
+    files = [BOOSTER_FILE, METADATA_FILE] + [f'{name}.npy' for name in arrays]
+    checksums = {name: _sha256(os.path.join(output_dir, name)) for name in files}
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': checksums[BOOSTER_FILE][:12],
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'best_iteration': best_iteration,
+        'sparse_output': preprocessor.sparse_output,
+        'features': {
+            'numeric': preprocessor.numeric_features,
+            'binary': preprocessor.binary_features,
+            'categorical': preprocessor.categorical_features,
+        },
+        'files': {
+            name: {'sha256': checksums[name], 'bytes': os.path.getsize(os.path.join(output_dir, name))}
+            for name in files
+        },
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+def read_manifest(bundle_dir):
+    """
+    Read and check the manifest of a bundle directory.
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {manifest.get('format_version')}")
+    return manifest
+
+def load_bundle_metadata(bundle_dir):
+    """
+    Load only the metadata of a bundle, without the model.
+    """
+    with open(os.path.join(bundle_dir, METADATA_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+def load_bundle(bundle_dir, verify=True, mmap=True):
+    """
+    Load a model bundle.
+
+    With verify, every file is checked against the manifest checksum. With
+    mmap, the preprocessor arrays are memory-mapped instead of read.
+    """
+    import xgboost as xgb
+
+    manifest = read_manifest(bundle_dir)
+
+    if verify:
+        for name, expected in manifest['files'].items():
+            if _sha256(os.path.join(bundle_dir, name)) != expected['sha256']:
+                raise ValueError(f"Checksum mismatch for {name} in {bundle_dir}")
+
+    def load_array(name):
+        return np.load(os.path.join(bundle_dir, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+
+    features = manifest['features']
+    preprocessor = ArrayPreprocessor(
+        features['numeric'], features['binary'], features['categorical'],
+        load_array('scaler_mean'), load_array('scaler_scale'),
+        [load_array(f'categories_{feature}') for feature in features['categorical']],
+        sparse_output=manifest['sparse_output']
+    )
+
+    booster = xgb.Booster(model_file=os.path.join(bundle_dir, BOOSTER_FILE))
+    model = BundledModel(booster, manifest['best_iteration'])
+
+    return ModelBundle(model, preprocessor, load_bundle_metadata(bundle_dir), manifest)
+
+def convert_pickles(models_dir, output_dir):
+    """
+    One-shot conversion of the pickled artifacts in models_dir into a bundle.
+    """
+    from prediction import RentalPricePredictor
+
+    predictor = RentalPricePredictor(
+        os.path.join(models_dir, 'best_xgb_model.pkl'),
+        os.path.join(models_dir, 'preprocessor.pkl')
+    )
+    preprocessor = ArrayPreprocessor.from_column_transformer(
+        predictor.preprocessor, predictor.numeric_features,
+        predictor.binary_features, predictor.categorical_features
+    )
+
+    metadata = {}
+    for key, filename in [('confidence_metrics', 'confidence_metrics.pkl'),
+                          ('feature_importance', 'feature_importance.pkl')]:
+        path = os.path.join(models_dir, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                metadata[key] = pickle.load(f)
+
+    # Write to a staging directory first so a failed export never leaves a half-written bundle
+    staging_dir = output_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = export_bundle(staging_dir, predictor.model, preprocessor, metadata)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the pickled model artifacts into a model bundle.")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the .pkl artifacts")
+    parser.add_argument('--output', default=os.path.join('models', 'bundle'), help="Bundle directory to write")
+    args = parser.parse_args()
+
+    manifest = convert_pickles(args.models_dir, args.output)
+    total_bytes = sum(entry['bytes'] for entry in manifest['files'].values())
+    print(f"Wrote bundle {manifest['model_version']} to {args.output} ({total_bytes / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
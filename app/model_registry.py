@@ -0,0 +1,317 @@
+"""
+Registry of named, versioned predictors with weighted routing and hot reload.
+
+Every model bundle directory in the models directory (one holding a
+manifest.json, such as models/bundle) is registered under its directory
+name, with its manifest's model version. models/routing.json, when present,
+names the default model and the A/B weights:
+    {"default": "bundle", "weights": {"bundle": 0.9, "bundle-v2": 0.1}}
+Without it, every request goes to the default model.
+
+The loaded models are held in an immutable RegistrySnapshot. A refresh
+loads new or changed bundles completely and only then swaps the snapshot in
+with one assignment, so a request sees one consistent set of models and
+never a half-loaded one. Requests already holding the old predictor finish
+on it.
+
+For multi-process serving, load the registry in the parent and call
+prepare_for_fork() before forking the workers. The boosters, memory-mapped
+preprocessor arrays and Python objects are then shared copy-on-write
+instead of being loaded again in every worker.
+"""
+import collections
+import gc
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+import numpy as np
+import logging
+
+from drift import DRIFT_PROFILE_FILE
+from intervals import INTERVALS_FILE
+from model_bundle import MANIFEST_FILE
+from prediction import RentalPricePredictor
+
+logger = logging.getLogger(__name__)
+
+ROUTING_FILE = 'routing.json'
+DEFAULT_MODEL = 'bundle'
+
+# Seconds between checks of the models directory for new or changed bundles
+DEFAULT_POLL_INTERVAL = 5.0
+
+RegisteredModel = collections.namedtuple('RegisteredModel', ['name', 'version', 'path', 'predictor', 'signature'])
+
+class RegistrySnapshot:
+    """
+    Immutable set of loaded models with the routing between them.
+    """
+    def __init__(self, models, default, weights):
+        self.models = dict(models)
+        self.default = default
+        self.weights = dict(weights)
+
+        # Cumulative weights in name order, for routing by a uniform draw
+        self.routed_names = sorted(name for name, weight in self.weights.items() if weight > 0)
+        routed_weights = np.array([self.weights[name] for name in self.routed_names], dtype=np.float64)
+        self.cumulative_weights = np.cumsum(routed_weights) / routed_weights.sum() if len(routed_weights) else routed_weights
+
+    def get(self, name=None, version=None):
+        """
+        Return a model by name, by version, or the default model.
+        """
+        if version is not None:
+            for model in self.models.values():
+                if model.version == version and (name is None or model.name == name):
+                    return model
+            raise KeyError(f"No model with version {version}")
+        name = self.default if name is None else name
+        if name not in self.models:
+            raise KeyError(f"No model named {name}")
+        return self.models[name]
+
+    def route(self, key=None):
+        """
+        Pick a model by the A/B weights.
+
+        The same key (e.g. a session or user id) always gets the same model
+        across requests and processes; without a key the draw is random.
+        """
+        if not self.routed_names:
+            return self.get()
+        if key is None:
+            draw = random.random()
+        else:
+            draw = zlib.crc32(str(key).encode('utf-8')) / 2**32
+        index = int(np.searchsorted(self.cumulative_weights, draw, side='right'))
+        return self.models[self.routed_names[min(index, len(self.routed_names) - 1)]]
+
+    def describe(self):
+        return {
+            'default': self.default,
+            'weights': self.weights,
+            'models': {name: model.version for name, model in sorted(self.models.items())},
+        }
+
+class ModelRegistry:
+    """
+    Named predictors loaded from the bundles in a models directory.
+    """
+    def __init__(self, models_dir, poll_interval=DEFAULT_POLL_INTERVAL, **predictor_options):
+        """
+        predictor_options are passed to every RentalPricePredictor, e.g.
+        use_fast_scorer or cache_size. With a poll_interval, get() and route()
+        check the directory at most that often and reload in the background;
+        with None, only refresh() reloads.
+        """
+        self.models_dir = models_dir
+        self.poll_interval = poll_interval
+        self.predictor_options = predictor_options
+        self.snapshot = RegistrySnapshot({}, None, {})
+
+        self._refresh_lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._signature = None
+        if models_dir is not None:
+            self.refresh()
+
+    @classmethod
+    def from_predictor(cls, predictor, name=DEFAULT_MODEL):
+        """
+        Wrap an already loaded predictor in a registry that never reloads.
+        """
+        registry = cls(None, poll_interval=None)
+        model = RegisteredModel(name, predictor.model_version, predictor.model_path, predictor, None)
+        registry.snapshot = RegistrySnapshot({name: model}, name, {})
+        return registry
+
+    def bundle_dirs(self):
+        """
+        Return the model name and path of every bundle directory, by name.
+        """
+        bundles = {}
+        for entry in sorted(os.listdir(self.models_dir)):
+            path = os.path.join(self.models_dir, entry)
+            # Directories still being written have no manifest yet and are skipped
+            if os.path.isfile(os.path.join(path, MANIFEST_FILE)) and not entry.endswith('.tmp'):
+                bundles[entry] = path
+        return bundles
+
+    def directory_signature(self):
+        """
+        Return the modification times and sizes of every manifest, interval
+        table, drift profile and the routing file, which change whenever a
+        model does.
+        """
+        paths = [os.path.join(self.models_dir, ROUTING_FILE), os.path.join(self.models_dir, INTERVALS_FILE)]
+        for path in self.bundle_dirs().values():
+            paths += [os.path.join(path, MANIFEST_FILE), os.path.join(path, INTERVALS_FILE),
+                      os.path.join(path, DRIFT_PROFILE_FILE)]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def intervals_path(self, bundle_path):
+        """
+        Return the interval table for a bundle: its own, else the shared one, if any.
+
+        Tables calibrated for another model version are ignored when loaded.
+        """
+        for path in (os.path.join(bundle_path, INTERVALS_FILE), os.path.join(self.models_dir, INTERVALS_FILE)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load_model(self, name, path):
+        options = dict(self.predictor_options, auto_reload=False)
+        options.setdefault('intervals_path', self.intervals_path(path))
+
+        predictor = RentalPricePredictor(path, **options)
+        return RegisteredModel(name, predictor.model_version, path, predictor, predictor.signature)
+
+    def _load_routing(self, names):
+        routing_path = os.path.join(self.models_dir, ROUTING_FILE)
+        routing = {}
+        if os.path.exists(routing_path):
+            try:
+                with open(routing_path, encoding='utf-8') as f:
+                    routing = json.load(f)
+            except ValueError as e:
+                logger.error(f"Ignoring invalid {routing_path}: {str(e)}")
+        if not isinstance(routing, dict):
+            logger.error(f"Ignoring invalid {routing_path}: expected a JSON object")
+            routing = {}
+
+        default = routing.get('default', DEFAULT_MODEL)
+        if not isinstance(default, str) or default not in names:
+            default = DEFAULT_MODEL if DEFAULT_MODEL in names else (sorted(names)[0] if names else None)
+
+        routed = routing.get('weights', {})
+        if not isinstance(routed, dict):
+            logger.error(f"Ignoring invalid weights in {routing_path}: expected a JSON object")
+            routed = {}
+        weights = {}
+        for name, weight in routed.items():
+            if name not in names:
+                logger.warning(f"Routing weight for unknown model {name} ignored")
+            elif isinstance(weight, bool) or not isinstance(weight, (int, float)) or not math.isfinite(weight):
+                logger.error(f"Ignoring invalid routing weight {weight!r} for model {name}")
+            elif weight > 0:
+                weights[name] = float(weight)
+        return default, weights
+
+    def refresh(self):
+        """
+        Load new and changed bundles and swap in the new snapshot.
+
+        Unchanged models are carried over as they are. A bundle that fails to
+        load keeps its previous version, if there was one. Returns True if
+        the snapshot changed.
+        """
+        with self._refresh_lock:
+            self._last_check = time.monotonic()
+            signature = self.directory_signature()
+            if signature == self._signature:
+                return False
+
+            current = self.snapshot.models
+            models = {}
+            for name, path in self.bundle_dirs().items():
+                previous = current.get(name)
+                try:
+                    if (previous is not None and previous.predictor.intervals_path == self.intervals_path(path)
+                            and previous.predictor.artifact_signature() == previous.signature):
+                        models[name] = previous
+                        continue
+                    models[name] = self._load_model(name, path)
+                    if self._signature is not None:
+                        logger.warning(f"Hot-loaded model {name} version {models[name].version}")
+                except Exception as e:
+                    logger.error(f"Error loading model {name}: {str(e)}")
+                    if previous is not None:
+                        models[name] = previous
+
+            if not models:
+                raise ValueError(f"No loadable model bundle in {self.models_dir}")
+
+            default, weights = self._load_routing(models)
+            self.snapshot = RegistrySnapshot(models, default, weights)
+            self._signature = signature
+            return True
+
+    def _maybe_refresh(self):
+        """
+        Start a background refresh if the poll interval has passed and the
+        directory changed; requests keep using the current snapshot meanwhile.
+        """
+        if self.poll_interval is None or time.monotonic() - self._last_check < self.poll_interval:
+            return
+        if self._refresh_lock.locked():
+            return
+        self._last_check = time.monotonic()
+        try:
+            changed = self.directory_signature() != self._signature
+        except OSError:
+            return
+        if changed:
+            threading.Thread(target=self._refresh_quietly, name='model-registry-refresh', daemon=True).start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing the model registry: {str(e)}")
+
+    def get(self, name=None, version=None):
+        self._maybe_refresh()
+        return self.snapshot.get(name, version)
+
+    def route(self, key=None):
+        self._maybe_refresh()
+        return self.snapshot.route(key)
+
+    def describe(self):
+        return self.snapshot.describe()
+
+    def prepare_for_fork(self, nthread=1):
+        """
+        Get the loaded models ready to be shared by forked worker processes.
+
+        Each predictor scores one listing so anything built lazily exists
+        before the fork, XGBoost is limited to nthread threads per worker
+        (an OpenMP pool started in the parent does not survive fork), and the
+        loaded objects are moved out of the garbage collector's reach so
+        collections in the workers don't write to, and so copy, their pages.
+        """
+        for model in self.snapshot.models.values():
+            model.predictor.model.get_booster().set_param({'nthread': nthread})
+            model.predictor.predict({})
+            if model.predictor.monitor is not None:
+                # Workers start counting from zero, not from the warm-up listing
+                model.predictor.monitor.reset()
+        gc.collect()
+        gc.freeze()
+
+def load_registry(models_dir, **kwargs):
+    """
+    Load the registry of models_dir, falling back to a single predictor from
+    the pickled artifacts when the directory holds no bundle that loads.
+    """
+    try:
+        return ModelRegistry(models_dir, **kwargs)
+    except ValueError as e:
+        from prediction import load_pickled_predictor
+
+        kwargs.pop('poll_interval', None)
+        # Not load_default_predictor: it would pick a corrupt bundle again
+        logger.warning(f"{str(e)}, serving the pickled model")
+        return ModelRegistry.from_predictor(load_pickled_predictor(models_dir, **kwargs), name='pickle')
@@ -1,53 +1,272 @@
 import os
 import pickle
+import sys
 import numpy as np
-import pandas as pd
 import logging
+import threading
+
+from drift import DRIFT_PROFILE_FILE, load_monitor
+from explainer import TreeExplainer
+from fast_scorer import FastScorer
+from instrumentation import increment, observe, timer
+from intervals import INTERVALS_FILE, load_intervals
+from model_bundle import ArrayPreprocessor, load_bundle, MANIFEST_FILE
+from prediction_cache import PredictionCache
+from sensitivity import SensitivitySweep
 
 # Set up logging with less verbose output for production
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of rows transformed and scored at once by the batch API
+BATCH_CHUNK_SIZE = 50000
+
+# Lists of feature dicts up to this size go through the fast scorer when enabled
+FAST_BATCH_LIMIT = 256
+
+# Rows explained per booster call; contributions are dense, one column per model input
+EXPLAIN_CHUNK_SIZE = 4096
+
+# Model input features, in the column order of the preprocessor output
+NUMERIC_FEATURES = [
+    'log_area', 'bathrooms', 'floor_to_height_ratio', 
+    'total_floors', 'parking_spaces', 'luxury_score'
+]
+BINARY_FEATURES = [
+    'has_elevator', 'has_doorman', 'has_balcony', 
+    'has_external_exposure', 'has_furnished'
+]
+CATEGORICAL_FEATURES = ['region_standardized', 'city']
+
+# Amenities too rare to be features of their own; luxury_score counts them
+RARE_AMENITIES = [
+    'has_terrace', 'has_garden', 'has_air_conditioning', 
+    'has_storage_room', 'has_cellar'
+]
+
+def is_frame(features):
+    """
+    Return True for a pandas DataFrame, without importing pandas if nothing else has.
+    """
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(features, pandas.DataFrame)
+
 class RentalPricePredictor:
-    def __init__(self, model_path, preprocessor_path):
+    def __init__(self, model_path, preprocessor_path=None, use_fast_scorer=False,
+                 cache_size=0, cache_ttl=None, intervals_path=None, auto_reload=True,
+                 monitor_drift=True):
         """
         Initialize the predictor with model and preprocessor paths.
+        
+        If preprocessor_path is omitted, model_path is a model bundle directory
+        (see model_bundle) and everything is loaded from it without pickle.
+        
+        With use_fast_scorer, single predictions skip pandas and the
+        ColumnTransformer and go through a compiled FastScorer instead.
+        A positive cache_size memoizes single predictions in an LRU cache
+        whose entries expire after cache_ttl seconds.
+        
+        intervals_path points to a calibrated interval table (see intervals);
+        without one, confidence bounds are a fixed ±10% of the prediction.
+        
+        With monitor_drift, a bundle holding a drift profile gets a
+        DriftMonitor (see drift) that counts every listing predicted.
+        
+        With auto_reload, cached predictions check the artifacts for changes
+        and reload them in place; a ModelRegistry turns this off because it
+        replaces whole predictors instead.
+        """
+        self.model_path = model_path
+        self.preprocessor_path = preprocessor_path
+        self.use_fast_scorer = use_fast_scorer
+        self.intervals_path = intervals_path
+        self.auto_reload = auto_reload
+        self.monitor_drift = monitor_drift
+        
+        # Define feature groups based on training
+        self.numeric_features = list(NUMERIC_FEATURES)
+        self.binary_features = list(BINARY_FEATURES)
+        self.categorical_features = list(CATEGORICAL_FEATURES)
+        
+        # Define rare amenities for luxury score calculation
+        self.rare_amenities = list(RARE_AMENITIES)
+        
+        self.load_artifacts()
+        
+        self.cache = PredictionCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self._reload_lock = threading.Lock()
+        self._failed_signature = None
+
+    def artifact_signature(self):
+        """
+        Return the modification time and size of the model and preprocessor files,
+        or of the manifest and drift profile for a bundle, and of the interval
+        table if there is one.
+        """
+        if self.preprocessor_path is None:
+            paths = [os.path.join(self.model_path, MANIFEST_FILE)]
+            profile_path = os.path.join(self.model_path, DRIFT_PROFILE_FILE)
+            if os.path.exists(profile_path):
+                paths.append(profile_path)
+        else:
+            paths = [self.model_path, self.preprocessor_path]
+        if self.intervals_path is not None and os.path.exists(self.intervals_path):
+            paths.append(self.intervals_path)
+        
+        signature = []
+        for path in paths:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def load_artifacts(self):
+        """
+        Load the model and preprocessor from disk.
+        
+        Everything is loaded before any of it replaces the current artifacts,
+        which are then swapped in with a single update, so a failed load leaves
+        the predictor serving the model it had.
+        """
+        try:
+            signature = self.artifact_signature()
+        except OSError:
+            signature = None
+        metadata = None
+        model_version = None
+        
+        if self.preprocessor_path is None:
+            try:
+                bundle = load_bundle(self.model_path)
+            except Exception as e:
+                logger.error(f"Error loading model bundle: {str(e)}")
+                raise ValueError(f"Failed to load model bundle: {str(e)}")
+            
+            model = bundle.model
+            preprocessor = bundle.preprocessor
+            metadata = bundle.metadata
+            model_version = bundle.version
+        else:
+            model, preprocessor = self._load_pickles()
+        
+        fast_scorer = None
+        if self.use_fast_scorer:
+            fast_scorer = FastScorer(model, self.layout(preprocessor), self.rare_amenities)
+        
+        intervals = None
+        if self.intervals_path is not None:
+            intervals = load_intervals(self.intervals_path, model_version)
+        
+        monitor = None
+        if self.monitor_drift and self.preprocessor_path is None:
+            monitor = load_monitor(os.path.join(self.model_path, DRIFT_PROFILE_FILE), model_version)
+        
+        # Predictions running meanwhile see either all old or all new artifacts
+        self.__dict__.update({
+            'signature': signature,
+            'model': model,
+            'preprocessor': preprocessor,
+            'metadata': metadata,
+            'model_version': model_version,
+            'fast_scorer': fast_scorer,
+            'explainer': None,
+            'sweeper': None,
+            'intervals': intervals,
+            'monitor': monitor,
+        })
+
+    def layout(self, preprocessor=None):
+        """
+        Return the preprocessor as an ArrayPreprocessor describing the model inputs.
+        """
+        if preprocessor is None:
+            preprocessor = self.preprocessor
+        if isinstance(preprocessor, ArrayPreprocessor):
+            return preprocessor
+        return ArrayPreprocessor.from_column_transformer(
+            preprocessor, self.numeric_features,
+            self.binary_features, self.categorical_features
+        )
+
+    def _load_pickles(self):
+        """
+        Load the pickled model and preprocessor.
         """
         try:
-            with open(model_path, 'rb') as model_file:
-                self.model = pickle.load(model_file)
+            with open(self.model_path, 'rb') as model_file:
+                model = pickle.load(model_file)
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise ValueError(f"Failed to load model: {str(e)}")
             
         try:
-            with open(preprocessor_path, 'rb') as preprocessor_file:
-                self.preprocessor = pickle.load(preprocessor_file)
+            with open(self.preprocessor_path, 'rb') as preprocessor_file:
+                preprocessor = pickle.load(preprocessor_file)
         except Exception as e:
             logger.error(f"Error loading preprocessor: {str(e)}")
             raise ValueError(f"Failed to load preprocessor: {str(e)}")
         
-        # Define feature groups based on training
-        self.numeric_features = [
-            'log_area', 'bathrooms', 'floor_to_height_ratio', 
-            'total_floors', 'parking_spaces', 'luxury_score'
-        ]
-        self.binary_features = [
-            'has_elevator', 'has_doorman', 'has_balcony', 
-            'has_external_exposure', 'has_furnished'
-        ]
-        self.categorical_features = ['region_standardized', 'city']
+        return model, preprocessor
+
+    def reload_if_changed(self):
+        """
+        Reload the artifacts and drop cached predictions if either file changed.
         
-        # Define rare amenities for luxury score calculation
-        self.rare_amenities = [
-            'has_terrace', 'has_garden', 'has_air_conditioning', 
-            'has_storage_room', 'has_cellar'
-        ]
+        If the changed artifacts fail to load, the loaded model keeps serving
+        and the reload is not retried until the files change again.
+        """
+        try:
+            signature = self.artifact_signature()
+        except OSError:
+            # The files may be mid-replacement; keep serving the loaded model
+            return False
+        if signature == self.signature or signature == self._failed_signature:
+            return False
+        
+        with self._reload_lock:
+            if signature != self.signature and signature != self._failed_signature:
+                logger.warning("Model artifacts changed on disk, reloading")
+                try:
+                    self.load_artifacts()
+                except Exception as e:
+                    logger.error(f"Error reloading model artifacts, keeping model {self.model_version}: {str(e)}")
+                    self._failed_signature = signature
+                    return False
+                if self.cache is not None:
+                    self.cache.clear()
+        return True
+
+    def model_inputs(self, features):
+        """
+        Return the values the model consumes for one feature dict, in training order.
+        
+        These are the values of the row built by preprocess_features, without
+        going through pandas. Keys the model ignores do not affect the result.
+        """
+        luxury_score = sum(1 for amenity in self.rare_amenities if features.get(amenity) == 1)
+        
+        values = []
+        for feature in self.numeric_features + self.binary_features + self.categorical_features:
+            if feature == 'luxury_score':
+                values.append(luxury_score)
+            elif feature in self.categorical_features:
+                values.append(features.get(feature, "unknown"))
+            else:
+                values.append(features.get(feature, 0))
+        
+        return tuple(values)
+
+    def cache_stats(self):
+        """
+        Return the prediction cache counters, or None when caching is disabled.
+        """
+        return self.cache.stats() if self.cache is not None else None
 
     def preprocess_features(self, features):
         """
         Prepare features for prediction by ensuring they match the expected format.
         """
+        import pandas as pd
+        
         # Convert to DataFrame
         features_df = pd.DataFrame([features])
         
@@ -77,35 +296,400 @@ class RentalPricePredictor:
         
         return features_df
 
+    def records_to_frame(self, records):
+        """
+        Convert a list of feature dicts into a DataFrame of the model inputs.
+        
+        Keys missing from a record get the same defaults as preprocess_features,
+        so every row is prepared exactly as it would be on its own.
+        """
+        import pandas as pd
+        
+        required_features = self.numeric_features + self.binary_features + self.categorical_features
+        columns = {}
+        for feature in required_features:
+            default = "unknown" if feature in self.categorical_features else 0
+            columns[feature] = [record.get(feature, default) for record in records]
+        for amenity in self.rare_amenities:
+            columns[amenity] = [record.get(amenity, 0) for record in records]
+        
+        return pd.DataFrame(columns)
+
+    def preprocess_frame(self, features_df):
+        """
+        Prepare a batch of features for prediction using column operations.
+        """
+        import pandas as pd
+        
+        # Calculate luxury score as the number of rare amenities set to 1
+        luxury_score = np.zeros(len(features_df), dtype=np.int64)
+        for amenity in self.rare_amenities:
+            if amenity in features_df.columns:
+                luxury_score += (features_df[amenity] == 1).to_numpy(dtype=np.int64)
+        
+        required_features = self.numeric_features + self.binary_features + self.categorical_features
+        
+        # Build the output from the required columns only, filling defaults for absent ones
+        columns = {}
+        for feature in required_features:
+            if feature == 'luxury_score':
+                columns[feature] = luxury_score
+            elif feature in features_df.columns:
+                columns[feature] = features_df[feature].to_numpy()
+            elif feature in self.categorical_features:
+                columns[feature] = np.full(len(features_df), "unknown", dtype=object)
+            else:
+                columns[feature] = np.zeros(len(features_df), dtype=np.int64)
+        
+        return pd.DataFrame(columns, columns=required_features)
+
     def predict(self, features):
         """
         Make a prediction based on input features.
         """
+        prediction = self._predict_cached(features)
+        if self.monitor is not None:
+            self.monitor.observe(features, prediction)
+        return prediction
+
+    def _predict_cached(self, features):
+        """
+        Make a prediction through the cache, if there is one.
+        """
+        if self.cache is None:
+            return self._predict_uncached(features)
+        
+        if self.auto_reload:
+            self.reload_if_changed()
+        try:
+            key = self.model_inputs(features)
+            hash(key)
+        except TypeError:
+            # Unhashable feature values cannot be cached
+            return self._predict_uncached(features)
+        
+        prediction = self.cache.get(key)
+        if prediction is None:
+            increment('prediction_cache_misses')
+            prediction = self._predict_uncached(features)
+            self.cache.put(key, prediction)
+        else:
+            increment('prediction_cache_hits')
+        return prediction
+
+    def _predict_uncached(self, features):
+        """
+        Make a prediction without consulting the cache.
+        """
         try:
+            fast_scorer, preprocessor, model = self.fast_scorer, self.preprocessor, self.model
+            if fast_scorer is not None:
+                return fast_scorer.score(features)
+            
             # Preprocess features
-            features_df = self.preprocess_features(features)
+            with timer('preprocess'):
+                features_df = self.preprocess_features(features)
             
             # Apply the column transformer
-            X_processed = self.preprocessor.transform(features_df)
+            with timer('transform'):
+                X_processed = preprocessor.transform(features_df)
             
             # Make prediction (model was trained on log_price)
-            log_prediction = self.model.predict(X_processed)[0]
+            with timer('booster'):
+                log_prediction = model.predict(X_processed)[0]
             
             # Convert from log scale back to original scale
             return np.exp(log_prediction)
             
+        except (ValueError, TypeError) as e:
+            # Feature values the model cannot read are the caller's error
+            raise ValueError(f"Invalid listing features: {str(e)}")
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
             raise RuntimeError(f"Prediction failed: {str(e)}")
             
-    def predict_with_confidence(self, features):
+    def predict_with_confidence(self, features, coverage=None):
         """
         Make a prediction with confidence bounds.
+        
+        With a calibrated interval table the bounds are expected to contain the
+        actual rent with probability coverage (default 90%) for the listing's
+        region and price band.
         """
         predicted_price = self.predict(features)
         
+        if self.intervals is not None:
+            lower_bound, upper_bound = self.intervals.bounds_one(
+                predicted_price, features.get('region_standardized'), coverage
+            )
+            return predicted_price, lower_bound, upper_bound
+        
         # Calculate confidence bounds (10% range)
         lower_bound = predicted_price * 0.9
         upper_bound = predicted_price * 1.1
         
-        return predicted_price, lower_bound, upper_bound
\ No newline at end of file
+        return predicted_price, lower_bound, upper_bound
+
+    def predict_frame(self, features_df, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Make predictions for every row of a DataFrame of listing features.
+        
+        Rows are processed in chunks of chunk_size, with a single transform and
+        a single model call per chunk. Returns a NumPy array of prices.
+        """
+        try:
+            preprocessor, model = self.preprocessor, self.model
+            predictions = np.empty(len(features_df), dtype=np.float32)
+            observe('batch_rows', len(features_df))
+            
+            for start in range(0, len(features_df), chunk_size):
+                with timer('preprocess'):
+                    chunk = self.preprocess_frame(features_df.iloc[start:start + chunk_size])
+                with timer('transform'):
+                    X_processed = preprocessor.transform(chunk)
+                with timer('booster'):
+                    predictions[start:start + len(chunk)] = model.predict(X_processed)
+            
+            # Convert from log scale back to original scale
+            return np.exp(predictions)
+            
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid listing features: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error during batch prediction: {str(e)}")
+            raise RuntimeError(f"Batch prediction failed: {str(e)}")
+
+    def predict_batch(self, features, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Make predictions for a batch of listings.
+        
+        Accepts a DataFrame, a list of feature dicts or a mapping of column
+        names to NumPy arrays. Results match predict row for row.
+        """
+        predictions = self._predict_batch(features, chunk_size)
+        if self.monitor is not None:
+            self.monitor.observe_batch(features, predictions)
+        return predictions
+
+    def _predict_batch(self, features, chunk_size):
+        if is_frame(features):
+            features_df = features
+        elif isinstance(features, list) and self.fast_scorer is not None and len(features) <= FAST_BATCH_LIMIT:
+            try:
+                observe('batch_rows', len(features))
+                return self.fast_scorer.score_batch(features)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Invalid listing features: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error during batch prediction: {str(e)}")
+                raise RuntimeError(f"Batch prediction failed: {str(e)}")
+        elif isinstance(features, dict):
+            import pandas as pd
+            features_df = pd.DataFrame(features)
+        else:
+            features_df = self.records_to_frame(features)
+        
+        return self.predict_frame(features_df, chunk_size)
+
+    def get_explainer(self):
+        """
+        Return the TreeExplainer of the loaded model, creating it on first use.
+        """
+        explainer = self.explainer
+        if explainer is None:
+            model, preprocessor = self.model, self.preprocessor
+            explainer = TreeExplainer(model, self.layout(preprocessor))
+            # Keep it only if no reload swapped the model in the meantime
+            if self.model is model:
+                self.explainer = explainer
+        return explainer
+
+    def explain(self, features):
+        """
+        Explain a single prediction.
+        
+        Returns a dict mapping each model feature to its contribution to the
+        log price, with region_standardized and city folded back from their
+        one-hot columns, plus base_value. The values sum to the log of the
+        predicted price, so exp(value) is the factor a feature applies to it.
+        """
+        if self.cache is None:
+            return self._explain_uncached(features)
+        
+        if self.auto_reload:
+            self.reload_if_changed()
+        try:
+            key = ('explain', self.model_inputs(features))
+            hash(key)
+        except TypeError:
+            return self._explain_uncached(features)
+        
+        explanation = self.cache.get(key)
+        if explanation is None:
+            increment('explanation_cache_misses')
+            explanation = self._explain_uncached(features)
+            self.cache.put(key, explanation)
+        else:
+            increment('explanation_cache_hits')
+        return dict(explanation)
+
+    def _explain_uncached(self, features):
+        try:
+            explainer = self.get_explainer()
+            if self.fast_scorer is not None:
+                row = self.fast_scorer.transform(features)
+            else:
+                row = self.preprocessor.transform(self.preprocess_features(features))
+            
+            with timer('explain'):
+                contributions = explainer.contributions(row)[0]
+            return dict(zip(explainer.output_names, contributions.tolist()))
+            
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid listing features: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error during explanation: {str(e)}")
+            raise RuntimeError(f"Explanation failed: {str(e)}")
+
+    def explain_batch(self, features, chunk_size=EXPLAIN_CHUNK_SIZE, exact=False):
+        """
+        Explain the predictions for a batch of listings.
+        
+        Accepts the same inputs as predict_batch and returns a DataFrame with
+        one row per listing and the columns of explain. Contributions are the
+        approximate per-split attributions, which also sum to the log price;
+        exact tree SHAP, as explain returns, is opt-in since it runs about 50
+        times slower (around 40 rows/s on one core).
+        """
+        import pandas as pd
+        
+        if isinstance(features, pd.DataFrame):
+            features_df = features
+        elif isinstance(features, dict):
+            features_df = pd.DataFrame(features)
+        else:
+            features_df = self.records_to_frame(features)
+        
+        try:
+            explainer = self.get_explainer()
+            contributions = np.empty((len(features_df), len(explainer.output_names)), dtype=np.float32)
+            
+            for start in range(0, len(features_df), chunk_size):
+                chunk = self.preprocess_frame(features_df.iloc[start:start + chunk_size])
+                X_processed = self.preprocessor.transform(chunk)
+                with timer('explain'):
+                    contributions[start:start + len(chunk)] = explainer.contributions(X_processed, approximate=not exact)
+            
+            return pd.DataFrame(contributions, columns=explainer.output_names, index=features_df.index)
+            
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid listing features: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error during batch explanation: {str(e)}")
+            raise RuntimeError(f"Batch explanation failed: {str(e)}")
+
+    def get_sweeper(self):
+        """
+        Return the SensitivitySweep of the loaded model, creating it on first use.
+        """
+        sweeper = self.sweeper
+        if sweeper is None:
+            model, preprocessor, fast_scorer = self.model, self.preprocessor, self.fast_scorer
+            scorer = fast_scorer or FastScorer(model, self.layout(preprocessor), self.rare_amenities)
+            sweeper = SensitivitySweep(scorer)
+            if self.model is model:
+                self.sweeper = sweeper
+        return sweeper
+
+    def sweep(self, features, dimensions):
+        """
+        Predict prices for every combination of varied features of one listing.
+        
+        dimensions maps features to the values to try, e.g.
+        {'area': [60, 80, 100], 'has_elevator': [0, 1]}; see sensitivity.
+        The listing is encoded once and the grid is scored in one booster
+        call. Returns a Sweep with one price axis per dimension.
+        """
+        try:
+            return self.get_sweeper().sweep(features, dimensions)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during sweep: {str(e)}")
+            raise RuntimeError(f"Sweep failed: {str(e)}")
+
+    def what_if(self, features, areas=None, floor_ratios=None, amenities=None):
+        """
+        Price curves over area and floor ratio and the price effect of each
+        amenity for one listing, scored as one grid.
+        """
+        try:
+            return self.get_sweeper().what_if(features, areas, floor_ratios, amenities)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during what-if analysis: {str(e)}")
+            raise RuntimeError(f"What-if analysis failed: {str(e)}")
+
+    def batch_regions(self, features):
+        """
+        Return the region of every listing in a batch accepted by predict_batch.
+        """
+        if is_frame(features):
+            if 'region_standardized' in features.columns:
+                return features['region_standardized'].to_numpy(dtype=object)
+            return np.full(len(features), "unknown", dtype=object)
+        if isinstance(features, dict):
+            return np.asarray(features.get('region_standardized', "unknown"), dtype=object)
+        return np.array([record.get('region_standardized', "unknown") for record in features], dtype=object)
+
+    def predict_batch_with_confidence(self, features, chunk_size=BATCH_CHUNK_SIZE, coverage=None):
+        """
+        Make predictions with confidence bounds for a batch of listings.
+        
+        Returns three NumPy arrays: predicted prices, lower bounds and upper bounds.
+        Calibrated bounds are looked up for the whole batch at once, after the
+        single model pass.
+        """
+        predicted_prices = self.predict_batch(features, chunk_size)
+        
+        if self.intervals is not None:
+            lower_bounds, upper_bounds = self.intervals.bounds(
+                predicted_prices, self.batch_regions(features), coverage
+            )
+            return predicted_prices, lower_bounds, upper_bounds
+        
+        # Calculate confidence bounds (10% range)
+        lower_bounds = predicted_prices * 0.9
+        upper_bounds = predicted_prices * 1.1
+        
+        return predicted_prices, lower_bounds, upper_bounds
+
+def load_default_predictor(models_dir, **kwargs):
+    """
+    Load the predictor from models_dir, preferring the model bundle over the pickles.
+    
+    The calibrated interval table in models_dir is used when present.
+    """
+    intervals_path = os.path.join(models_dir, INTERVALS_FILE)
+    if os.path.exists(intervals_path):
+        kwargs.setdefault('intervals_path', intervals_path)
+    
+    bundle_path = os.path.join(models_dir, 'bundle')
+    if os.path.exists(os.path.join(bundle_path, MANIFEST_FILE)):
+        return RentalPricePredictor(bundle_path, **kwargs)
+    
+    return load_pickled_predictor(models_dir, **kwargs)
+
+def load_pickled_predictor(models_dir, **kwargs):
+    """
+    Load the predictor from the pickled model and preprocessor in models_dir,
+    whether or not it also holds a model bundle.
+    """
+    intervals_path = os.path.join(models_dir, INTERVALS_FILE)
+    if os.path.exists(intervals_path):
+        kwargs.setdefault('intervals_path', intervals_path)
+    
+    model_path = os.path.join(models_dir, 'best_xgb_model.pkl')
+    preprocessor_path = os.path.join(models_dir, 'preprocessor.pkl')
+    return RentalPricePredictor(model_path, preprocessor_path, **kwargs)
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache for predictions, bounded by size and entry age.
+    """
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Initialize the cache with a maximum number of entries and an optional
+        time to live in seconds.
+        """
+        if max_size <= 0:
+            raise ValueError("Cache size must be positive")
+        
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entries when full.
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry, e.g. after the model has changed.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """
+        Return the cache counters as a dict.
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,134 @@
+"""
+Price distribution charts rendered from precomputed bins.
+
+A distribution is a histogram over a fixed bin spec plus a kernel density
+curve computed on a fine grid of the same bins: the counts are smoothed with
+a Gaussian kernel by FFT convolution, so the cost depends on the number of
+bins rather than the number of listings. Distributions drawn from a
+PriceStatistics are cached per (region, city, bin spec), and charts are drawn
+on their own matplotlib Figure instead of the shared pyplot state, so
+concurrent sessions cannot draw over each other.
+"""
+import collections
+import functools
+import weakref
+import numpy as np
+
+# bins: histogram bars; upper_quantile: right end of the chart, so a few
+# luxury listings don't flatten it; oversample: KDE grid points per bar
+BinSpec = collections.namedtuple('BinSpec', ['bins', 'upper_quantile', 'oversample'])
+DEFAULT_BIN_SPEC = BinSpec(bins=50, upper_quantile=0.99, oversample=10)
+
+PriceDistribution = collections.namedtuple(
+    'PriceDistribution', ['edges', 'counts', 'kde_prices', 'kde_counts', 'total']
+)
+
+DISTRIBUTION_CACHE_SIZE = 256
+
+# Kernels are cut off this many bandwidths from their centre
+KERNEL_RADIUS = 4
+
+def scott_bandwidth(centres, counts):
+    """
+    Scott's rule bandwidth for binned data, as used by seaborn's KDE.
+    """
+    total = counts.sum()
+    if total <= 1:
+        return 0.0
+    mean = np.dot(centres, counts) / total
+    std = np.sqrt(np.dot((centres - mean) ** 2, counts) / total)
+    return std * total ** (-1 / 5)
+
+def binned_kde(counts, step, bandwidth):
+    """
+    Smooth counts on an evenly spaced grid with a Gaussian kernel.
+
+    The kernel is sampled on the grid and applied by zero-padded FFT
+    convolution, so the total count is preserved and the result is in
+    listings per grid step.
+    """
+    radius = int(np.ceil(KERNEL_RADIUS * bandwidth / step))
+    if radius == 0:
+        return counts.astype(np.float64)
+
+    offsets = np.arange(-radius, radius + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+
+    size = len(counts) + len(kernel) - 1
+    smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+    return np.maximum(smoothed[radius:radius + len(counts)], 0)
+
+def _distribution(upper, fine_counts, spec):
+    """
+    Build the histogram and KDE curve from counts on the fine grid over [0, upper].
+    """
+    fine_counts = np.asarray(fine_counts, dtype=np.float64)
+    fine_edges = np.linspace(0, upper, spec.bins * spec.oversample + 1)
+    step = fine_edges[1] - fine_edges[0]
+    centres = fine_edges[:-1] + step / 2
+
+    smoothed = binned_kde(fine_counts, step, scott_bandwidth(centres, fine_counts))
+    return PriceDistribution(
+        edges=fine_edges[::spec.oversample],
+        counts=fine_counts.reshape(spec.bins, spec.oversample).sum(axis=1),
+        kde_prices=centres,
+        # Scale from listings per grid step to listings per histogram bar
+        kde_counts=smoothed * spec.oversample,
+        total=fine_counts.sum(),
+    )
+
+def _upper_edge(upper):
+    return upper if np.isfinite(upper) and upper > 0 else 1.0
+
+def frame_distribution(prices, spec=DEFAULT_BIN_SPEC):
+    """
+    Build a distribution from raw prices, in one pass of binning.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[np.isfinite(prices)]
+    upper = _upper_edge(np.quantile(prices, spec.upper_quantile) if len(prices) else np.nan)
+    fine_counts, _ = np.histogram(prices, bins=spec.bins * spec.oversample, range=(0, upper))
+    return _distribution(upper, fine_counts, spec)
+
+def stats_distribution(stats, region=None, city=None, spec=DEFAULT_BIN_SPEC):
+    """
+    Build a distribution from the buckets of a PriceStatistics, cached per
+    (region, city, bin spec) until the statistics change.
+    """
+    return _stats_distribution(weakref.ref(stats), stats.version, region, city, spec)
+
+# Keyed on a weak reference, so cached distributions don't keep old statistics alive
+@functools.lru_cache(maxsize=DISTRIBUTION_CACHE_SIZE)
+def _stats_distribution(stats_ref, version, region, city, spec):
+    stats = stats_ref()
+    upper = _upper_edge(stats.quantiles(spec.upper_quantile, region, city)[0])
+    fine_edges = np.linspace(0, upper, spec.bins * spec.oversample + 1)
+    return _distribution(upper, stats.histogram(fine_edges, region, city), spec)
+
+def chart_title(region=None, city=None):
+    if city:
+        return f'Price Distribution in {city}, {region}'
+    if region:
+        return f'Price Distribution in {region}'
+    return 'Price Distribution Across Italy'
+
+def render_distribution(distribution, title):
+    """
+    Draw a distribution as a histogram with its KDE curve on a new Figure.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6), layout='tight')
+    ax = fig.subplots()
+    # Filled steps plus bar outlines: a few artists instead of one patch per bar
+    edges, counts = distribution.edges, distribution.counts
+    ax.stairs(counts, edges, fill=True, color='C0', alpha=0.5)
+    ax.stairs(counts, edges, color='black', linewidth=0.8, baseline=0)
+    ax.vlines(edges[1:-1], 0, np.minimum(counts[:-1], counts[1:]), color='black', linewidth=0.8)
+    ax.plot(distribution.kde_prices, distribution.kde_counts, color='C0')
+
+    ax.set_title(title)
+    ax.set_xlabel('Monthly Rent (€)')
+    ax.set_ylabel('Frequency')
+    return fig
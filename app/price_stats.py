@@ -0,0 +1,313 @@
+"""
+Mergeable price statistics per region and per (region, city).
+
+Every group keeps a count, sum, minimum, maximum and a log-bucketed price
+sketch (the DDSketch layout: bucket i holds prices in (gamma^(i-1), gamma^i]),
+so quantiles carry a bounded relative error and histograms over any price
+bands can be read off the buckets. Summaries from different batches or
+workers merge by adding arrays, new listings are folded in without rescanning
+the old ones, and a drill-down query costs one dict lookup plus a pass over a
+fixed number of buckets, whatever the number of listings.
+
+Build the statistics from the rental store, or fold in a new batch, with:
+    python -m app.price_stats build
+    python -m app.price_stats update new_listings.csv
+"""
+import argparse
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+STATS_PATH = os.path.join(project_root, 'data', 'italian_rental_stats.npz')
+
+# Key of the group covering every listing
+ALL_LISTINGS = ()
+
+class PriceStatistics:
+    """
+    Incrementally updated price summaries for Italy, each region and each
+    (region, city) pair.
+    """
+    def __init__(self, relative_accuracy=0.02, min_price=1.0, max_price=1e6):
+        """
+        Quantiles are accurate to within relative_accuracy for prices between
+        min_price and max_price; prices outside the range fall in the end buckets.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_price = min_price
+        self.max_price = max_price
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.first_index = math.ceil(math.log(min_price) / self.log_gamma)
+        self.n_buckets = math.ceil(math.log(max_price) / self.log_gamma) - self.first_index + 1
+
+        # Representative price per bucket, within relative_accuracy of every price in it
+        upper_edges = self.gamma ** (np.arange(self.n_buckets) + self.first_index)
+        self.bucket_values = 2 * upper_edges / (self.gamma + 1)
+
+        self.keys = {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0, dtype=np.float64)
+        self.mins = np.zeros(0, dtype=np.float64)
+        self.maxs = np.zeros(0, dtype=np.float64)
+        self.buckets = np.zeros((0, self.n_buckets), dtype=np.int64)
+        # Bumped on every change, so caches of derived results can key on it
+        self.version = 0
+
+    def bucket_index(self, prices):
+        """
+        Map prices to sketch buckets.
+        """
+        index = np.ceil(np.log(np.maximum(prices, self.min_price)) / self.log_gamma) - self.first_index
+        return np.clip(index, 0, self.n_buckets - 1).astype(np.int64)
+
+    def _rows(self, keys):
+        """
+        Return the table rows of the given group keys, adding rows for new keys.
+        """
+        new_keys = [key for key in keys if key not in self.keys]
+        if new_keys:
+            start = len(self.keys)
+            for i, key in enumerate(new_keys):
+                self.keys[key] = start + i
+            extra = len(new_keys)
+            self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+            self.sums = np.concatenate([self.sums, np.zeros(extra)])
+            self.mins = np.concatenate([self.mins, np.full(extra, np.inf)])
+            self.maxs = np.concatenate([self.maxs, np.full(extra, -np.inf)])
+            self.buckets = np.vstack([self.buckets, np.zeros((extra, self.n_buckets), dtype=np.int64)])
+        return np.array([self.keys[key] for key in keys], dtype=np.int64)
+
+    def _add(self, codes, keys, prices, bucket_index):
+        """
+        Accumulate prices into the groups identified by codes into keys.
+        """
+        rows = self._rows(keys)
+        n_groups = len(keys)
+
+        self.counts[rows] += np.bincount(codes, minlength=n_groups)
+        self.sums[rows] += np.bincount(codes, weights=prices, minlength=n_groups)
+        flat = np.bincount(codes * self.n_buckets + bucket_index, minlength=n_groups * self.n_buckets)
+        self.buckets[rows] += flat.reshape(n_groups, self.n_buckets)
+
+        group_min = np.full(n_groups, np.inf)
+        group_max = np.full(n_groups, -np.inf)
+        np.minimum.at(group_min, codes, prices)
+        np.maximum.at(group_max, codes, prices)
+        self.mins[rows] = np.minimum(self.mins[rows], group_min)
+        self.maxs[rows] = np.maximum(self.maxs[rows], group_max)
+
+    def update(self, listings):
+        """
+        Fold a batch of listings (price, region_standardized, city) into the summaries.
+        """
+        listings = listings[['price', 'region_standardized', 'city']]
+        listings = listings[listings['price'].notna() & listings['region_standardized'].notna()]
+        if listings.empty:
+            return self
+
+        prices = listings['price'].to_numpy(dtype=np.float64)
+        bucket_index = self.bucket_index(prices)
+        regions = listings['region_standardized'].astype(str).to_numpy()
+
+        self._add(np.zeros(len(prices), dtype=np.int64), [ALL_LISTINGS], prices, bucket_index)
+
+        codes, uniques = pd.factorize(regions)
+        self._add(codes, [(region,) for region in uniques], prices, bucket_index)
+
+        has_city = listings['city'].notna().to_numpy()
+        pairs = pd.MultiIndex.from_arrays([regions[has_city], listings['city'][has_city].astype(str).to_numpy()])
+        codes, uniques = pd.factorize(pairs)
+        self._add(codes, list(uniques), prices[has_city], bucket_index[has_city])
+
+        self.version += 1
+        return self
+
+    def merge(self, other):
+        """
+        Add another PriceStatistics with the same bucket layout into this one.
+        """
+        if (other.relative_accuracy, other.min_price, other.max_price) != (
+                self.relative_accuracy, self.min_price, self.max_price):
+            raise ValueError("Cannot merge statistics with different bucket layouts")
+
+        keys = list(other.keys)
+        if not keys:
+            return self
+        rows = self._rows(keys)
+        other_rows = np.array([other.keys[key] for key in keys], dtype=np.int64)
+
+        self.counts[rows] += other.counts[other_rows]
+        self.sums[rows] += other.sums[other_rows]
+        self.mins[rows] = np.minimum(self.mins[rows], other.mins[other_rows])
+        self.maxs[rows] = np.maximum(self.maxs[rows], other.maxs[other_rows])
+        self.buckets[rows] += other.buckets[other_rows]
+        self.version += 1
+        return self
+
+    def _key(self, region=None, city=None):
+        if city is not None and region is None:
+            raise ValueError("A city query needs its region")
+        if region is None:
+            return ALL_LISTINGS
+        return (region,) if city is None else (region, city)
+
+    def count(self, region=None, city=None):
+        row = self.keys.get(self._key(region, city))
+        return int(self.counts[row]) if row is not None else 0
+
+    def quantiles(self, qs, region=None, city=None):
+        """
+        Estimate price quantiles for Italy, a region or a city.
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        row = self.keys.get(self._key(region, city))
+        if row is None or self.counts[row] == 0:
+            return np.full(len(qs), np.nan)
+
+        cumulative = np.cumsum(self.buckets[row])
+        ranks = qs * (self.counts[row] - 1)
+        index = np.searchsorted(cumulative, ranks, side='right')
+        values = self.bucket_values[np.minimum(index, self.n_buckets - 1)]
+        # The end buckets hold out-of-range prices; the exact extremes are known
+        return np.clip(values, self.mins[row], self.maxs[row])
+
+    def summary(self, region=None, city=None):
+        """
+        Return count, mean, min, max and the main quantiles of a group.
+        """
+        row = self.keys.get(self._key(region, city))
+        if row is None or self.counts[row] == 0:
+            return {'count': 0}
+
+        p10, p25, median, p75, p90 = self.quantiles([0.1, 0.25, 0.5, 0.75, 0.9], region, city)
+        count = int(self.counts[row])
+        return {
+            'count': count,
+            'mean': float(self.sums[row] / count),
+            'min': float(self.mins[row]),
+            'max': float(self.maxs[row]),
+            'p10': float(p10), 'p25': float(p25), 'median': float(median),
+            'p75': float(p75), 'p90': float(p90),
+        }
+
+    def histogram(self, edges, region=None, city=None):
+        """
+        Count a group's listings per price band given by edges.
+
+        Each bucket's listings are spread evenly over the bucket's price range,
+        so bands narrower than a bucket get fractional counts instead of gaps.
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        row = self.keys.get(self._key(region, city))
+        if row is None:
+            return np.zeros(len(edges) - 1)
+        # Cumulative count at every bucket boundary, interpolated at the band edges
+        boundaries = self.gamma ** (np.arange(self.n_buckets + 1) + self.first_index - 1)
+        cumulative = np.concatenate([[0], np.cumsum(self.buckets[row])])
+        return np.diff(np.interp(edges, boundaries, cumulative))
+
+    def region_table(self):
+        """
+        Return one row of statistics per region, in the shape the map uses.
+        """
+        regions = sorted(key[0] for key in self.keys if len(key) == 1)
+        return self._table([(region,) for region in regions], ['reg_name'])
+
+    def city_table(self, region):
+        """
+        Return one row of statistics per city of a region.
+        """
+        cities = sorted(key for key in self.keys if len(key) == 2 and key[0] == region)
+        return self._table(cities, ['reg_name', 'city'])
+
+    def _table(self, keys, key_columns):
+        rows = np.array([self.keys[key] for key in keys], dtype=np.int64)
+        quantiles = np.array([self.quantiles([0.1, 0.5, 0.9], *key) for key in keys]).reshape(-1, 3)
+
+        table = pd.DataFrame(keys, columns=key_columns)
+        table['mean_price'] = self.sums[rows] / np.maximum(self.counts[rows], 1)
+        table['median_price'] = quantiles[:, 1]
+        table['property_count'] = self.counts[rows]
+        table['p10_price'] = quantiles[:, 0]
+        table['p90_price'] = quantiles[:, 2]
+        return table
+
+    def save(self, path=STATS_PATH):
+        """
+        Write the statistics to a NumPy .npz file (no pickle).
+        """
+        temporary_path = path + '.tmp.npz'
+        np.savez_compressed(
+            temporary_path,
+            layout=np.array([self.relative_accuracy, self.min_price, self.max_price]),
+            keys=np.array(json.dumps([list(key) for key in self.keys])),
+            counts=self.counts, sums=self.sums, mins=self.mins, maxs=self.maxs, buckets=self.buckets
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            relative_accuracy, min_price, max_price = data['layout'].tolist()
+            stats = cls(relative_accuracy, min_price, max_price)
+            stats.keys = {tuple(key): row for row, key in enumerate(json.loads(str(data['keys'])))}
+            stats.counts = data['counts']
+            stats.sums = data['sums']
+            stats.mins = data['mins']
+            stats.maxs = data['maxs']
+            stats.buckets = data['buckets']
+        return stats
+
+def build_statistics(chunk_size=500000):
+    """
+    Build the statistics from the rental store, one chunk of rows at a time.
+    """
+    from rental_store import load_rows
+
+    stats = PriceStatistics()
+    listings = load_rows(['price', 'region_standardized', 'city'])
+    for start in range(0, len(listings), chunk_size):
+        stats.update(listings.iloc[start:start + chunk_size])
+    return stats
+
+def load_statistics(path=STATS_PATH):
+    """
+    Load the saved statistics, building them from the rental store if missing.
+    """
+    if os.path.exists(path):
+        return PriceStatistics.load(path)
+    logger.warning(f"{path} not found, building price statistics; run python -m app.price_stats build")
+    return build_statistics()
+
+def main():
+    from rental_store import read_csv
+
+    parser = argparse.ArgumentParser(description="Build or update the price statistics.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help="Rebuild from the rental store")
+    update_parser = subparsers.add_parser('update', help="Fold a CSV of new listings into the saved statistics")
+    update_parser.add_argument('csv')
+    parser.add_argument('--stats', default=STATS_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        stats = build_statistics()
+    else:
+        stats = PriceStatistics.load(args.stats)
+        stats.update(read_csv(args.csv))
+    stats.save(args.stats)
+
+    overall = stats.summary()
+    print(f"Saved {args.stats}: {overall['count']} listings, {len(stats.keys)} groups, "
+          f"median €{overall['median']:.0f}")
+
+if __name__ == "__main__":
+    main()
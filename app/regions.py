@@ -0,0 +1,39 @@
+# Map the region (and some city) slugs in the listing data to the reg_name
+# values used by the regions GeoJSON and the model
+region_mapping = {
+    'lombardia': 'Lombardia',
+    'piemonte': 'Piemonte',
+    'veneto': 'Veneto',
+    'toscana': 'Toscana',
+    'friuli-venezia-giulia': 'Friuli-Venezia Giulia',
+    'umbria': 'Umbria',
+    'emilia-romagna': 'Emilia-Romagna',
+    'emilia-Romagna': 'Emilia-Romagna',
+    'liguria': 'Liguria',
+    'Liguria': 'Liguria',
+    'trentino-alto-adige': 'Trentino-Alto Adige/Südtirol',
+    'calabria': 'Calabria',
+    'lazio': 'Lazio',
+    'puglia': 'Puglia',
+    'campania': 'Campania',
+    'sicilia': 'Sicilia',
+    'marche': 'Marche',
+    'abruzzo': 'Abruzzo',
+    'molise': 'Molise',
+    'basilicata': 'Basilicata',
+    'sardegna': 'Sardegna',
+    'valle-d-aosta': "Valle d'Aosta/Vallée d'Aoste",
+    
+    # Cities mapped to their regions
+    'milano': 'Lombardia',
+    'torino': 'Piemonte',
+    'genova': 'Liguria',
+    'napoli': 'Campania',
+    'palermo': 'Sicilia',
+    'bari': 'Puglia',
+    'ancona': 'Marche',
+    'catanzaro': 'Calabria',
+    'l-aquila': 'Abruzzo',
+    'trieste': 'Friuli-Venezia Giulia',
+    'venezia': 'Veneto'
+}
@@ -0,0 +1,208 @@
+"""
+Columnar store and precomputed aggregates for the rental listings.
+
+Ingestion converts data/italian_rental_processed.csv into a typed Parquet file,
+with region_standardized and city stored as categoricals; region_standardized
+is located from latitude and longitude when the CSV has them. Next to it, it
+writes a small JSON sidecar with the per-region and per-city price aggregates
+and the region -> cities index, and the PriceStatistics used for drill-downs.
+The app loads only these at startup and reads listing rows from the Parquet
+file on demand.
+
+Run the ingestion with:
+    python -m app.rental_store
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+import logging
+
+from regions import region_mapping
+from geolocation import geocode_regions, has_coordinates
+from price_stats import STATS_PATH, PriceStatistics
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+CSV_PATH = os.path.join(project_root, 'data', 'italian_rental_processed.csv')
+PARQUET_PATH = os.path.join(project_root, 'data', 'italian_rental.parquet')
+SUMMARY_PATH = os.path.join(project_root, 'data', 'italian_rental_summary.json')
+
+SUMMARY_FORMAT_VERSION = 1
+
+class RentalSummary:
+    """
+    Precomputed aggregates of the rental listings.
+    """
+    def __init__(self, region_stats, city_stats, region_cities, version=None, rows=None):
+        self.region_stats = region_stats
+        self.city_stats = city_stats
+        self.region_cities = region_cities
+        self.version = version
+        self.rows = rows
+
+    @property
+    def regions(self):
+        return sorted(self.region_cities)
+
+    @property
+    def cities(self):
+        return sorted({city for cities in self.region_cities.values() for city in cities})
+
+def standardize_regions(rental_data):
+    """
+    Add region_standardized as a categorical column, located from the
+    coordinates where the listings have them and mapped from the region
+    slugs otherwise.
+    """
+    if 'region' in rental_data.columns:
+        # Slugs missing from region_mapping become missing values
+        regions = rental_data['region'].map(region_mapping).astype(object)
+    else:
+        regions = pd.Series(None, index=rental_data.index, dtype=object)
+    if has_coordinates(rental_data):
+        # Coordinates place a listing exactly, while some slugs name a city
+        located = pd.Series(geocode_regions(rental_data), index=rental_data.index)
+        regions = located.where(located.notna(), regions)
+    rental_data['region_standardized'] = regions.astype('category')
+    return rental_data
+
+def summarize(rental_data):
+    """
+    Compute the region and city aggregates and the region -> cities index.
+    """
+    region_stats = (
+        rental_data.groupby('region_standardized', observed=True)['price']
+        .agg(['mean', 'median', 'count']).reset_index()
+    )
+    region_stats.columns = ['reg_name', 'mean_price', 'median_price', 'property_count']
+    region_stats['reg_name'] = region_stats['reg_name'].astype(str)
+
+    city_stats = (
+        rental_data.groupby(['region_standardized', 'city'], observed=True)['price']
+        .agg(['mean', 'median', 'count']).reset_index()
+    )
+    city_stats.columns = ['reg_name', 'city', 'mean_price', 'median_price', 'property_count']
+    city_stats[['reg_name', 'city']] = city_stats[['reg_name', 'city']].astype(str)
+
+    # One pass over the distinct (region, city) pairs instead of a filter per region
+    pairs = rental_data[['region_standardized', 'city']].dropna().drop_duplicates()
+    region_cities = {
+        str(region): sorted(str(city) for city in cities)
+        for region, cities in pairs.groupby('region_standardized', observed=True)['city']
+    }
+
+    return RentalSummary(region_stats, city_stats, region_cities, rows=len(rental_data))
+
+def read_csv(csv_path=CSV_PATH):
+    """
+    Read the processed CSV with categorical region and city columns.
+    """
+    rental_data = pd.read_csv(csv_path, dtype={'region': 'category', 'city': 'category'})
+    return standardize_regions(rental_data)
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+def write_summary(summary, summary_path=SUMMARY_PATH):
+    payload = {
+        'format_version': SUMMARY_FORMAT_VERSION,
+        'version': summary.version,
+        'rows': summary.rows,
+        'built_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'region_stats': summary.region_stats.to_dict(orient='list'),
+        'city_stats': summary.city_stats.to_dict(orient='list'),
+        'region_cities': summary.region_cities,
+    }
+    temporary_path = summary_path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(temporary_path, summary_path)
+
+def ingest(csv_path=CSV_PATH, parquet_path=PARQUET_PATH, summary_path=SUMMARY_PATH, stats_path=STATS_PATH):
+    """
+    Convert the CSV to Parquet and write the aggregate sidecar and price statistics.
+    """
+    rental_data = read_csv(csv_path)
+
+    temporary_path = parquet_path + '.tmp'
+    rental_data.to_parquet(temporary_path, index=False)
+    os.replace(temporary_path, parquet_path)
+
+    summary = summarize(rental_data)
+    summary.version = _file_digest(parquet_path)
+    write_summary(summary, summary_path)
+
+    PriceStatistics().update(rental_data).save(stats_path)
+    return summary
+
+def load_summary(summary_path=SUMMARY_PATH, csv_path=CSV_PATH):
+    """
+    Load the precomputed aggregates.
+
+    If the sidecar has not been built yet, the aggregates are computed from
+    the CSV in memory so the app still works, just without the fast start.
+    """
+    if not os.path.exists(summary_path):
+        logger.warning(f"{summary_path} not found, aggregating the CSV; run python -m app.rental_store")
+        summary = summarize(read_csv(csv_path))
+        summary.version = _file_digest(csv_path)
+        return summary
+
+    with open(summary_path, encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('format_version') != SUMMARY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported summary format version: {payload.get('format_version')}")
+
+    return RentalSummary(
+        pd.DataFrame(payload['region_stats']),
+        pd.DataFrame(payload['city_stats']),
+        payload['region_cities'],
+        version=payload['version'],
+        rows=payload['rows'],
+    )
+
+def load_rows(columns=None, regions=None, parquet_path=PARQUET_PATH, csv_path=CSV_PATH):
+    """
+    Load listing rows on demand, optionally only some columns and regions.
+
+    Column selection and the region filter are pushed down to the Parquet
+    reader, so only the requested data is read.
+    """
+    if not os.path.exists(parquet_path):
+        rental_data = read_csv(csv_path)
+        if regions is not None:
+            rental_data = rental_data[rental_data['region_standardized'].isin(regions)]
+        return rental_data[columns] if columns is not None else rental_data
+
+    filters = [('region_standardized', 'in', list(regions))] if regions is not None else None
+    return pd.read_parquet(parquet_path, columns=columns, filters=filters)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the rental CSV to Parquet and precompute aggregates.")
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--summary', default=SUMMARY_PATH)
+    parser.add_argument('--stats', default=STATS_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = ingest(args.csv, args.parquet, args.summary, args.stats)
+    elapsed = time.perf_counter() - start
+
+    print(f"Ingested {summary.rows} rows in {elapsed:.1f}s (version {summary.version})")
+    print(f"  {args.parquet}: {os.path.getsize(args.parquet) / 1e6:.1f} MB")
+    print(f"  {args.summary}: {os.path.getsize(args.summary) / 1e3:.1f} KB, "
+          f"{len(summary.region_stats)} regions, {len(summary.city_stats)} cities")
+
+if __name__ == "__main__":
+    main()
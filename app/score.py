@@ -0,0 +1,164 @@
+"""
+Offline scoring of large listing files.
+
+Streams a CSV or Parquet file in chunks, scores the chunks on a pool of worker
+processes that each load the predictor once, and writes the input rows with
+predicted_price, lower_bound and upper_bound appended, in input order.
+Listings without region_standardized get it the way the data store does:
+located from latitude and longitude, else mapped from the region slug. At
+most a few chunks per worker are in memory at any time, whatever the file
+size.
+
+Usage:
+    python -m app.score listings.parquet predictions.parquet --workers 4 --chunk-size 50000
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import logging
+
+from prediction import load_default_predictor
+from geolocation import has_coordinates
+from rental_store import standardize_regions
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Predictor loaded once per worker process by init_worker
+worker_predictor = None
+
+def init_worker(models_dir, nthread):
+    global worker_predictor
+    worker_predictor = load_default_predictor(models_dir)
+    # Keep XGBoost's own thread pool within this worker's share of the cores
+    worker_predictor.model.get_booster().set_param({'nthread': nthread})
+
+def derive_features(chunk):
+    """
+    Add the derived model features a raw listing dump may lack, computed the
+    same way as the app form does, and region_standardized as the trainer
+    derives it.
+    """
+    if 'log_area' not in chunk.columns and 'area' in chunk.columns:
+        chunk['log_area'] = np.log1p(chunk['area'])
+    if 'floor_to_height_ratio' not in chunk.columns and {'floor', 'total_floors'} <= set(chunk.columns):
+        ratio = chunk['floor'] / chunk['total_floors']
+        chunk['floor_to_height_ratio'] = ratio.where(chunk['total_floors'] > 0, 0)
+    if 'region_standardized' not in chunk.columns and ('region' in chunk.columns or has_coordinates(chunk)):
+        chunk = standardize_regions(chunk)
+    return chunk
+
+def score_chunk(chunk):
+    """
+    Score one chunk in a worker, returning the predictions and bounds.
+    """
+    return worker_predictor.predict_batch_with_confidence(derive_features(chunk.copy()))
+
+def read_chunks(path, chunk_size):
+    """
+    Yield DataFrame chunks of a CSV or Parquet file.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+class ChunkWriter:
+    """
+    Appends scored chunks to a CSV or Parquet file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.rows = 0
+
+    def write(self, chunk):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = table.cast(self.parquet_writer.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+def attach_predictions(chunk, result):
+    predicted_prices, lower_bounds, upper_bounds = result
+    chunk = chunk.copy()
+    chunk['predicted_price'] = predicted_prices
+    chunk['lower_bound'] = lower_bounds
+    chunk['upper_bound'] = upper_bounds
+    return chunk
+
+def score_file(input_path, output_path, models_dir, chunk_size=50000, workers=None, nthread=None):
+    """
+    Score every row of input_path and write the results to output_path.
+
+    workers defaults to the number of cores and nthread to the cores left per
+    worker, so the process pool and the booster threads do not oversubscribe.
+    Returns the number of rows written.
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    nthread = nthread or max(1, cpu_count // workers)
+
+    writer = ChunkWriter(output_path)
+    try:
+        if workers == 1:
+            init_worker(models_dir, nthread)
+            for chunk in read_chunks(input_path, chunk_size):
+                writer.write(attach_predictions(chunk, score_chunk(chunk)))
+            return writer.rows
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Bound the chunks held in memory; results are written strictly in input order
+        max_pending = 2 * workers
+        pending = collections.deque()
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(models_dir, nthread)) as pool:
+            for chunk in read_chunks(input_path, chunk_size):
+                pending.append((chunk, pool.submit(score_chunk, chunk)))
+                if len(pending) >= max_pending:
+                    done_chunk, future = pending.popleft()
+                    writer.write(attach_predictions(done_chunk, future.result()))
+            while pending:
+                done_chunk, future = pending.popleft()
+                writer.write(attach_predictions(done_chunk, future.result()))
+        return writer.rows
+    finally:
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of listings.")
+    parser.add_argument('input', help="Input .csv or .parquet file")
+    parser.add_argument('output', help="Output .csv or .parquet file")
+    parser.add_argument('--models-dir', default=os.path.join(project_root, 'models'))
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--nthread', type=int, default=None, help="XGBoost threads per worker (default: cores / workers)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, args.models_dir, args.chunk_size, args.workers, args.nthread)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+What-if sensitivity sweeps scored as one batched grid.
+
+A sweep varies some features of one listing, each over a list of values,
+and scores every combination. The listing is encoded into a model input row
+once; every grid row starts as a copy of it and only the columns of the
+varied features are rewritten, so the preprocessor never runs per variant
+and the whole grid goes to the booster in one call.
+
+Dimensions are model features (log_area, floor_to_height_ratio, bathrooms,
+has_elevator, city, ...), the rare amenities behind luxury_score, or area in
+m², which sets log_area like the app form does.
+"""
+import collections
+import numpy as np
+
+from instrumentation import observe, timer
+
+# Rows scored per booster call; every row holds all the one-hot columns
+SWEEP_CHUNK_ROWS = 2048
+
+# Largest grid a single sweep may build
+MAX_GRID_ROWS = 100000
+
+# Inputs a sweep can vary in place of the model feature they determine
+DERIVED_DIMENSIONS = {'area': ('log_area', np.log1p)}
+
+# Points of the default curves drawn by what_if
+AREA_CURVE_POINTS = 25
+FLOOR_RATIO_CURVE = np.linspace(0.0, 1.0, 11)
+
+# Smallest area the app form accepts, in m²
+MIN_AREA = 15
+
+Sweep = collections.namedtuple('Sweep', ['dimensions', 'values', 'prices'])
+
+class SensitivitySweep:
+    """
+    Scores grids of variants of one listing from its encoded row.
+    """
+    def __init__(self, scorer):
+        """
+        Set up sweeps for the model and column layout of a FastScorer.
+        """
+        self.scorer = scorer
+        self.rare_amenities = list(scorer.rare_amenities)
+        self.means = np.asarray(scorer.means, dtype=np.float64)
+        self.scales = np.asarray(scorer.scales, dtype=np.float64)
+
+        self.numeric_columns = {feature: scorer.numeric_offset + i for i, feature in enumerate(scorer.numeric_features)}
+        self.binary_columns = {feature: scorer.binary_offset + i for i, feature in enumerate(scorer.binary_features)}
+        self.category_columns = dict(zip(scorer.categorical_features, scorer.category_columns))
+
+        # The value of a column left unset, as fill_row leaves it
+        self.unset = np.nan if scorer.zero_is_missing else 0.0
+
+    def encode(self, values):
+        """
+        Return column values as the scorer writes them: zeros are missing in a sparse layout.
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if self.scorer.zero_is_missing:
+            values = np.where(values == 0, np.float32(np.nan), values)
+        return values
+
+    def scale(self, feature, values):
+        i = self.numeric_columns[feature] - self.scorer.numeric_offset
+        return self.encode((np.asarray(values, dtype=np.float64) - self.means[i]) / self.scales[i])
+
+    def grid_size(self, dimensions):
+        return int(np.prod([len(values) for values in dimensions.values()], dtype=np.int64))
+
+    def fill_grid(self, features, dimensions, base_row, rows, start=0):
+        """
+        Write rows start to start + len(rows) of the grid of one listing.
+
+        Combinations are in C order: the last dimension varies fastest, so
+        the prices reshape to one axis per dimension.
+        """
+        shape = tuple(len(values) for values in dimensions.values())
+        rows[:] = base_row
+        indices = np.unravel_index(np.arange(start, start + len(rows)), shape) if shape else ()
+
+        luxury_change = None
+        swept = set()
+        for axis, (name, values) in enumerate(dimensions.items()):
+            feature, transform = DERIVED_DIMENSIONS.get(name, (name, None))
+            if feature in swept:
+                raise ValueError(f"{feature} is swept more than once")
+            swept.add(feature)
+
+            values = np.asarray(values)[indices[axis]]
+            if transform is not None:
+                values = transform(values.astype(np.float64))
+
+            if feature == 'luxury_score':
+                raise ValueError("luxury_score is derived; sweep the rare amenities instead")
+            elif feature in self.numeric_columns:
+                rows[:, self.numeric_columns[feature]] = self.scale(feature, values)
+            elif feature in self.binary_columns:
+                rows[:, self.binary_columns[feature]] = self.encode(values.astype(np.float64))
+            elif feature in self.rare_amenities:
+                # Each rare amenity counts once towards luxury_score
+                change = (values == 1).astype(np.int64) - int(features.get(feature) == 1)
+                luxury_change = change if luxury_change is None else luxury_change + change
+            elif feature in self.category_columns:
+                columns = self.category_columns[feature]
+                base_column = columns.get(features.get(feature, "unknown"))
+                if base_column is not None:
+                    rows[:, base_column] = self.unset
+                # Unknown values leave every one-hot column unset, like handle_unknown='ignore'
+                codes = np.array([columns.get(value, -1) for value in values.tolist()], dtype=np.int64)
+                known = np.flatnonzero(codes >= 0)
+                rows[known, codes[known]] = 1.0
+            else:
+                raise ValueError(f"Cannot sweep {name}: not a model feature")
+
+        if luxury_change is not None:
+            base_luxury = sum(1 for amenity in self.rare_amenities if features.get(amenity) == 1)
+            rows[:, self.numeric_columns['luxury_score']] = self.scale('luxury_score', base_luxury + luxury_change)
+        return rows
+
+    def score_grids(self, features, grids):
+        """
+        Score several grids of one listing together and return the prices of each.
+
+        The listing is encoded once and the grids are written one after the
+        other into a buffer of SWEEP_CHUNK_ROWS rows, which goes to the
+        booster whenever it is full, so small grids share one booster call
+        and large ones never hold more than a chunk in memory.
+        """
+        sizes = [self.grid_size(dimensions) for dimensions in grids]
+        n_rows = sum(sizes)
+        if n_rows > MAX_GRID_ROWS:
+            raise ValueError(f"Sweep of {n_rows} variants exceeds the limit of {MAX_GRID_ROWS}")
+        observe('sweep_rows', n_rows)
+
+        scorer = self.scorer
+        base_row = scorer.fill_row(features, np.empty((1, scorer.n_columns), dtype=np.float32))
+        rows = np.empty((min(n_rows, SWEEP_CHUNK_ROWS), scorer.n_columns), dtype=np.float32)
+        log_prices = np.empty(n_rows, dtype=np.float32)
+
+        with timer('sweep'):
+            filled = scored = 0
+            for dimensions, size in zip(grids, sizes):
+                offset = 0
+                while offset < size:
+                    count = min(size - offset, len(rows) - filled)
+                    self.fill_grid(features, dimensions, base_row, rows[filled:filled + count], offset)
+                    filled += count
+                    offset += count
+                    if filled == len(rows):
+                        log_prices[scored:scored + filled] = self._predict(rows)
+                        scored += filled
+                        filled = 0
+            if filled:
+                log_prices[scored:scored + filled] = self._predict(rows[:filled])
+
+        prices = np.exp(log_prices)
+        return np.split(prices, np.cumsum(sizes)[:-1])
+
+    def _predict(self, rows):
+        with timer('booster'):
+            return self.scorer.booster.inplace_predict(
+                rows, iteration_range=self.scorer.iteration_range, missing=np.nan
+            )
+
+    def sweep(self, features, dimensions):
+        """
+        Score every combination of the values of dimensions for one listing.
+
+        dimensions maps each varied feature to its values, e.g.
+        {'area': [60, 80, 100], 'has_elevator': [0, 1]}. Returns a Sweep whose
+        prices array has one axis per dimension, in the order given.
+        """
+        dimensions = {name: list(values) for name, values in dimensions.items()}
+        if any(len(values) == 0 for values in dimensions.values()):
+            raise ValueError("Every swept dimension needs at least one value")
+        prices = self.score_grids(features, [dimensions])[0]
+        shape = tuple(len(values) for values in dimensions.values())
+        return Sweep(list(dimensions), [np.asarray(values) for values in dimensions.values()], prices.reshape(shape))
+
+    def what_if(self, features, areas=None, floor_ratios=None, amenities=None):
+        """
+        Price curves and amenity effects for one listing, from one grid.
+
+        Returns the listing's price, its price as area and as floor ratio
+        vary with everything else fixed, and for every amenity the price
+        with and without it. Areas default to half to twice the listing's
+        area, floor ratios to 0 to 1 in tenths, and amenities to all the
+        binary features and rare amenities of the model.
+        """
+        if areas is None:
+            area = features.get('area')
+            if area is None:
+                area = np.expm1(float(features.get('log_area', 0)))
+            low = max(MIN_AREA, 0.5 * area)
+            areas = np.unique(np.round(np.linspace(low, max(low, 2 * area), AREA_CURVE_POINTS)))
+        if floor_ratios is None:
+            floor_ratios = FLOOR_RATIO_CURVE
+        if amenities is None:
+            amenities = list(self.binary_columns) + self.rare_amenities
+
+        # The listing itself, one grid per curve and one row per flipped amenity
+        grids = [{}, {'area': list(areas)}, {'floor_to_height_ratio': list(floor_ratios)}]
+        has = {amenity: features.get(amenity) == 1 for amenity in amenities}
+        grids += [{amenity: [0 if has[amenity] else 1]} for amenity in amenities]
+        prices = self.score_grids(features, grids)
+
+        base_price = float(prices[0][0])
+        effects = {}
+        for amenity, flipped in zip(amenities, prices[3:]):
+            flipped_price = float(flipped[0])
+            with_price, without_price = (base_price, flipped_price) if has[amenity] else (flipped_price, base_price)
+            effects[amenity] = {
+                'has': bool(has[amenity]),
+                'with': with_price,
+                'without': without_price,
+                'delta': with_price - without_price,
+            }
+
+        return {
+            'predicted_price': base_price,
+            'curves': {
+                'area': {'values': np.asarray(areas, dtype=np.float64).tolist(), 'prices': prices[1].tolist()},
+                'floor_to_height_ratio': {
+                    'values': np.asarray(floor_ratios, dtype=np.float64).tolist(), 'prices': prices[2].tolist()
+                },
+            },
+            'amenities': effects,
+        }
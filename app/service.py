@@ -0,0 +1,492 @@
+"""
+Headless prediction service.
+
+A plain ASGI application that serves the models of a ModelRegistry and exposes:
+    GET  /health           service status and the registered model versions
+    POST /predict          one listing as a JSON object
+    POST /predict/batch    {"listings": [...]} or a JSON list of listings
+    POST /sweep            {"listing": {...}, "dimensions": {"area": [60, 80], ...}}:
+                           prices for every combination of the dimensions
+    POST /what-if          {"listing": {...}}: price curves over area and floor
+                           ratio and the price effect of each amenity
+    POST /comparables      {"listing": {...}} or {"listings": [...]}, with an
+                           optional "k": the k most similar real listings
+    GET  /drift            input and prediction drift of every model against its
+                           training profile; ?snapshot=1 exports the raw counts
+                           for merging across workers
+    GET  /metrics          stage timings and counters in the Prometheus text format
+    GET  /profile          sampled stacks in collapsed format, when profiling; with
+                           --workers, of the worker that answers
+
+Predictions go to the model picked by the registry's A/B weights. The query
+parameters ?model=<name> or ?version=<model version> ask for a specific
+model, and ?key=<id> routes the same id to the same model every time.
+Concurrent /predict requests are coalesced by a MicroBatcher into small
+batches scored with one booster call per model.
+
+Run with:
+    python -m app.service --port 8000 --batch-size 64 --batch-wait-ms 2 --metrics
+    python -m app.service --port 8000 --workers 4
+
+With --workers, the models are loaded once and the workers are forked from
+that process, sharing the model memory copy-on-write.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import urllib.parse
+import logging
+
+import instrumentation
+from instrumentation import observe, timer
+from model_registry import DEFAULT_POLL_INTERVAL, ModelRegistry, load_registry
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single predictions into small batches.
+
+    The first queued request opens a batch that closes after max_wait_ms or
+    once it holds max_batch_size requests, whichever comes first. Batches are
+    scored one at a time in a worker thread, so the next batch fills while
+    the current one runs. Requests routed to different models share a batch
+    and are scored with one call per model.
+    """
+    def __init__(self, max_batch_size=64, max_wait_ms=2.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+
+        self.batches = 0
+        self.requests = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, predictor, features):
+        """
+        Queue one listing for a predictor and wait for its (price, lower, upper) prediction.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((predictor, features, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Take whatever else is already waiting, up to the batch size
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            observe('service_batch_size', len(batch))
+
+            # Group the requests by predictor, keeping their order within each group
+            groups = {}
+            for predictor, features, future in batch:
+                groups.setdefault(id(predictor), (predictor, []))[1].append((features, future))
+
+            for predictor, requests in groups.values():
+                records = [features for features, _ in requests]
+                try:
+                    results = await loop.run_in_executor(None, self._score, predictor, records)
+                except Exception:
+                    # Score one by one so a single bad listing only fails its own request
+                    results = []
+                    for record in records:
+                        try:
+                            result = await loop.run_in_executor(None, self._score, predictor, [record])
+                            results.append(result[0])
+                        except Exception as e:
+                            results.append(e)
+
+                for (_, future), result in zip(requests, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+            self.batches += 1
+            self.requests += len(batch)
+
+    def _score(self, predictor, records):
+        with timer('service_batch'):
+            prices, lower_bounds, upper_bounds = predictor.predict_batch_with_confidence(records)
+        return list(zip(prices.tolist(), lower_bounds.tolist(), upper_bounds.tolist()))
+
+def prediction_result(price, lower_bound, upper_bound):
+    return {
+        'predicted_price': float(price),
+        'lower_bound': float(lower_bound),
+        'upper_bound': float(upper_bound),
+    }
+
+class PredictionService:
+    """
+    ASGI application serving predictions from the models of a registry.
+    """
+    def __init__(self, registry, max_batch_size=64, max_wait_ms=2.0):
+        self.registry = registry
+        self.batcher = MicroBatcher(max_batch_size, max_wait_ms)
+        self._comparables = None
+        self._comparables_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.batcher.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.batcher.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        routes = {
+            ('GET', '/health'): self.health,
+            ('POST', '/predict'): self.predict,
+            ('POST', '/predict/batch'): self.predict_batch,
+            ('POST', '/sweep'): self.sweep,
+            ('POST', '/what-if'): self.what_if,
+            ('POST', '/comparables'): self.comparables,
+            ('GET', '/drift'): self.drift,
+            ('GET', '/metrics'): self.metrics,
+            ('GET', '/profile'): self.profile,
+        }
+        path = scope['path'].rstrip('/') or '/'
+        handler = routes.get((scope['method'], path))
+
+        if handler is None:
+            allowed = any(route_path == path for _, route_path in routes)
+            status = 405 if allowed else 404
+            await self._respond(send, status, {'error': 'Method not allowed' if allowed else 'Not found'})
+            return
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            await self._respond(send, 400, {'error': 'Request body is not valid JSON'})
+            return
+        query = dict(urllib.parse.parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+
+        try:
+            status, response = await handler(payload, query)
+        except Exception as e:
+            logger.error(f"Error handling {path}: {str(e)}")
+            status, response = 500, {'error': str(e)}
+        await self._respond(send, status, response)
+
+    async def health(self, payload, query):
+        return 200, {
+            'status': 'ok',
+            'model_version': self.registry.get().version,
+            'registry': self.registry.describe(),
+            'batches': self.batcher.batches,
+            'batched_requests': self.batcher.requests,
+        }
+
+    async def drift(self, payload, query):
+        models = {
+            name: model.predictor.monitor
+            for name, model in sorted(self.registry.snapshot.models.items())
+            if model.predictor.monitor is not None
+        }
+        if not models:
+            return 404, {'error': 'No model has a drift profile; build one with python -m app.drift profile'}
+        if query.get('snapshot') in ('1', 'true'):
+            return 200, {'models': {name: monitor.snapshot() for name, monitor in models.items()}}
+        return 200, {'models': {name: monitor.report() for name, monitor in models.items()}}
+
+    async def metrics(self, payload, query):
+        return 200, instrumentation.registry.render_prometheus()
+
+    async def profile(self, payload, query):
+        if instrumentation.profiler is None:
+            return 404, {'error': 'Profiler not running; start the service with --profile-ms'}
+        return 200, instrumentation.profiler.collapsed()
+
+    def select_model(self, query):
+        """
+        Return the model a request asked for, or the one the A/B weights pick,
+        or None if the requested model is not registered.
+        """
+        if 'model' in query or 'version' in query:
+            try:
+                return self.registry.get(query.get('model'), query.get('version'))
+            except KeyError:
+                return None
+        return self.registry.route(query.get('key'))
+
+    async def predict(self, payload, query):
+        if not isinstance(payload, dict):
+            return 400, {'error': 'Expected a JSON object of listing features'}
+
+        model = self.select_model(query)
+        if model is None:
+            return 404, {'error': 'No such model', 'registry': self.registry.describe()}
+        try:
+            result = prediction_result(*await self.batcher.submit(model.predictor, payload))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        result.update({'model': model.name, 'model_version': model.version})
+        return 200, result
+
+    async def predict_batch(self, payload, query):
+        listings = payload.get('listings') if isinstance(payload, dict) else payload
+        if not isinstance(listings, list) or not all(isinstance(listing, dict) for listing in listings):
+            return 400, {'error': 'Expected a list of listing objects'}
+
+        # Large batches are already vectorized, so they skip the micro-batcher
+        model = self.select_model(query)
+        if model is None:
+            return 404, {'error': 'No such model', 'registry': self.registry.describe()}
+        loop = asyncio.get_running_loop()
+        try:
+            prices, lower_bounds, upper_bounds = await loop.run_in_executor(
+                None, model.predictor.predict_batch_with_confidence, listings
+            )
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {
+            'model': model.name,
+            'model_version': model.version,
+            'predictions': [
+                prediction_result(*row) for row in zip(prices, lower_bounds, upper_bounds)
+            ]
+        }
+
+    async def sweep(self, payload, query):
+        listing = payload.get('listing') if isinstance(payload, dict) else None
+        dimensions = payload.get('dimensions') if isinstance(payload, dict) else None
+        if not isinstance(listing, dict) or not isinstance(dimensions, dict) or not all(
+                isinstance(values, list) for values in dimensions.values()):
+            return 400, {'error': 'Expected {"listing": {...}, "dimensions": {"feature": [values], ...}}'}
+
+        model = self.select_model(query)
+        if model is None:
+            return 404, {'error': 'No such model', 'registry': self.registry.describe()}
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, model.predictor.sweep, listing, dimensions)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {
+            'model': model.name,
+            'model_version': model.version,
+            'dimensions': result.dimensions,
+            'values': [values.tolist() for values in result.values],
+            'prices': result.prices.tolist(),
+        }
+
+    async def what_if(self, payload, query):
+        listing = payload.get('listing') if isinstance(payload, dict) else None
+        if not isinstance(listing, dict):
+            return 400, {'error': 'Expected {"listing": {...}}'}
+
+        model = self.select_model(query)
+        if model is None:
+            return 404, {'error': 'No such model', 'registry': self.registry.describe()}
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                None, model.predictor.what_if, listing,
+                payload.get('areas'), payload.get('floor_ratios'), payload.get('amenities')
+            )
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        result.update({'model': model.name, 'model_version': model.version})
+        return 200, result
+
+    def comparables_index(self):
+        """
+        Return the comparable-listings index, loading it on first use.
+        """
+        if self._comparables is None:
+            from comparables import load_comparables
+
+            with self._comparables_lock:
+                if self._comparables is None:
+                    self._comparables = load_comparables()
+        return self._comparables
+
+    async def comparables(self, payload, query):
+        from comparables import DEFAULT_K, MAX_K
+
+        payload = payload if isinstance(payload, dict) else {}
+        listings = payload.get('listings', [payload.get('listing')])
+        k = payload.get('k', DEFAULT_K)
+        if not isinstance(listings, list) or not all(isinstance(listing, dict) for listing in listings):
+            return 400, {'error': 'Expected {"listing": {...}} or {"listings": [...]}'}
+        if not isinstance(k, int) or not 1 <= k <= MAX_K:
+            return 400, {'error': f'k must be an integer from 1 to {MAX_K}'}
+
+        loop = asyncio.get_running_loop()
+        try:
+            index = await loop.run_in_executor(None, self.comparables_index)
+        except Exception as e:
+            logger.error(f"Error loading the comparables index: {str(e)}")
+            return 503, {'error': f'Comparables unavailable: {str(e)}'}
+        try:
+            comparables = await loop.run_in_executor(None, index.nearest_each, listings, k)
+        except (ValueError, TypeError):
+            return 400, {'error': 'Invalid listing features'}
+        if 'listings' not in payload:
+            return 200, {'data_version': index.version, 'comparables': comparables[0]}
+        return 200, {'data_version': index.version, 'results': [{'comparables': found} for found in comparables]}
+
+    async def _respond(self, send, status, payload):
+        # Text payloads (metrics, profiles) are sent as is
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = b'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = b'application/json'
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+def create_app(predictor=None, max_batch_size=None, max_wait_ms=None, registry=None):
+    """
+    Build the ASGI application for a registry, or a single predictor, loading
+    the registry of the models directory if neither is given.
+
+    Batching defaults come from PREDICTION_BATCH_SIZE and PREDICTION_BATCH_WAIT_MS.
+    """
+    if registry is None:
+        if predictor is not None:
+            registry = ModelRegistry.from_predictor(predictor)
+        else:
+            registry = load_registry(os.path.join(project_root, 'models'), use_fast_scorer=True)
+    if max_batch_size is None:
+        max_batch_size = int(os.environ.get('PREDICTION_BATCH_SIZE', 64))
+    if max_wait_ms is None:
+        max_wait_ms = float(os.environ.get('PREDICTION_BATCH_WAIT_MS', 2.0))
+
+    return PredictionService(registry, max_batch_size, max_wait_ms)
+
+def serve_forked(app, host, port, workers):
+    """
+    Serve app from worker processes forked after the models were loaded.
+
+    The parent binds the socket, prepares the registry for fork and forks the
+    workers, which all accept on the inherited socket; it then only waits and
+    passes on SIGINT and SIGTERM.
+    """
+    import signal
+    import socket
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    app.registry.prepare_for_fork()
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            server = uvicorn.Server(uvicorn.Config(app, log_level='warning'))
+            server.run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for pid in children:
+        os.waitpid(pid, 0)
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the headless prediction service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--batch-size', type=int, default=64, help="Maximum requests coalesced into one batch")
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0, help="How long a batch stays open for more requests")
+    parser.add_argument('--models-dir', default=os.path.join(project_root, 'models'))
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between checks for new or changed model bundles")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes forked after loading the models")
+    parser.add_argument('--metrics', action='store_true', help="Record stage timings and counters for /metrics")
+    parser.add_argument('--profile-ms', type=float, default=None, help="Run the sampling profiler at this interval")
+    args = parser.parse_args()
+
+    if args.metrics:
+        instrumentation.enable()
+    if args.profile_ms:
+        instrumentation.start_profiler(args.profile_ms / 1000)
+
+    registry = load_registry(args.models_dir, poll_interval=args.poll_interval, use_fast_scorer=True)
+    app = create_app(max_batch_size=args.batch_size, max_wait_ms=args.batch_wait_ms, registry=registry)
+    if args.workers > 1:
+        serve_forked(app, args.host, args.port, args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,585 @@
+"""
+Out-of-core training of the rent model into a model bundle.
+
+Rebuilds the feature set the predictor reads (log_area, luxury_score from the
+rare amenities, floor_to_height_ratio, the binary amenities and the one-hot
+region and city) from a raw listing dump, without ever holding the dump in
+memory:
+
+    1. One streaming pass fits the scaler and the category vocabularies on
+       the training rows and keeps a bounded random sample of them.
+    2. A hyperparameter search over the notebook's grid scores candidates
+       with early stopping on that sample, in parallel worker processes.
+    3. The final booster trains with the winning parameters on every
+       training row through XGBoost external memory: chunks are transformed
+       and quantized one at a time and the histograms live in a disk cache.
+    4. A last pass scores every row, calibrates the prediction intervals on
+       the calibration rows, measures accuracy on the test rows and builds
+       the drift reference profile from a sample of the training rows.
+
+Rows are assigned to the train, validation, calibration and test splits by a
+seeded draw per row, so every pass sees the same split whatever the chunk
+size. The target is log(price), which the predictor's exp inverts.
+
+The bundle, its intervals.npz, drift_profile.npz and training_report.json
+are staged next to the output and moved into place together, so the model
+registry never sees a half-written candidate.
+
+Usage:
+    python -m app.train --output models/candidate
+    python -m app.train --data listings.parquet --workers 4 --max-candidates 12
+    python -m app.train --warm-start models/bundle --rounds 200 --output models/bundle-continued
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import logging
+
+from model_bundle import ArrayPreprocessor, BundledModel, export_bundle, load_bundle
+from drift import DRIFT_PROFILE_FILE, PROFILE_ROWS, build_profile
+from prediction import BINARY_FEATURES, CATEGORICAL_FEATURES, NUMERIC_FEATURES, RARE_AMENITIES, RentalPricePredictor
+from rental_store import CSV_PATH, PARQUET_PATH
+from score import derive_features, read_chunks
+import intervals
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+TRAINING_REPORT_FILE = 'training_report.json'
+DEFAULT_OUTPUT = os.path.join(project_root, 'models', 'candidate')
+
+# Rows read, transformed and handed to XGBoost at a time
+CHUNK_ROWS = 100000
+
+# Share of the rows in each split, drawn per row
+SPLIT_SHARES = {'train': 0.7, 'validation': 0.1, 'calibration': 0.1, 'test': 0.1}
+
+# Training rows the hyperparameter search runs on, and the share of them it validates on
+SEARCH_ROWS = 200000
+SEARCH_VALIDATION_SHARE = 0.2
+
+# The notebook's GridSearchCV grid
+SEARCH_GRID = {
+    'max_depth': [3, 6, 9],
+    'learning_rate': [0.01, 0.1, 0.3],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0],
+}
+
+BASE_PARAMS = {
+    'objective': 'reg:squarederror',
+    'eval_metric': 'rmse',
+    'tree_method': 'hist',
+    'max_bin': 256,
+    'seed': 7,
+}
+
+# Used when the search is skipped, and to continue bundles that do not record their parameters
+DEFAULT_PARAMS = {'max_depth': 6, 'learning_rate': 0.3, 'subsample': 1.0, 'colsample_bytree': 1.0}
+
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 10
+
+# Features listed in the metadata feature_importance
+TOP_IMPORTANCES = 15
+
+MODEL_FEATURES = NUMERIC_FEATURES + BINARY_FEATURES + CATEGORICAL_FEATURES
+
+def amenity_flags(chunk):
+    """
+    Return the rare amenities of a chunk of raw listings as 0/1 columns.
+
+    prepare_chunk folds them into luxury_score; a drift profile sample keeps
+    them, since the predictor and the monitor count luxury_score from them.
+    """
+    return {
+        amenity: (chunk[amenity] == 1).to_numpy(dtype=np.int64) if amenity in chunk.columns
+        else np.zeros(len(chunk), dtype=np.int64)
+        for amenity in RARE_AMENITIES
+    }
+
+def prepare_chunk(chunk):
+    """
+    Return the model features and log prices of a chunk of raw listings.
+
+    Features are derived and defaulted the way the predictor does for a
+    form or a batch; the log price is NaN for rows without a positive price.
+    """
+    chunk = derive_features(chunk)
+
+    # luxury_score counts the rare amenities set to 1
+    luxury_score = np.zeros(len(chunk), dtype=np.int64)
+    for flags in amenity_flags(chunk).values():
+        luxury_score += flags
+
+    columns = {}
+    for feature in MODEL_FEATURES:
+        if feature == 'luxury_score':
+            columns[feature] = luxury_score
+        elif feature in CATEGORICAL_FEATURES:
+            values = chunk[feature].astype(object) if feature in chunk.columns else pd.Series(index=chunk.index, dtype=object)
+            columns[feature] = values.where(values.notna(), 'unknown').astype(str).to_numpy()
+        elif feature in chunk.columns:
+            columns[feature] = pd.to_numeric(chunk[feature], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            columns[feature] = np.zeros(len(chunk), dtype=np.float64)
+    features = pd.DataFrame(columns, columns=MODEL_FEATURES)
+
+    prices = pd.to_numeric(chunk['price'], errors='coerce').to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.where(prices > 0, np.log(prices), np.nan)
+    return features, log_prices
+
+def split_codes(offset, n_rows, seed):
+    """
+    Return the split of rows offset to offset + n_rows, as indices into SPLIT_SHARES.
+
+    Each chunk draws from a generator seeded by its first row, so the split
+    depends only on the seed and the row position.
+    """
+    draws = np.random.default_rng([seed, offset]).random(n_rows)
+    edges = np.cumsum(list(SPLIT_SHARES.values()))[:-1]
+    return np.searchsorted(edges, draws, side='right')
+
+def iter_chunks(path, chunk_rows, seed, splits):
+    """
+    Yield (features, log_prices, regions) for the rows of the given splits
+    that have a price, one chunk at a time.
+    """
+    wanted = [list(SPLIT_SHARES).index(split) for split in splits]
+    offset = 0
+    for chunk in read_chunks(path, chunk_rows):
+        codes = split_codes(offset, len(chunk), seed)
+        offset += len(chunk)
+        features, log_prices = prepare_chunk(chunk)
+        keep = np.isin(codes, wanted) & np.isfinite(log_prices)
+        if keep.any():
+            features = features[keep].reset_index(drop=True)
+            yield features, log_prices[keep], features['region_standardized'].to_numpy()
+
+class RowSample:
+    """
+    Uniform random sample of at most capacity rows of a stream of DataFrames.
+
+    Every row gets a random key and the sample keeps the rows with the
+    smallest keys seen so far, so it holds one chunk beyond its capacity at
+    most and is uniform over the whole stream.
+    """
+    def __init__(self, capacity, seed):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+        self.keys = np.empty(0)
+
+    def add(self, frame):
+        if not self.capacity or len(frame) == 0:
+            return
+        frame = frame.reset_index(drop=True)
+        self.sample = frame if self.sample is None else pd.concat([self.sample, frame], ignore_index=True)
+        self.keys = np.concatenate([self.keys, self.rng.random(len(frame))])
+        if len(self.sample) > self.capacity:
+            keep = np.sort(np.argpartition(self.keys, self.capacity)[:self.capacity])
+            self.sample, self.keys = self.sample.iloc[keep].reset_index(drop=True), self.keys[keep]
+
+    def rows(self):
+        return self.sample
+
+class FeatureMoments:
+    """
+    Running mean and variance per numeric feature, merged chunk by chunk.
+    """
+    def __init__(self, n_features):
+        self.count = np.zeros(n_features)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    def update(self, values):
+        """
+        Merge a chunk of values, ignoring missing ones (Chan et al.).
+        """
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        mean = np.where(present, values, 0).sum(axis=0) / np.maximum(count, 1)
+        m2 = (np.where(present, values - mean, 0) ** 2).sum(axis=0)
+
+        total = self.count + count
+        delta = mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+
+    def scales(self):
+        # Like StandardScaler, constant features keep a scale of 1
+        std = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        return np.where(std > 0, std, 1.0)
+
+def fit_preprocessor(path, chunk_rows, seed, sample_rows):
+    """
+    Fit the preprocessor on the training rows in one pass.
+
+    Returns the preprocessor, a random sample of at most sample_rows training
+    rows as (features, log_prices) and the number of training rows.
+    """
+    moments = FeatureMoments(len(NUMERIC_FEATURES))
+    vocabularies = [set() for _ in CATEGORICAL_FEATURES]
+    sample = RowSample(sample_rows, seed)
+    n_rows = 0
+
+    for features, log_prices, _ in iter_chunks(path, chunk_rows, seed, ['train']):
+        n_rows += len(features)
+        moments.update(features[NUMERIC_FEATURES].to_numpy(dtype=np.float64))
+        for vocabulary, feature in zip(vocabularies, CATEGORICAL_FEATURES):
+            vocabulary.update(features[feature].unique().tolist())
+
+        sample.add(features.assign(_log_price=log_prices))
+
+    if n_rows == 0:
+        raise ValueError(f"No training rows with a price in {path}")
+
+    preprocessor = ArrayPreprocessor(
+        NUMERIC_FEATURES, BINARY_FEATURES, CATEGORICAL_FEATURES,
+        moments.mean, moments.scales(), [np.array(sorted(vocabulary)) for vocabulary in vocabularies]
+    )
+    sample = sample.rows()
+    if sample is not None:
+        sample = (sample.drop(columns='_log_price'), sample['_log_price'].to_numpy())
+    return preprocessor, sample, n_rows
+
+def search_candidates(max_candidates, seed):
+    """
+    Return the grid's parameter sets, or a seeded random subset of them.
+    """
+    candidates = [dict(zip(SEARCH_GRID, values)) for values in itertools.product(*SEARCH_GRID.values())]
+    if max_candidates and max_candidates < len(candidates):
+        chosen = np.random.default_rng(seed).choice(len(candidates), max_candidates, replace=False)
+        candidates = [candidates[i] for i in sorted(chosen)]
+    return candidates
+
+# Search matrices built once per worker process by init_search_worker
+search_data = None
+
+def init_search_worker(X_train, y_train, X_valid, y_valid, max_bin, nthread):
+    import xgboost as xgb
+
+    global search_data
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train, max_bin=max_bin, nthread=nthread)
+    dvalid = xgb.QuantileDMatrix(X_valid, label=y_valid, ref=dtrain, nthread=nthread)
+    search_data = (dtrain, dvalid, nthread)
+
+def evaluate_candidate(params, rounds, early_stopping_rounds):
+    """
+    Train one candidate on the search sample and return its best validation RMSE.
+    """
+    import xgboost as xgb
+
+    dtrain, dvalid, nthread = search_data
+    start = time.perf_counter()
+    booster = xgb.train(
+        {**BASE_PARAMS, **params, 'nthread': nthread}, dtrain, num_boost_round=rounds,
+        evals=[(dvalid, 'validation')], early_stopping_rounds=early_stopping_rounds, verbose_eval=False
+    )
+    return {
+        'params': params,
+        'rmse': float(booster.best_score),
+        'best_iteration': int(booster.best_iteration),
+        'seconds': time.perf_counter() - start,
+    }
+
+def run_search(preprocessor, sample, candidates, rounds, early_stopping_rounds, workers, seed):
+    """
+    Score every candidate on the sample and return the results, best first.
+
+    Each worker process quantizes the sample once and trains its share of
+    the candidates with cores / workers threads.
+    """
+    features, log_prices = sample
+    validation = np.random.default_rng(seed).random(len(features)) < SEARCH_VALIDATION_SHARE
+    X = preprocessor.transform(features)
+    initargs = (X[~validation], log_prices[~validation], X[validation], log_prices[validation],
+                BASE_PARAMS['max_bin'], max(1, (os.cpu_count() or 1) // workers))
+
+    if workers == 1:
+        init_search_worker(*initargs)
+        results = [evaluate_candidate(params, rounds, early_stopping_rounds) for params in candidates]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers, initializer=init_search_worker, initargs=initargs) as pool:
+            futures = [pool.submit(evaluate_candidate, params, rounds, early_stopping_rounds) for params in candidates]
+            results = [future.result() for future in futures]
+    return sorted(results, key=lambda result: result['rmse'])
+
+def make_iterator(path, chunk_rows, seed, splits, preprocessor, cache_prefix):
+    """
+    Return an XGBoost data iterator over the transformed rows of some splits.
+    """
+    import xgboost as xgb
+
+    class ListingIterator(xgb.DataIter):
+        def __init__(self):
+            self.chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def reset(self):
+            self.chunks = None
+
+        def next(self, input_data):
+            if self.chunks is None:
+                self.chunks = iter_chunks(path, chunk_rows, seed, splits)
+            batch = next(self.chunks, None)
+            if batch is None:
+                return False
+            features, log_prices, _ = batch
+            input_data(data=preprocessor.transform(features), label=log_prices)
+            return True
+
+    return ListingIterator()
+
+def train_booster(path, chunk_rows, seed, preprocessor, params, rounds, early_stopping_rounds,
+                  previous=None, nthread=None):
+    """
+    Train on every training row through external memory, stopping early on the validation rows.
+
+    previous is a booster to continue from; rounds are added to its trees.
+    Returns the booster cut at its best iteration and the validation RMSE history.
+    """
+    import xgboost as xgb
+
+    nthread = nthread or os.cpu_count() or 1
+    history = {}
+    with tempfile.TemporaryDirectory(prefix='rentelligence-train-') as cache_dir:
+        train_iter = make_iterator(path, chunk_rows, seed, ['train'], preprocessor, os.path.join(cache_dir, 'train'))
+        dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=BASE_PARAMS['max_bin'], nthread=nthread)
+        valid_iter = make_iterator(path, chunk_rows, seed, ['validation'], preprocessor, os.path.join(cache_dir, 'validation'))
+        dvalid = xgb.ExtMemQuantileDMatrix(valid_iter, ref=dtrain, nthread=nthread)
+
+        booster = xgb.train(
+            {**BASE_PARAMS, **params, 'nthread': nthread}, dtrain, num_boost_round=rounds,
+            evals=[(dvalid, 'validation')], early_stopping_rounds=early_stopping_rounds,
+            evals_result=history, xgb_model=previous, verbose_eval=False
+        )
+        # Drop the trees grown after the best iteration so a warm start continues from it
+        best = booster[:booster.best_iteration + 1]
+        # Release the matrices before their cache directory goes away
+        del booster, dtrain, dvalid, train_iter, valid_iter
+    return best, history.get('validation', {}).get('rmse', [])
+
+def feature_importance(booster, preprocessor, top=TOP_IMPORTANCES):
+    """
+    Normalized gain per model feature, one-hot columns summed into their feature.
+    """
+    names = preprocessor.numeric_features + preprocessor.binary_features
+    for feature, values in zip(preprocessor.categorical_features, preprocessor.categories):
+        names += [feature] * len(values)
+
+    importance = {}
+    for column, gain in booster.get_score(importance_type='total_gain').items():
+        name = names[int(column[1:])]
+        importance[name] = importance.get(name, 0.0) + gain
+    total = sum(importance.values()) or 1.0
+    ranked = sorted(importance.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {name: gain / total for name, gain in ranked}
+
+def score_held_out(path, chunk_rows, seed, model, preprocessor, profile_rows=PROFILE_ROWS):
+    """
+    Predict every row in one pass.
+
+    Returns the predicted and actual prices and the regions of the
+    calibration and test rows per split, and a sample of at most
+    profile_rows training rows with a _predicted_price column for the
+    drift profile.
+    """
+    held_out = {split: ([], [], []) for split in ('calibration', 'test')}
+    profile_sample = RowSample(profile_rows, seed)
+    train_code = list(SPLIT_SHARES).index('train')
+    offset = 0
+    for chunk in read_chunks(path, chunk_rows):
+        codes = split_codes(offset, len(chunk), seed)
+        offset += len(chunk)
+        features, log_prices = prepare_chunk(chunk)
+        predicted = np.exp(model.predict(preprocessor.transform(features)))
+        for split, (predictions, actuals, regions) in held_out.items():
+            keep = (codes == list(SPLIT_SHARES).index(split)) & np.isfinite(log_prices)
+            predictions.append(predicted[keep])
+            actuals.append(np.exp(log_prices[keep]))
+            regions.append(features['region_standardized'].to_numpy()[keep])
+        keep = (codes == train_code) & np.isfinite(log_prices)
+        profile_sample.add(features.assign(**amenity_flags(chunk), _predicted_price=predicted)[keep])
+    held_out = {split: tuple(np.concatenate(parts) for parts in values) for split, values in held_out.items()}
+    return held_out, profile_sample.rows()
+
+def accuracy(predicted, actual):
+    """
+    Accuracy metrics on held-out prices, in log and euro terms.
+    """
+    log_error = np.log(predicted) - np.log(actual)
+    log_actual = np.log(actual)
+    percentage_error = np.abs(predicted - actual) / actual * 100
+    median_percentage_error = float(np.median(percentage_error))
+    return {
+        'listings': int(len(actual)),
+        'log_rmse': float(np.sqrt(np.mean(log_error ** 2))),
+        'log_mae': float(np.mean(np.abs(log_error))),
+        'log_r2': float(1 - np.sum(log_error ** 2) / np.sum((log_actual - log_actual.mean()) ** 2)),
+        'mae': float(np.mean(np.abs(predicted - actual))),
+        'rmse': float(np.sqrt(np.mean((predicted - actual) ** 2))),
+        'median_percentage_error': median_percentage_error,
+        'confidence_percentage': max(0.0, 100 - median_percentage_error),
+    }
+
+def train(path, output_dir, chunk_rows=CHUNK_ROWS, seed=BASE_PARAMS['seed'], workers=None, nthread=None,
+          search_rows=SEARCH_ROWS, max_candidates=None, search=True, rounds=MAX_ROUNDS,
+          early_stopping_rounds=EARLY_STOPPING_ROUNDS, warm_start=None):
+    """
+    Train a model on a listing file and write its bundle, intervals and report to output_dir.
+
+    With warm_start, the bundle at that path is continued: its preprocessor
+    and parameters are kept, the search is skipped, and up to rounds trees
+    are added to its best iteration. Returns the training report.
+    """
+    import xgboost as xgb
+
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    timings = {}
+    report = {'data': os.path.abspath(path), 'seed': seed, 'splits': SPLIT_SHARES}
+
+    start = time.perf_counter()
+    previous = None
+    if warm_start:
+        bundle = load_bundle(warm_start)
+        preprocessor = bundle.preprocessor
+        previous = bundle.model.booster
+        if bundle.manifest['best_iteration'] is not None:
+            previous = previous[:bundle.manifest['best_iteration'] + 1]
+        # Boosters do not save their training parameters; the trainer records them in the metadata
+        params = dict(bundle.metadata.get('training_params', DEFAULT_PARAMS))
+        report['warm_start'] = {'bundle': os.path.abspath(warm_start), 'model_version': bundle.version,
+                                'rounds': previous.num_boosted_rounds()}
+        search = False
+    else:
+        preprocessor, sample, n_rows = fit_preprocessor(path, chunk_rows, seed, search_rows if search else 0)
+        params = dict(DEFAULT_PARAMS)
+        report['train_rows'] = n_rows
+    timings['fit_preprocessor'] = time.perf_counter() - start
+    logger.info(f"Preprocessor ready: {preprocessor.n_columns} model inputs")
+
+    if search:
+        start = time.perf_counter()
+        candidates = search_candidates(max_candidates, seed)
+        results = run_search(preprocessor, sample, candidates, rounds, early_stopping_rounds,
+                             min(workers, len(candidates)), seed)
+        params = dict(results[0]['params'])
+        timings['search'] = time.perf_counter() - start
+        report['search'] = {'sample_rows': len(sample[0]), 'candidates': results}
+        logger.info(f"Search picked {params} (validation log RMSE {results[0]['rmse']:.4f})")
+        del sample
+
+    start = time.perf_counter()
+    booster, history = train_booster(path, chunk_rows, seed, preprocessor, params, rounds,
+                                     early_stopping_rounds, previous, nthread or cpu_count)
+    timings['train'] = time.perf_counter() - start
+    model = BundledModel(booster, booster.num_boosted_rounds() - 1)
+    report['params'] = params
+    report['rounds'] = booster.num_boosted_rounds()
+    report['validation_log_rmse'] = history
+
+    start = time.perf_counter()
+    held_out, profile_sample = score_held_out(path, chunk_rows, seed, model, preprocessor)
+    metrics = accuracy(*held_out['test'][:2])
+    timings['evaluate'] = time.perf_counter() - start
+
+    metadata = {
+        'confidence_metrics': {key: metrics[key] for key in ('confidence_percentage', 'median_percentage_error')},
+        'feature_importance': feature_importance(booster, preprocessor),
+        'training_params': params,
+    }
+
+    # Write to a staging directory first so a failed run never leaves a half-written bundle
+    staging_dir = output_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = export_bundle(staging_dir, model, preprocessor, metadata)
+
+    start = time.perf_counter()
+    try:
+        table = intervals.calibrate(*held_out['calibration'], model_version=manifest['model_version'])
+        table.save(os.path.join(staging_dir, intervals.INTERVALS_FILE))
+        test_predicted, test_actual, test_regions = held_out['test']
+        coverage = {}
+        for level in table.levels:
+            lower, upper = table.bounds(test_predicted, test_regions, level)
+            coverage[str(level)] = float(np.mean((test_actual >= lower) & (test_actual <= upper)))
+        metrics['interval_coverage'] = coverage
+    except ValueError as e:
+        logger.warning(f"Prediction intervals not calibrated: {str(e)}")
+    timings['calibrate'] = time.perf_counter() - start
+
+    # The reference the live service compares incoming listings and predictions against
+    predictor = RentalPricePredictor(staging_dir, monitor_drift=False)
+    profile = build_profile(
+        predictor, profile_sample.drop(columns='_predicted_price'), profile_sample['_predicted_price'].to_numpy()
+    )
+    profile.save(os.path.join(staging_dir, DRIFT_PROFILE_FILE))
+    report['drift_profile'] = {
+        'digest': profile.digest,
+        'rows': len(profile_sample),
+        'single_bin_features': profile.single_bin_features(),
+    }
+
+    report.update({
+        'model_version': manifest['model_version'],
+        'xgboost_version': xgb.__version__,
+        'test_metrics': metrics,
+        'timings': timings,
+    })
+    with open(os.path.join(staging_dir, TRAINING_REPORT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the rent model out of core and write a model bundle.")
+    default_data = PARQUET_PATH if os.path.exists(PARQUET_PATH) else CSV_PATH
+    parser.add_argument('--data', default=default_data, help="Listing .csv or .parquet file with prices")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Bundle directory to write")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument('--seed', type=int, default=BASE_PARAMS['seed'])
+    parser.add_argument('--workers', type=int, default=None, help="Search processes (default: all cores)")
+    parser.add_argument('--nthread', type=int, default=None, help="XGBoost threads for the final model (default: all cores)")
+    parser.add_argument('--search-rows', type=int, default=SEARCH_ROWS, help="Training rows sampled for the search")
+    parser.add_argument('--max-candidates', type=int, default=None, help="Random subset of the grid to search")
+    parser.add_argument('--no-search', action='store_true', help="Train with the shipped model's parameters")
+    parser.add_argument('--rounds', type=int, default=MAX_ROUNDS, help="Most boosting rounds to add")
+    parser.add_argument('--early-stopping-rounds', type=int, default=EARLY_STOPPING_ROUNDS)
+    parser.add_argument('--warm-start', default=None, help="Bundle to continue training from")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    report = train(
+        args.data, args.output, args.chunk_rows, args.seed, args.workers, args.nthread,
+        args.search_rows, args.max_candidates, not args.no_search, args.rounds,
+        args.early_stopping_rounds, args.warm_start
+    )
+
+    metrics = report['test_metrics']
+    print(f"Wrote bundle {report['model_version']} to {args.output} ({report['rounds']} trees)", file=sys.stderr)
+    print(f"Test: log RMSE {metrics['log_rmse']:.4f}, R² {metrics['log_r2']:.3f}, MAE €{metrics['mae']:.0f}, "
+          f"median error {metrics['median_percentage_error']:.1f}%", file=sys.stderr)
+    if 'interval_coverage' in metrics:
+        coverage = ', '.join(f"{float(level):.0%}: {share:.1%}" for level, share in metrics['interval_coverage'].items())
+        print(f"Interval coverage: {coverage}", file=sys.stderr)
+    print("Timings: " + ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in report['timings'].items()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
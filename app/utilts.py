@@ -1,7 +1,4 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from price_chart import DEFAULT_BIN_SPEC, chart_title, frame_distribution, render_distribution, stats_distribution
 
 def format_feature_name(feature_name):
     """
@@ -19,6 +16,7 @@ def format_feature_name(feature_name):
         'Has ': 'Has ',
         'Is ': 'Is ',
         'Log Area': 'Area (log)',
+        'Region Standardized': 'Region',
         'Num ': 'Number of '
     }
     
@@ -27,22 +25,24 @@ def format_feature_name(feature_name):
         
     return feature_name
 
-def create_price_distribution_chart(data, region=None):
+def create_price_distribution_chart(data, region=None, city=None, spec=DEFAULT_BIN_SPEC):
     """
     Create a price distribution chart for a specific region or all regions
+
+    data is either the listings DataFrame or a PriceStatistics, in which case
+    the chart is drawn from its precomputed buckets instead of raw prices.
+    Returns a matplotlib Figure, e.g. for st.pyplot(fig).
     """
-    plt.figure(figsize=(10, 6))
+    # Imported here so formatting helpers don't pull in pandas
+    from price_stats import PriceStatistics
     
-    if region:
-        region_data = data[data['region_standardized'] == region]
-        sns.histplot(region_data['price'], kde=True)
-        plt.title(f'Price Distribution in {region}')
+    if isinstance(data, PriceStatistics):
+        distribution = stats_distribution(data, region, city, spec)
     else:
-        sns.histplot(data['price'], kde=True)
-        plt.title('Price Distribution Across Italy')
-    
-    plt.xlabel('Monthly Rent (€)')
-    plt.ylabel('Frequency')
-    plt.tight_layout()
+        if region:
+            data = data[data['region_standardized'] == region]
+        if city:
+            data = data[data['city'] == city]
+        distribution = frame_distribution(data['price'].to_numpy(), spec)
     
-    return plt
\ No newline at end of file
+    return render_distribution(distribution, chart_title(region, city))
@@ -0,0 +1,57 @@
+"""
+Background warm-up of slow resources.
+
+Loading the predictor imports XGBoost (and with it scikit-learn, SciPy and
+pandas), and the map needs pandas, geopandas and folium; together they take
+seconds on a cold container. start() begins loading a resource on a
+background thread so the caller can carry on, e.g. render the page shell,
+and result() blocks only when the resource is actually needed. Each resource
+is loaded once per process.
+"""
+import concurrent.futures
+import threading
+
+# Resources mostly wait on imports and disk, so a few load side by side
+MAX_WORKERS = 4
+
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+
+def start(name, function, *args, **kwargs):
+    """
+    Start loading a resource in the background unless it is loading or loaded,
+    and return its Future.
+    """
+    global _executor
+    with _lock:
+        future = _futures.get(name)
+        if future is None:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(MAX_WORKERS, thread_name_prefix='warmup')
+            future = _futures[name] = _executor.submit(function, *args, **kwargs)
+        return future
+
+def result(name, function, *args, timeout=None, **kwargs):
+    """
+    Return a resource, waiting for its warm-up or loading it now if none was started.
+
+    A failed load is forgotten, so the next call tries again.
+    """
+    future = start(name, function, *args, **kwargs)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        raise
+    except Exception:
+        with _lock:
+            if _futures.get(name) is future:
+                del _futures[name]
+        raise
+
+def ready(name):
+    """
+    Return True if a resource has finished loading successfully.
+    """
+    future = _futures.get(name)
+    return future is not None and future.done() and future.exception() is None
@@ -0,0 +1,7 @@
+"""
+Benchmarks for the prediction, data, map and chart paths.
+
+synthetic generates seeded listings at any size, suite runs every benchmark
+over them and saves JSON results, and the bench_* scripts compare individual
+optimizations against the code they replaced.
+"""
@@ -0,0 +1,134 @@
+"""
+Price distribution chart benchmark: seaborn over raw prices versus precomputed bins.
+
+Times the previous create_price_distribution_chart (filter the listings,
+sns.histplot with kde=True on the pyplot state) against the binned backend
+drawing from the listings DataFrame, from PriceStatistics on a cold cache
+and from PriceStatistics on a warm cache, for Italy and for one region. Also
+reports how far the binned KDE strays from an exact Gaussian KDE of the
+same prices, relative to the curve's peak, and the cost of building the
+bins and KDE alone, without drawing.
+
+Usage: python benchmarks/bench_chart.py [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from scipy.stats import gaussian_kde
+
+import price_chart
+from price_chart import frame_distribution, stats_distribution
+from price_stats import load_statistics
+from rental_store import load_rows
+from utilts import create_price_distribution_chart
+
+def legacy_chart(data, region=None):
+    """
+    The chart as it was built before the binned backend.
+    """
+    plt.figure(figsize=(10, 6))
+    if region:
+        region_data = data[data['region_standardized'] == region]
+        sns.histplot(region_data['price'], kde=True)
+        plt.title(f'Price Distribution in {region}')
+    else:
+        sns.histplot(data['price'], kde=True)
+        plt.title('Price Distribution Across Italy')
+    plt.xlabel('Monthly Rent (€)')
+    plt.ylabel('Frequency')
+    plt.tight_layout()
+    return plt
+
+def draw(chart):
+    """
+    Render a chart to PNG, as st.pyplot does, and release it.
+    """
+    import io
+
+    figure = chart.gcf() if chart is plt else chart
+    figure.savefig(io.BytesIO(), format='png')
+    if chart is plt:
+        plt.close(figure)
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        draw(function())
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def kde_error(prices, spec=price_chart.DEFAULT_BIN_SPEC):
+    """
+    Largest gap between the binned KDE and an exact Gaussian KDE, relative to the peak.
+    """
+    distribution = frame_distribution(prices, spec)
+    in_range = prices[prices <= distribution.edges[-1]]
+    exact = gaussian_kde(in_range)(distribution.kde_prices)
+    # Exact density to listings per histogram bar
+    exact *= len(in_range) * (distribution.edges[1] - distribution.edges[0])
+    return float(np.abs(distribution.kde_counts - exact).max() / exact.max())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    listings = load_rows(['price', 'region_standardized', 'city'])
+    stats = load_statistics()
+    region = stats.region_table().sort_values('property_count')['reg_name'].iloc[-1]
+
+    def cold(region):
+        price_chart._stats_distribution.cache_clear()
+        return create_price_distribution_chart(stats, region)
+
+    print(f"{len(listings)} listings")
+    print(f"{'chart':28s} {'Italy ms':>9s} {'region ms':>10s}")
+    cases = {
+        'seaborn raw prices (before)': lambda region: legacy_chart(listings, region),
+        'binned, DataFrame': lambda region: create_price_distribution_chart(listings, region),
+        'binned, stats (cold)': cold,
+        'binned, stats (cached)': lambda region: create_price_distribution_chart(stats, region),
+    }
+    for name, chart in cases.items():
+        italy = measure(lambda: chart(None), args.repeat)
+        regional = measure(lambda: chart(region), args.repeat)
+        print(f"{name:28s} {italy * 1000:9.1f} {regional * 1000:10.1f}")
+
+    def cold_distribution(region):
+        price_chart._stats_distribution.cache_clear()
+        return stats_distribution(stats, region)
+
+    listing_prices = listings['price'].to_numpy(dtype=np.float64)
+    region_prices = listings.loc[listings['region_standardized'] == region, 'price'].to_numpy(dtype=np.float64)
+    builds = {
+        'DataFrame': (lambda: frame_distribution(listing_prices), lambda: frame_distribution(region_prices)),
+        'stats (cold)': (lambda: cold_distribution(None), lambda: cold_distribution(region)),
+    }
+    print(f"{'bins + KDE only':28s} {'Italy ms':>9s} {'region ms':>10s}")
+    for name, (italy, regional) in builds.items():
+        print(f"{name:28s} {time_call(italy, args.repeat) * 1000:9.2f} {time_call(regional, args.repeat) * 1000:10.2f}")
+
+    print(f"binned KDE max error vs exact KDE ({region}): {kde_error(region_prices):.2%} of peak")
+
+if __name__ == "__main__":
+    main()
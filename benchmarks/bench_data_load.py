@@ -0,0 +1,68 @@
+"""
+Startup data-load benchmark: aggregating the full CSV versus the precomputed store.
+
+Compares the time and peak Python memory of the previous load_map_data (read
+the CSV, map regions, groupby, one filter per region for the city index)
+with loading the aggregate sidecar, and with an on-demand Parquet read of a
+single region's prices.
+
+Usage: python benchmarks/bench_data_load.py [--csv data/italian_rental_processed.csv]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+from regions import region_mapping
+from rental_store import CSV_PATH, PARQUET_PATH, SUMMARY_PATH, load_rows, load_summary
+
+def legacy_load(csv_path):
+    """
+    The map data load as it was done before the columnar store.
+    """
+    rental_data = pd.read_csv(csv_path)
+    rental_data['region_standardized'] = rental_data['region'].map(region_mapping)
+    region_city_map = {}
+    for region in rental_data['region_standardized'].unique():
+        region_city_map[region] = sorted(rental_data[rental_data['region_standardized'] == region]['city'].dropna().unique())
+    region_stats = rental_data.groupby('region_standardized')['price'].agg(['mean', 'median', 'count']).reset_index()
+    return region_stats, rental_data, region_city_map
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--summary', default=SUMMARY_PATH)
+    args = parser.parse_args()
+
+    summary = load_summary(args.summary, args.csv)
+    region = summary.regions[0]
+    cases = {
+        'CSV + groupby (before)': lambda: legacy_load(args.csv),
+        'summary sidecar': lambda: load_summary(args.summary, args.csv),
+        f'rows on demand ({region})': lambda: load_rows(['price'], [region], args.parquet, args.csv),
+    }
+
+    print(f"{summary.rows} listings")
+    print(f"{'load':32s} {'time ms':>9s} {'peak MB':>9s}")
+    for name, function in cases.items():
+        elapsed, peak, _ = measure(function)
+        print(f"{name:32s} {elapsed * 1000:9.1f} {peak / 1e6:9.1f}")
+
+if __name__ == "__main__":
+    main()
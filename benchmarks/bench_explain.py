@@ -0,0 +1,71 @@
+"""
+Cost of per-prediction attributions relative to plain prediction.
+
+Checks that every explanation sums to the log of its prediction, then reports
+single-listing latency of predict and explain (fast scorer, cache disabled),
+the latency of a cached explain, and the throughput of predict_batch and
+explain_batch, approximate (the default) and exact, over a bulk batch.
+
+Usage: python benchmarks/bench_explain.py [--rows 500] [--batch-rows 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+sys.path.append(current_dir)
+
+from prediction import load_default_predictor
+from bench_fast_scorer import latencies, random_listings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--batch-rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    models_dir = os.path.join(project_root, 'models')
+    predictor = load_default_predictor(models_dir, use_fast_scorer=True)
+    cached_predictor = load_default_predictor(models_dir, use_fast_scorer=True, cache_size=args.rows)
+    listings = random_listings(predictor, args.rows)
+
+    # Contributions are additive in log price
+    totals = np.array([sum(predictor.explain(listing).values()) for listing in listings])
+    log_predictions = np.log([predictor.predict(listing) for listing in listings])
+    error = np.abs(totals - log_predictions).max()
+    if error > 1e-4:
+        print(f"FAIL: explanations differ from log predictions by up to {error:.2e}")
+        sys.exit(1)
+    print(f"Parity OK: {args.rows} explanations sum to the log prediction (max error {error:.1e})")
+
+    for listing in listings:
+        cached_predictor.explain(listing)
+    cases = {
+        'predict': predictor.predict,
+        'explain': predictor.explain,
+        'explain (cached)': cached_predictor.explain,
+    }
+    print(f"{'single listing':20s} {'p50 us':>9s} {'p99 us':>9s}")
+    for name, function in cases.items():
+        timings = latencies(function, listings)
+        print(f"{name:20s} {np.percentile(timings, 50):9.1f} {np.percentile(timings, 99):9.1f}")
+
+    batch = random_listings(predictor, args.batch_rows, seed=1)
+    print(f"{'batch of ' + str(args.batch_rows):20s} {'seconds':>9s} {'rows/s':>9s}")
+    cases = {
+        'predict_batch': predictor.predict_batch,
+        'explain_batch': predictor.explain_batch,
+        'explain_batch exact': lambda batch: predictor.explain_batch(batch, exact=True),
+    }
+    for name, function in cases.items():
+        start = time.perf_counter()
+        function(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{name:20s} {elapsed:9.2f} {args.batch_rows / elapsed:9.0f}")
+
+if __name__ == "__main__":
+    main()
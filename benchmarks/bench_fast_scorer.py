@@ -0,0 +1,92 @@
+"""
+Parity check and latency benchmark for the single-row fast scorer.
+
+Scores the same random listings through the pandas/ColumnTransformer path and
+through FastScorer, fails if any prediction differs, and reports p50/p99
+latency per row for both.
+
+Usage: python benchmarks/bench_fast_scorer.py [--rows 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+from prediction import RentalPricePredictor
+from model_bundle import ArrayPreprocessor
+
+def random_listings(predictor, n_rows, seed=0):
+    """
+    Generate listings drawn from the preprocessor vocabularies, including
+    unseen regions/cities and randomly omitted features.
+    """
+    rng = np.random.default_rng(seed)
+    if isinstance(predictor.preprocessor, ArrayPreprocessor):
+        categories = predictor.preprocessor.categories
+    else:
+        categories = predictor.preprocessor.named_transformers_['cat'].categories_
+    regions = list(categories[0]) + ['Unknown Region']
+    cities = list(categories[1]) + ['Unknown City']
+    
+    listings = []
+    for _ in range(n_rows):
+        total_floors = int(rng.integers(1, 12))
+        listing = {
+            'log_area': float(np.log1p(rng.integers(15, 400))),
+            'bathrooms': int(rng.integers(1, 4)),
+            'floor_to_height_ratio': int(rng.integers(0, total_floors + 1)) / total_floors,
+            'total_floors': total_floors,
+            'parking_spaces': int(rng.integers(0, 3)),
+            'region_standardized': regions[rng.integers(len(regions))],
+            'city': cities[rng.integers(len(cities))],
+        }
+        for amenity in predictor.binary_features + predictor.rare_amenities:
+            listing[amenity] = int(rng.random() < 0.4)
+        # Drop a feature now and then to exercise the defaults
+        if rng.random() < 0.1:
+            del listing[predictor.numeric_features[rng.integers(5)]]
+        listings.append(listing)
+    
+    return listings
+
+def latencies(score, listings):
+    timings = np.empty(len(listings))
+    for i, listing in enumerate(listings):
+        start = time.perf_counter()
+        score(listing)
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+    
+    model_path = os.path.join(project_root, 'models', 'best_xgb_model.pkl')
+    preprocessor_path = os.path.join(project_root, 'models', 'preprocessor.pkl')
+    predictor = RentalPricePredictor(model_path, preprocessor_path)
+    fast_predictor = RentalPricePredictor(model_path, preprocessor_path, use_fast_scorer=True)
+    listings = random_listings(predictor, args.rows)
+    
+    # Parity against the reference path
+    expected = np.array([predictor.predict(listing) for listing in listings])
+    actual = np.array([fast_predictor.predict(listing) for listing in listings])
+    mismatches = np.flatnonzero(expected != actual)
+    if len(mismatches):
+        print(f"FAIL: {len(mismatches)} of {len(listings)} predictions differ, "
+              f"max abs diff {np.abs(expected - actual).max():.6f}")
+        sys.exit(1)
+    print(f"Parity OK on {len(listings)} listings")
+    
+    for name, score in [('pandas + ColumnTransformer', predictor.predict),
+                        ('fast scorer', fast_predictor.predict)]:
+        timings = latencies(score, listings)
+        print(f"{name:28s} p50 {np.percentile(timings, 50):8.1f} us   p99 {np.percentile(timings, 99):8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Overhead of the instrumentation layer.
+
+Reports the cost of one timer() block and one increment() call while
+instrumentation is disabled and enabled, and the p50/p99 latency of a
+fast-scorer prediction with instrumentation disabled, enabled, and enabled
+with the sampling profiler running. Ends with the Prometheus text export.
+
+Usage: python benchmarks/bench_instrumentation.py [--rows 5000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+sys.path.append(current_dir)
+
+import instrumentation
+from instrumentation import increment, timer
+from prediction import load_default_predictor
+from bench_fast_scorer import latencies, random_listings
+
+def call_cost(n_calls=200000):
+    """
+    Return the nanoseconds per timer() block and per increment() call.
+    """
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        with timer('noop'):
+            pass
+    timed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        increment('noop')
+    counted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        pass
+    empty = time.perf_counter() - start
+    return (timed - empty) / n_calls * 1e9, (counted - empty) / n_calls * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    predictor = load_default_predictor(os.path.join(project_root, 'models'), use_fast_scorer=True)
+    listings = random_listings(predictor, args.rows)
+    latencies(predictor.predict, listings[:200])
+
+    print(f"{'instrumentation':22s} {'timer ns':>9s} {'incr ns':>9s} {'p50 us':>9s} {'p99 us':>9s}")
+    for name in ('disabled', 'enabled', 'enabled + profiler'):
+        if name == 'disabled':
+            instrumentation.disable()
+        else:
+            instrumentation.enable()
+        if name.endswith('profiler'):
+            instrumentation.start_profiler(0.005)
+        timer_ns, increment_ns = call_cost()
+        timings = latencies(predictor.predict, listings)
+        print(f"{name:22s} {timer_ns:9.0f} {increment_ns:9.0f} "
+              f"{np.percentile(timings, 50):9.1f} {np.percentile(timings, 99):9.1f}")
+    profiler = instrumentation.stop_profiler()
+
+    print(f"\nProfiler: {profiler.samples} samples, {len(profiler.stacks)} distinct stacks")
+    print("\n" + instrumentation.registry.render_prometheus())
+
+if __name__ == "__main__":
+    main()
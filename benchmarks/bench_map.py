@@ -0,0 +1,99 @@
+"""
+Region map benchmark: full-resolution GeoJSON versus simplified geometry.
+
+Reports geometry load time, map build time, HTML render time and the payload
+size sent to the browser, for the previous two-layer map over the source
+GeoJSON and for each simplification level.
+
+Usage: python benchmarks/bench_map.py [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+import folium
+import geopandas as gpd
+
+from geometry import SIMPLIFICATION_LEVELS, SOURCE_PATH, build_region_map, load_region_geometry
+
+# Folium warns about the tile provider on every map; irrelevant here
+warnings.filterwarnings('ignore', message='CartoDB tiles')
+
+def legacy_map(regions_gdf, region_stats):
+    """
+    The map as it was built before simplification: a choropleth plus a second
+    GeoJson layer carrying the tooltip, both over the same polygons.
+    """
+    merged_gdf = regions_gdf.merge(region_stats, on='reg_name')
+    m = folium.Map(location=[41.8719, 12.5674], zoom_start=6, tiles='CartoDB positron')
+    folium.Choropleth(
+        geo_data=merged_gdf, name='Regional Prices', data=merged_gdf,
+        columns=['reg_name', 'mean_price'], key_on='feature.properties.reg_name',
+        fill_color='YlOrRd', fill_opacity=0.7, line_opacity=0.2,
+        legend_name='Average Rental Price (€)'
+    ).add_to(m)
+    m.add_child(folium.features.GeoJson(
+        merged_gdf,
+        style_function=lambda x: {'fillColor': '#ffffff', 'color': '#000000', 'fillOpacity': 0.1, 'weight': 0.1},
+        control=False,
+        highlight_function=lambda x: {'fillColor': '#000000', 'color': '#000000', 'fillOpacity': 0.50, 'weight': 0.1},
+        tooltip=folium.features.GeoJsonTooltip(
+            fields=['reg_name', 'mean_price', 'median_price', 'property_count'],
+            aliases=['Region', 'Average Price (€)', 'Median Price (€)', 'Number of Properties']
+        )
+    ))
+    return m
+
+def random_region_stats(region_names, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'reg_name': region_names,
+        'mean_price': rng.uniform(500, 1500, len(region_names)),
+        'median_price': rng.uniform(450, 1400, len(region_names)),
+        'property_count': rng.integers(100, 20000, len(region_names)),
+    })
+
+def measure(load, build, repeat):
+    timings = {'load': [], 'build': [], 'render': []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        regions_gdf = load()
+        loaded = time.perf_counter()
+        m = build(regions_gdf)
+        built = time.perf_counter()
+        html = m.get_root().render()
+        rendered = time.perf_counter()
+        timings['load'].append(loaded - start)
+        timings['build'].append(built - loaded)
+        timings['render'].append(rendered - built)
+    result = {stage: float(np.median(values)) for stage, values in timings.items()}
+    result['payload_bytes'] = len(html.encode('utf-8'))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    region_stats = random_region_stats(gpd.read_file(SOURCE_PATH)['reg_name'].tolist())
+
+    cases = {'source (before)': (lambda: gpd.read_file(SOURCE_PATH), lambda gdf: legacy_map(gdf, region_stats))}
+    for level in SIMPLIFICATION_LEVELS:
+        cases[level] = (lambda level=level: load_region_geometry(level), lambda gdf: build_region_map(gdf, region_stats))
+
+    print(f"{'geometry':16s} {'load ms':>9s} {'build ms':>9s} {'render ms':>10s} {'payload KB':>11s}")
+    for name, (load, build) in cases.items():
+        result = measure(load, build, args.repeat)
+        print(f"{name:16s} {result['load'] * 1000:9.1f} {result['build'] * 1000:9.1f} "
+              f"{result['render'] * 1000:10.1f} {result['payload_bytes'] / 1000:11.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Startup-time benchmark comparing the pickled artifacts with the model bundle.
+
+Each measurement runs in a fresh interpreter, so it includes importing the
+libraries as a new container would. Importing xgboost (which also imports
+sklearn when installed) is reported separately from reading the artifacts.
+
+Usage: python benchmarks/bench_model_load.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+
+# Runs in the child interpreter; prints the timings as JSON
+LOAD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.append({app_dir!r})
+from prediction import RentalPricePredictor
+imported = time.perf_counter()
+import xgboost
+libraries = time.perf_counter()
+predictor = RentalPricePredictor(*{args!r})
+loaded = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start, 'xgboost': libraries - imported,
+    'load': loaded - libraries, 'total': loaded - start
+}}))
+"""
+
+def time_cold_start(args, runs):
+    script = LOAD_SCRIPT.format(app_dir=os.path.join(project_root, 'app'), args=args)
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: float(np.median([result[key] for result in results])) for key in results[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--bundle', default=os.path.join(project_root, 'models', 'bundle'))
+    args = parser.parse_args()
+    
+    formats = {
+        'pickle': [os.path.join(project_root, 'models', 'best_xgb_model.pkl'),
+                   os.path.join(project_root, 'models', 'preprocessor.pkl')],
+        'bundle': [args.bundle],
+    }
+    
+    print(f"Median of {args.runs} cold starts (seconds)")
+    print(f"{'format':8s} {'import':>8s} {'xgboost':>8s} {'load':>8s} {'total':>8s}")
+    for name, load_args in formats.items():
+        timings = time_cold_start(load_args, args.runs)
+        print(f"{name:8s} {timings['import']:8.3f} {timings['xgboost']:8.3f} "
+              f"{timings['load']:8.3f} {timings['total']:8.3f}")
+
+if __name__ == "__main__":
+    main()
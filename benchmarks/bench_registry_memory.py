@@ -0,0 +1,99 @@
+"""
+Per-worker memory of forked prediction workers, with and without preloading.
+
+For each worker count, forks that many workers that each serve a few hundred
+predictions from a ModelRegistry, then measures every worker at the same time
+from /proc/<pid>/smaps_rollup:
+    RSS   pages mapped by the worker, shared or not
+    PSS   each shared page divided by the number of processes sharing it
+    USS   pages only this worker holds
+With preloading, the registry is loaded and prepared for fork in the parent
+(as `service --workers` does), so the model pages are shared and USS stays
+flat as workers are added. Without it, every worker loads its own copy.
+Linux only.
+
+Usage: python benchmarks/bench_registry_memory.py [--workers 1,2,4] [--predictions 300]
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+sys.path.append(current_dir)
+
+from model_registry import load_registry
+from bench_fast_scorer import random_listings
+
+def memory_mb():
+    """
+    Return this process's RSS, PSS and USS in MB.
+    """
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {'rss': values['Rss'], 'pss': values['Pss'], 'uss': uss}
+
+def run_workers(n_workers, models_dir, listings, preload):
+    """
+    Fork n_workers workers and return the memory of each, measured together.
+    """
+    registry = None
+    if preload:
+        registry = load_registry(models_dir, poll_interval=None, use_fast_scorer=True)
+        registry.prepare_for_fork()
+
+    workers = []
+    for _ in range(n_workers):
+        ready_read, ready_write = os.pipe()
+        go_read, go_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            worker_registry = registry or load_registry(models_dir, poll_interval=None, use_fast_scorer=True)
+            for listing in listings:
+                worker_registry.route().predictor.predict(listing)
+            os.write(ready_write, b'1')
+            # Measure only once every worker is loaded, so shared pages are counted across all of them
+            os.read(go_read, 1)
+            os.write(ready_write, json.dumps(memory_mb()).encode() + b'\n')
+            os._exit(0)
+        workers.append((pid, ready_read, go_write))
+
+    for _, ready_read, _ in workers:
+        os.read(ready_read, 1)
+    for _, _, go_write in workers:
+        os.write(go_write, b'1')
+    results = []
+    for pid, ready_read, _ in workers:
+        with os.fdopen(ready_read) as f:
+            results.append(json.loads(f.readline()))
+        os.waitpid(pid, 0)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--predictions', type=int, default=300)
+    args = parser.parse_args()
+
+    models_dir = os.path.join(project_root, 'models')
+    listings = random_listings(load_registry(models_dir, poll_interval=None).get().predictor, args.predictions)
+
+    print(f"{'mode':12s} {'workers':>7s} {'RSS MB':>8s} {'PSS MB':>8s} {'USS MB':>8s} {'total PSS':>10s}")
+    for preload in (False, True):
+        for n_workers in [int(n) for n in args.workers.split(',')]:
+            results = run_workers(n_workers, models_dir, listings, preload)
+            mean = {key: np.mean([result[key] for result in results]) for key in ('rss', 'pss', 'uss')}
+            total = sum(result['pss'] for result in results)
+            mode = 'preloaded' if preload else 'per worker'
+            print(f"{mode:12s} {n_workers:7d} {mean['rss']:8.1f} {mean['pss']:8.1f} {mean['uss']:8.1f} {total:10.1f}")
+
+if __name__ == "__main__":
+    main()
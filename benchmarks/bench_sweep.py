@@ -0,0 +1,112 @@
+"""
+Parity check and latency benchmark for what-if sweeps.
+
+For random listings, checks that every price of a mixed sweep (area,
+bathrooms, an amenity, a rare amenity and the city) and of what_if equals
+predict on the same variant, then compares the latency of what_if, scored
+as one grid, with predicting each of its variants separately the way a
+resubmitted form does.
+
+Usage: python benchmarks/bench_sweep.py [--listings 20]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+sys.path.append(current_dir)
+
+from prediction import load_default_predictor
+from bench_fast_scorer import random_listings
+
+def variant(listing, dimensions, combination):
+    """
+    Return the listing with the swept features set to one combination.
+    """
+    variant = dict(listing)
+    for name, value in zip(dimensions, combination):
+        if name == 'area':
+            variant['log_area'] = np.log1p(value)
+        else:
+            variant[name] = value
+    return variant
+
+def what_if_variants(listing, result):
+    """
+    Return every variant what_if scored for a listing, as feature dicts.
+    """
+    variants = [listing]
+    for name in ('area', 'floor_to_height_ratio'):
+        variants += [variant(listing, [name], [value]) for value in result['curves'][name]['values']]
+    for amenity, effect in result['amenities'].items():
+        variants.append(variant(listing, [amenity], [0 if effect['has'] else 1]))
+    return variants
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listings', type=int, default=20)
+    args = parser.parse_args()
+
+    models_dir = os.path.join(project_root, 'models')
+    predictor = load_default_predictor(models_dir, use_fast_scorer=True)
+    reference = load_default_predictor(models_dir)
+    listings = random_listings(predictor, args.listings)
+    for listing in listings:
+        listing['area'] = float(np.expm1(listing.get('log_area', np.log1p(80))))
+
+    cities = list(predictor.layout().categories[1][:3]) + ['Unknown City']
+    dimensions = {
+        'area': [30, 60, 90, 150], 'bathrooms': [1, 2, 3], 'has_elevator': [0, 1],
+        'has_garden': [0, 1], 'city': cities,
+    }
+
+    # Every grid price must match the preprocessor path on the same variant
+    error = 0.0
+    for listing in listings:
+        prices = predictor.sweep(listing, dimensions).prices.ravel()
+        variants = [variant(listing, dimensions, combination) for combination in itertools.product(*dimensions.values())]
+        error = max(error, np.max(np.abs(prices - reference.predict_batch(variants)) / prices))
+
+        result = predictor.what_if(listing)
+        variants = what_if_variants(listing, result)
+        expected = reference.predict_batch(variants)
+        prices = np.array([result['predicted_price']]
+                          + result['curves']['area']['prices'] + result['curves']['floor_to_height_ratio']['prices']
+                          + [effect['without'] if effect['has'] else effect['with'] for effect in result['amenities'].values()])
+        error = max(error, np.max(np.abs(prices - expected) / prices))
+    if error > 1e-6:
+        print(f"FAIL: sweep prices differ from predictions by up to {error:.2e}")
+        sys.exit(1)
+    print(f"Parity OK: sweeps of {args.listings} listings match predict (max relative error {error:.1e})")
+
+    sweep_timings, loop_timings = [], []
+    for listing in listings:
+        start = time.perf_counter()
+        result = predictor.what_if(listing)
+        sweep_timings.append(time.perf_counter() - start)
+
+        variants = what_if_variants(listing, result)
+        start = time.perf_counter()
+        for features in variants:
+            predictor.predict_with_confidence(features)
+        loop_timings.append(time.perf_counter() - start)
+
+    print(f"what_if of {len(variants)} variants      {'p50 ms':>9s} {'p99 ms':>9s}")
+    for name, timings in (('one grid', sweep_timings), ('one call per variant', loop_timings)):
+        timings = np.array(timings) * 1000
+        print(f"{name:30s} {np.percentile(timings, 50):9.2f} {np.percentile(timings, 99):9.2f}")
+
+    grid = {'area': list(range(20, 420, 4)), 'bathrooms': [1, 2, 3], 'has_elevator': [0, 1], 'has_garden': [0, 1]}
+    n_rows = int(np.prod([len(values) for values in grid.values()]))
+    start = time.perf_counter()
+    predictor.sweep(listings[0], grid)
+    elapsed = time.perf_counter() - start
+    print(f"sweep of {n_rows} variants: {elapsed * 1000:.1f} ms ({n_rows / elapsed:.0f} variants/s)")
+
+if __name__ == "__main__":
+    main()
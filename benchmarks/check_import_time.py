@@ -0,0 +1,100 @@
+"""
+Startup budget guard based on `python -X importtime`.
+
+Imports each entry module in a fresh interpreter with -X importtime and
+fails if its cumulative import time exceeds its budget or it pulls in a
+library that its path must load lazily (pandas, XGBoost, the geo and
+plotting stacks). The slowest direct imports of each module are listed so
+a regression points at its cause. Interpreter startup (site, encodings) is
+not counted.
+
+Usage: python benchmarks/check_import_time.py [--runs 3] [--scale 1.0] [--top 8]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+app_dir = os.path.join(project_root, 'app')
+
+# Loaded lazily: by the predictor's load, the map, the charts or the store
+HEAVY_MODULES = (
+    'pandas', 'pyarrow', 'xgboost', 'sklearn', 'scipy', 'matplotlib', 'seaborn',
+    'geopandas', 'shapely', 'folium', 'streamlit_folium',
+)
+
+# Entry module -> (import budget in ms, modules it must not import)
+BUDGETS = {
+    'prediction': (400, HEAVY_MODULES + ('streamlit',)),
+    'service': (450, HEAVY_MODULES + ('streamlit',)),
+    'utilts': (400, HEAVY_MODULES + ('streamlit',)),
+    'app': (1000, HEAVY_MODULES),
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Silences the bare-mode warnings streamlit logs when app.py is imported outside `streamlit run`
+CHILD_PRELUDE = "import logging; logging.disable(logging.WARNING); "
+
+def measure(module):
+    """
+    Import module in a fresh interpreter and return its cumulative import time
+    in microseconds, its direct imports as (microseconds, name) pairs, and
+    the set of loaded modules.
+    """
+    code = CHILD_PRELUDE + f"import sys; import {module}; print(' '.join(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=app_dir, capture_output=True, text=True, check=True
+    )
+    # A module's line follows those of the modules it imported, which are
+    # indented two more spaces per level
+    children = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 3:
+            children.append((cumulative, name))
+        elif depth == 1:
+            if name == module:
+                return cumulative, children, set(completed.stdout.split())
+            children = []
+    raise RuntimeError(f"No import time reported for {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against the startup budgets.")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh imports per module; the fastest counts")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every budget, e.g. for slower machines")
+    parser.add_argument('--top', type=int, default=8, help="Slowest direct imports to list per module")
+    parser.add_argument('--modules', default=','.join(BUDGETS), help="Comma-separated entry modules to check")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules.split(','):
+        budget_ms, forbidden = BUDGETS[module]
+        budget_ms *= args.scale
+        runs = [measure(module) for _ in range(args.runs)]
+        cumulative, children, loaded = min(runs, key=lambda run: run[0])
+        total_ms = cumulative / 1000
+
+        unexpected = sorted(name for name in forbidden if name in loaded)
+        status = 'OK' if total_ms <= budget_ms and not unexpected else 'FAIL'
+        print(f"{module:12s} {total_ms:8.1f} ms  (budget {budget_ms:.0f} ms)  {status}")
+        for us, name in sorted(children, reverse=True)[:args.top]:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+        if total_ms > budget_ms:
+            failures.append(f"{module} imports in {total_ms:.0f} ms, over its {budget_ms:.0f} ms budget")
+        if unexpected:
+            failures.append(f"{module} imports {', '.join(unexpected)} at import time")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local load test for the prediction service.
+
+Starts the service (unless --url is given), sends /predict requests from a
+number of concurrent clients over keep-alive connections and reports
+throughput, latency percentiles and the average micro-batch size.
+
+Usage: python benchmarks/loadtest_service.py [--clients 32] [--requests 5000]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+from bench_fast_scorer import random_listings
+from prediction import load_default_predictor
+
+def request_json(connection, method, path, payload=None):
+    body = json.dumps(payload) if payload is not None else None
+    connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{method} {path} returned {response.status}: {data[:200]!r}")
+    return json.loads(data)
+
+def wait_for_service(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return request_json(http.client.HTTPConnection(host, port, timeout=5), 'GET', '/health')
+        except (OSError, RuntimeError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Service on {host}:{port} did not start within {timeout}s")
+
+def run_client(host, port, listings, latencies, errors):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    for listing in listings:
+        start = time.perf_counter()
+        try:
+            request_json(connection, 'POST', '/predict', listing)
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors.append(listing)
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Existing service to test instead of starting one")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=32, help="Concurrent client connections")
+    parser.add_argument('--requests', type=int, default=5000, help="Total /predict requests")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parsed = urllib.parse.urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'app.service', '--host', host, '--port', str(port),
+             '--batch-size', str(args.batch_size), '--batch-wait-ms', str(args.batch_wait_ms)],
+            cwd=project_root
+        )
+
+    try:
+        before = wait_for_service(host, port)
+
+        predictor = load_default_predictor(os.path.join(project_root, 'models'))
+        listings = random_listings(predictor, args.requests)
+        shards = [listings[i::args.clients] for i in range(args.clients)]
+        latencies, errors = [], []
+
+        threads = [
+            threading.Thread(target=run_client, args=(host, port, shard, latencies, errors))
+            for shard in shards
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        after = request_json(http.client.HTTPConnection(host, port), 'GET', '/health')
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    timings = np.array(latencies) * 1000
+    batches = after['batches'] - before['batches']
+    batched = after['batched_requests'] - before['batched_requests']
+
+    print(f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s, {len(errors)} errors")
+    print(f"Throughput: {len(latencies) / elapsed:.0f} req/s")
+    print(f"Latency ms: p50 {np.percentile(timings, 50):.2f}  p90 {np.percentile(timings, 90):.2f}  "
+          f"p99 {np.percentile(timings, 99):.2f}  max {timings.max():.2f}")
+    if batches:
+        print(f"Average batch size: {batched / batches:.1f} over {batches} batches")
+
+if __name__ == "__main__":
+    main()
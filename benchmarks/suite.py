@@ -0,0 +1,579 @@
+"""
+Reproducible benchmark suite over seeded synthetic listings.
+
+Generates a synthetic dataset of the requested size, runs it through the same
+code the app uses (store ingest and load, aggregation, map, price chart,
+single and batch prediction, offline scoring, training, comparable listings,
+geocoding, drift monitoring), and saves every measurement as JSON together
+with the commit and library versions. Passing an earlier results file with
+--compare prints the change of each metric and flags regressions. The run
+exits with status 1 if any case fails, e.g. on one of its parity checks, or
+if a metric regressed.
+
+Usage:
+    python benchmarks/suite.py --rows 100000 --seed 0
+    python benchmarks/suite.py --rows 1000000 --only data,predict_batch --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+sys.path.append(current_dir)
+
+from synthetic import ListingsGenerator, model_features
+
+RESULTS_DIR = os.path.join(current_dir, 'results')
+RESULTS_FORMAT_VERSION = 1
+
+# Listings scored one at a time by the single-prediction case
+SINGLE_PREDICTIONS = 2000
+
+# Queries of the comparable-listings case, and how many are checked against a full scan
+COMPARABLE_QUERIES = 2000
+COMPARABLE_PARITY_QUERIES = 100
+
+# Points of the geocoding case checked against, and timed on, plain polygon tests
+GEOCODE_PARITY_POINTS = 20000
+
+# Boosting rounds of the training case, which skips the hyperparameter search
+TRAIN_ROUNDS = 50
+
+# Listings observed one at a time by the drift case
+DRIFT_OBSERVATIONS = 2000
+
+# Regressions smaller than this relative change are treated as noise
+DEFAULT_THRESHOLD = 0.10
+
+# Timing changes under a millisecond are treated as noise too, whatever their relative size
+MIN_TIMING_CHANGE = 0.001
+
+# Seconds per unit of each timing metric suffix
+TIMING_UNITS = {'_s': 1.0, '_ms': 1e-3, '_us': 1e-6}
+
+def best_of(function, repeat):
+    """
+    Run function repeat times and return the fastest time and the last result.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+class BenchmarkContext:
+    """
+    Dataset, working files and predictor shared by the benchmark cases.
+    """
+    def __init__(self, rows, seed, workdir, repeat):
+        self.rows = rows
+        self.seed = seed
+        self.workdir = workdir
+        self.repeat = repeat
+        self.csv_path = os.path.join(workdir, 'listings.csv')
+        self.parquet_path = os.path.join(workdir, 'listings.parquet')
+        self.summary_path = os.path.join(workdir, 'summary.json')
+        self.stats_path = os.path.join(workdir, 'stats.npz')
+        self._listings = None
+        self._predictor = None
+
+    @property
+    def listings(self):
+        if self._listings is None:
+            self._listings = ListingsGenerator(self.seed).listings(self.rows)
+        return self._listings
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            from prediction import load_default_predictor
+
+            self._predictor = load_default_predictor(os.path.join(project_root, 'models'), use_fast_scorer=True)
+        return self._predictor
+
+    def ensure_store(self):
+        """
+        Write the CSV and ingest it into the store, once.
+        """
+        from rental_store import ingest
+
+        if not os.path.exists(self.csv_path):
+            self.listings.to_csv(self.csv_path, index=False)
+        if not os.path.exists(self.summary_path):
+            ingest(self.csv_path, self.parquet_path, self.summary_path, self.stats_path)
+
+def bench_generate(context):
+    elapsed, listings = best_of(lambda: ListingsGenerator(context.seed).listings(context.rows), 1)
+    context._listings = listings
+    return {
+        'seconds': elapsed,
+        'rows_per_s': context.rows / elapsed,
+        'memory_mb': listings.memory_usage(deep=True).sum() / 1e6,
+    }
+
+def bench_data(context):
+    from price_stats import load_statistics
+    from rental_store import load_rows, load_summary, read_csv, summarize
+
+    start = time.perf_counter()
+    context.listings.to_csv(context.csv_path, index=False)
+    write_csv = time.perf_counter() - start
+
+    from rental_store import ingest
+    start = time.perf_counter()
+    ingest(context.csv_path, context.parquet_path, context.summary_path, context.stats_path)
+    ingest_seconds = time.perf_counter() - start
+
+    aggregate, _ = best_of(lambda: summarize(read_csv(context.csv_path)), context.repeat)
+    summary, _ = best_of(lambda: load_summary(context.summary_path, context.csv_path), context.repeat)
+    statistics, stats = best_of(lambda: load_statistics(context.stats_path), context.repeat)
+    region_table, _ = best_of(stats.region_table, context.repeat)
+    one_region, rows = best_of(
+        lambda: load_rows(['price', 'city'], ['Lombardia'], context.parquet_path, context.csv_path),
+        context.repeat
+    )
+    return {
+        'write_csv_s': write_csv,
+        'ingest_s': ingest_seconds,
+        'csv_aggregate_s': aggregate,
+        'load_summary_s': summary,
+        'load_statistics_s': statistics,
+        'region_table_s': region_table,
+        'load_region_rows_s': one_region,
+        'region_rows': len(rows),
+        'parquet_mb': os.path.getsize(context.parquet_path) / 1e6,
+    }
+
+def bench_map(context):
+    import warnings
+    from geometry import DEFAULT_ZOOM, build_region_map, level_for_zoom, load_region_geometry
+    from price_stats import load_statistics
+
+    warnings.filterwarnings('ignore', message='CartoDB tiles')
+    context.ensure_store()
+    region_stats = load_statistics(context.stats_path).region_table()
+    level = level_for_zoom(DEFAULT_ZOOM)
+
+    geometry, regions_gdf = best_of(lambda: load_region_geometry(level), context.repeat)
+    build, region_map = best_of(lambda: build_region_map(regions_gdf, region_stats), context.repeat)
+    render, html = best_of(lambda: region_map.get_root().render(), context.repeat)
+    return {
+        'level': level,
+        'load_geometry_s': geometry,
+        'build_s': build,
+        'render_html_s': render,
+        'html_kb': len(html.encode('utf-8')) / 1e3,
+    }
+
+def bench_chart(context):
+    from price_stats import load_statistics
+    from rental_store import load_summary
+    from utilts import create_price_distribution_chart
+
+    context.ensure_store()
+    stats = load_statistics(context.stats_path)
+    region_cities = load_summary(context.summary_path, context.csv_path).region_cities
+    region = max(region_cities, key=lambda name: stats.count(region=name))
+    city = max(region_cities[region], key=lambda name: stats.count(region=region, city=name))
+
+    def chart_to_png(**scope):
+        figure = create_price_distribution_chart(stats, **scope)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png')
+        return buffer.getbuffer().nbytes
+
+    results = {}
+    for name, scope in (('all', {}), ('region', {'region': region}), ('city', {'region': region, 'city': city})):
+        elapsed, size = best_of(lambda: chart_to_png(**scope), context.repeat)
+        results[f'{name}_ms'] = elapsed * 1000
+    results['png_kb'] = size / 1e3
+    return results
+
+def bench_predict_single(context):
+    predictor = context.predictor
+    features = model_features(context.listings.iloc[:SINGLE_PREDICTIONS])
+    columns = predictor.numeric_features[:-1] + predictor.binary_features + predictor.rare_amenities + predictor.categorical_features
+    records = features[columns].astype({'region_standardized': object, 'city': object}).to_dict('records')
+
+    for record in records[:100]:
+        predictor.predict(record)
+    timings = []
+    for record in records:
+        start = time.perf_counter()
+        predictor.predict(record)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return {
+        'listings': len(records),
+        'p50_us': float(np.percentile(timings, 50)),
+        'p99_us': float(np.percentile(timings, 99)),
+        'mean_us': float(timings.mean()),
+    }
+
+def bench_predict_batch(context):
+    predictor = context.predictor
+    features = model_features(context.listings)
+    elapsed, _ = best_of(lambda: predictor.predict_batch(features), context.repeat)
+    with_intervals, _ = best_of(lambda: predictor.predict_batch_with_confidence(features), context.repeat)
+    return {
+        'seconds': elapsed,
+        'rows_per_s': context.rows / elapsed,
+        'with_confidence_s': with_intervals,
+    }
+
+def bench_score(context):
+    import pandas as pd
+    from score import score_file
+
+    # The CSV has the raw schema (region slugs, no derived features), as a listing dump would
+    context.ensure_store()
+    output_path = os.path.join(context.workdir, 'scored.csv')
+    models_dir = os.path.join(project_root, 'models')
+    elapsed, rows = best_of(lambda: score_file(context.csv_path, output_path, models_dir, workers=1), 1)
+
+    # The CLI must derive the same features as the standardized frame the other cases score
+    scored = pd.read_csv(output_path, usecols=['predicted_price'])['predicted_price'].to_numpy()
+    expected = context.predictor.predict_batch(model_features(context.listings))
+    if rows != context.rows or not np.allclose(scored, expected, rtol=1e-5):
+        raise RuntimeError("Offline scoring differs from predict_batch on the standardized listings")
+
+    return {
+        'seconds': elapsed,
+        'rows_per_s': rows / elapsed,
+    }
+
+def bench_train(context):
+    from train import train
+
+    context.ensure_store()
+    output_dir = os.path.join(context.workdir, 'candidate')
+    elapsed, report = best_of(
+        lambda: train(context.csv_path, output_dir, search=False, rounds=TRAIN_ROUNDS, workers=1), 1
+    )
+
+    # Every numeric feature varies in the listings, so none may collapse into one profile bin
+    collapsed = report['drift_profile']['single_bin_features']
+    if collapsed:
+        raise RuntimeError(f"Trainer-built drift profile has a single bin for {', '.join(collapsed)}")
+
+    return {
+        'seconds': elapsed,
+        'rows_per_s': context.rows / elapsed,
+        'test_log_rmse': report['test_metrics']['log_rmse'],
+        'profile_rows': report['drift_profile']['rows'],
+    }
+
+def bench_comparables(context):
+    from comparables import ComparablesIndex
+
+    features = model_features(context.listings)
+    build, index = best_of(lambda: ComparablesIndex.from_listings(features, version='benchmark'), 1)
+    path = os.path.join(context.workdir, 'comparables.npz')
+    save, _ = best_of(lambda: index.save(path), 1)
+    load, index = best_of(lambda: ComparablesIndex.load(path), context.repeat)
+
+    queries = features.sample(min(COMPARABLE_QUERIES, len(features)), random_state=context.seed)
+    records = queries.drop(columns=['price']).astype({'region_standardized': object, 'city': object}).to_dict('records')
+
+    # The index must find the same neighbours as a scan of the listings it searches
+    rows, distances = index.query(records[:COMPARABLE_PARITY_QUERIES])
+    for record, expected in zip(records[:COMPARABLE_PARITY_QUERIES], distances):
+        start, stop = index.block(record['region_standardized'], record['city'], expected.shape[0])
+        point = index.scale(index.query_values([record]))[0]
+        scanned = np.sort(np.sqrt(((index.points[start:stop] - point) ** 2).sum(axis=1)))[:len(expected)]
+        if not np.allclose(scanned, expected, atol=1e-4):
+            raise RuntimeError("Comparables differ from a full scan")
+
+    # What a request would cost without the index: scan the listings of the city
+    def scan(record):
+        listings = features[(features['region_standardized'] == record['region_standardized'])
+                            & (features['city'] == record['city'])]
+        distances = np.sqrt(((index.scale(index.query_values(listings)) - index.scale(index.query_values([record]))) ** 2).sum(axis=1))
+        return listings.iloc[np.argsort(distances)[:5]]
+
+    scan_timings = []
+    for record in records[:50]:
+        start = time.perf_counter()
+        scan(record)
+        scan_timings.append(time.perf_counter() - start)
+
+    timings = []
+    for record in records:
+        start = time.perf_counter()
+        index.nearest(record)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings[len(timings) // 10:]) * 1e6
+    batch, _ = best_of(lambda: index.nearest_batch(queries), context.repeat)
+    return {
+        'build_s': build,
+        'save_s': save,
+        'load_s': load,
+        'index_mb': os.path.getsize(path) / 1e6,
+        'p50_us': float(np.percentile(timings, 50)),
+        'p99_us': float(np.percentile(timings, 99)),
+        'scan_p50_us': float(np.percentile(scan_timings, 50)) * 1e6,
+        'batch_s': batch,
+        'batch_rows_per_s': len(queries) / batch,
+    }
+
+def bench_geolocation(context):
+    import geopandas as gpd
+    import shapely
+    from geolocation import SOURCE_PATH, RegionIndex, build_region_index
+
+    build, index = best_of(build_region_index, 1)
+    path = os.path.join(context.workdir, 'regions_index.npz')
+    save, _ = best_of(lambda: index.save(path), 1)
+    load, index = best_of(lambda: RegionIndex.load(path), context.repeat)
+
+    # Points spread over the grid, which covers Italy's bounding box
+    rng = np.random.default_rng(context.seed)
+    ny, nx = index.grid.shape
+    longitudes = index.origin[0] + rng.random(context.rows) * nx * index.cell_size
+    latitudes = index.origin[1] + rng.random(context.rows) * ny * index.cell_size
+    locate, codes = best_of(lambda: index.locate(longitudes, latitudes), context.repeat)
+
+    # The index must agree with testing the points against the whole region polygons
+    tree = shapely.STRtree(gpd.read_file(SOURCE_PATH).geometry.values)
+    sample = slice(0, GEOCODE_PARITY_POINTS)
+
+    def plain():
+        points, found = tree.query(shapely.points(longitudes[sample], latitudes[sample]), predicate='intersects')
+        expected = np.full(len(longitudes[sample]), -1)
+        order = np.lexsort((found, points))
+        points, first = np.unique(points[order], return_index=True)
+        expected[points] = found[order][first]
+        return expected
+    plain_time, expected = best_of(plain, 1)
+    if not np.array_equal(expected, codes[sample]):
+        raise RuntimeError("Region index differs from point-in-polygon tests on the region polygons")
+
+    return {
+        'build_s': build,
+        'save_s': save,
+        'load_s': load,
+        'index_mb': os.path.getsize(path) / 1e6,
+        'locate_s': locate,
+        'points_per_s': context.rows / locate,
+        'polygon_points_per_s': len(expected) / plain_time,
+        'located_share': float(np.mean(codes >= 0)),
+    }
+
+def bench_drift(context):
+    from drift import DriftMonitor, DriftProfile, build_profile
+
+    predictor = context.predictor
+    features = model_features(context.listings).drop(columns=['price'])
+    half = len(features) // 2
+    reference, live = features.iloc[:half], features.iloc[half:]
+    predictions = predictor.predict_batch(live)
+
+    build, profile = best_of(lambda: build_profile(predictor, reference), 1)
+    path = os.path.join(context.workdir, 'drift_profile.npz')
+    profile.save(path)
+    load, profile = best_of(lambda: DriftProfile.load(path), context.repeat)
+    if profile.single_bin_features():
+        raise RuntimeError(f"Drift profile has a single bin for {', '.join(profile.single_bin_features())}")
+
+    # One observation per request, as the service records them
+    count = min(DRIFT_OBSERVATIONS, len(live))
+    records = live.iloc[:count].astype({'region_standardized': object, 'city': object}).to_dict('records')
+    single = DriftMonitor(profile)
+    timings = []
+    for record, prediction in zip(records, predictions[:count]):
+        start = time.perf_counter()
+        single.observe(record, prediction)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+
+    def observe_frame():
+        monitor = DriftMonitor(profile)
+        monitor.observe_batch(live, predictions)
+        return monitor
+    batch, monitor = best_of(observe_frame, context.repeat)
+
+    # Single observations must land in the same bins as the vectorized batch path,
+    # and snapshots of two halves must merge into the counts of the whole
+    batched = DriftMonitor(profile)
+    batched.observe_batch(live.iloc[:count], predictions[:count])
+    if single.snapshot()['counts'] != batched.snapshot()['counts']:
+        raise RuntimeError("Drift counts of single observations differ from the batch path")
+    merged = DriftMonitor(profile)
+    for part in (slice(0, len(live) // 2), slice(len(live) // 2, None)):
+        worker = DriftMonitor(profile)
+        worker.observe_batch(live.iloc[part], predictions[part])
+        merged.merge(worker.snapshot())
+    if merged.snapshot()['counts'] != monitor.snapshot()['counts']:
+        raise RuntimeError("Merged drift snapshots differ from observing every listing in one monitor")
+
+    report_time, report = best_of(monitor.report, context.repeat)
+    return {
+        'build_s': build,
+        'load_ms': load * 1e3,
+        'profile_kb': os.path.getsize(path) / 1e3,
+        'bins': profile.size,
+        'observe_p50_us': float(np.percentile(timings, 50)),
+        'observe_p99_us': float(np.percentile(timings, 99)),
+        'observe_rows_per_s': len(live) / batch,
+        'report_ms': report_time * 1e3,
+        'max_psi': max(entry['psi'] for entry in report['features'].values()),
+    }
+
+BENCHMARKS = {
+    'generate': bench_generate,
+    'data': bench_data,
+    'map': bench_map,
+    'chart': bench_chart,
+    'predict_single': bench_predict_single,
+    'predict_batch': bench_predict_batch,
+    'score': bench_score,
+    'train': bench_train,
+    'comparables': bench_comparables,
+    'geolocation': bench_geolocation,
+    'drift': bench_drift,
+}
+
+def environment():
+    from importlib import metadata
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=project_root, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {'python': platform.python_version()}
+    for package in ('numpy', 'pandas', 'pyarrow', 'xgboost', 'scikit-learn', 'geopandas', 'folium', 'matplotlib'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+    }
+
+def run_suite(rows, seed=0, names=None, repeat=3):
+    """
+    Run the named benchmarks (all by default) and return the results document.
+    """
+    names = list(BENCHMARKS) if names is None else names
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='rentelligence-bench-') as workdir:
+        context = BenchmarkContext(rows, seed, workdir, repeat)
+        for name in names:
+            start = time.perf_counter()
+            try:
+                results[name] = BENCHMARKS[name](context)
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+            print(f"{name:15s} {time.perf_counter() - start:8.1f}s  {json.dumps(results[name], default=float)}")
+    return {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'rows': rows,
+        'seed': seed,
+        'repeat': repeat,
+        'environment': environment(),
+        'results': results,
+    }
+
+def timing_unit(metric):
+    """
+    Return the seconds per unit of a timing metric, or None for other metrics.
+    """
+    if metric == 'seconds':
+        return 1.0
+    if metric.endswith('per_s'):
+        return None
+    for suffix, unit in TIMING_UNITS.items():
+        if metric.endswith(suffix):
+            return unit
+    return None
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Print the change of every shared metric and return the regressions.
+    """
+    if (baseline['rows'], baseline['seed']) != (current['rows'], current['seed']):
+        print(f"Warning: comparing {baseline['rows']} rows (seed {baseline['seed']}) "
+              f"with {current['rows']} rows (seed {current['seed']})")
+    regressions = []
+    print(f"\n{'metric':40s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            previous = baseline['results'].get(name, {}).get(metric)
+            unit = timing_unit(metric)
+            throughput = metric.endswith('per_s')
+            if (unit is None and not throughput) or not isinstance(previous, (int, float)) or not previous:
+                continue
+            change = value / previous - 1
+            if throughput:
+                worse = change < -threshold
+            else:
+                worse = change > threshold and (value - previous) * unit >= MIN_TIMING_CHANGE
+            if worse:
+                regressions.append(f'{name}.{metric}')
+            print(f"{name + '.' + metric:40s} {previous:12.4g} {value:12.4g} {change:+8.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on synthetic listings.")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic listings, e.g. 10000 to 10000000")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest is kept")
+    parser.add_argument('--only', default=None, help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--output', default=None, help="Results path (default: benchmarks/results/<commit>-<rows>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else None
+    unknown = set(names or []) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    document = run_suite(args.rows, args.seed, names, args.repeat)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (document['environment']['commit'] or 'nogit')[:10]
+        output = os.path.join(RESULTS_DIR, f"{commit}-{args.rows}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, default=float)
+    print(f"\nSaved {output}")
+
+    failed = False
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            failed = True
+
+    # A case that raised, e.g. on a parity check, fails the run whether or not it is compared
+    errors = [name for name, result in document['results'].items() if 'error' in result]
+    if errors:
+        print(f"\n{len(errors)} benchmark(s) failed: {', '.join(errors)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
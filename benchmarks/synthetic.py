@@ -0,0 +1,286 @@
+"""
+Seeded synthetic Italian rental listings for reproducible benchmarks.
+
+Listings have the columns of data/italian_rental_processed.csv (region slug,
+city, price, area, bathrooms, floor, total_floors) plus the parking and
+amenity columns the predictor reads, so the same frame feeds the data store,
+the map, the charts and the model. Regions are drawn with roughly their share
+of Italian listings, cities from the model's city vocabulary with a few large
+cities per region, and prices from a log-linear model of area, location and
+amenities.
+
+Rows are generated in fixed blocks, each with its own seed derived from the
+base seed, so a given seed always yields the same rows whatever the chunk
+size, and smaller datasets are prefixes of larger ones.
+
+Write a dataset with:
+    python benchmarks/synthetic.py data/synthetic_1m.parquet --rows 1000000 --seed 0
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(os.path.join(project_root, 'app'))
+
+from regions import region_mapping
+
+CITY_VOCABULARY_PATH = os.path.join(project_root, 'models', 'bundle', 'categories_city.npy')
+
+# Rows per independently seeded block
+BLOCK_ROWS = 65536
+
+# Region slug -> (share of listings, price level relative to the national median)
+REGION_PROFILES = {
+    'lombardia': (0.17, 1.35),
+    'lazio': (0.11, 1.20),
+    'campania': (0.08, 0.85),
+    'sicilia': (0.07, 0.70),
+    'veneto': (0.08, 1.05),
+    'emilia-romagna': (0.08, 1.10),
+    'piemonte': (0.07, 0.90),
+    'puglia': (0.06, 0.80),
+    'toscana': (0.07, 1.25),
+    'calabria': (0.03, 0.65),
+    'sardegna': (0.03, 0.95),
+    'liguria': (0.03, 1.10),
+    'marche': (0.025, 0.85),
+    'abruzzo': (0.02, 0.75),
+    'friuli-venezia-giulia': (0.02, 0.90),
+    'trentino-alto-adige': (0.02, 1.30),
+    'umbria': (0.015, 0.80),
+    'basilicata': (0.008, 0.65),
+    'molise': (0.005, 0.60),
+    'valle-d-aosta': (0.004, 1.15),
+}
+
+# Regional capitals, the most listed city of their region when in the vocabulary
+REGIONAL_CAPITALS = {
+    'lombardia': 'Milano', 'lazio': 'Roma', 'campania': 'Napoli', 'sicilia': 'Palermo',
+    'veneto': 'Venezia', 'emilia-romagna': 'Bologna', 'piemonte': 'Torino', 'puglia': 'Bari',
+    'toscana': 'Firenze', 'calabria': 'Catanzaro', 'sardegna': 'Cagliari', 'liguria': 'Genova',
+    'marche': 'Ancona', 'abruzzo': "L'Aquila", 'friuli-venezia-giulia': 'Trieste',
+    'trentino-alto-adige': 'Trento', 'umbria': 'Perugia', 'basilicata': 'Potenza',
+    'molise': 'Campobasso', 'valle-d-aosta': 'Aosta',
+}
+
+# Share of listings whose region column holds a city or variant slug (e.g. 'milano'), as in the source data
+CITY_SLUG_SHARE = 0.05
+
+AMENITY_RATES = {
+    'has_elevator': 0.45, 'has_doorman': 0.08, 'has_balcony': 0.50,
+    'has_external_exposure': 0.60, 'has_furnished': 0.55, 'has_terrace': 0.20,
+    'has_garden': 0.12, 'has_air_conditioning': 0.30, 'has_storage_room': 0.15,
+    'has_cellar': 0.20,
+}
+
+# Effect of each amenity on log price
+AMENITY_EFFECTS = {
+    'has_elevator': 0.06, 'has_doorman': 0.12, 'has_balcony': 0.02,
+    'has_external_exposure': 0.01, 'has_furnished': 0.05, 'has_terrace': 0.07,
+    'has_garden': 0.05, 'has_air_conditioning': 0.06, 'has_storage_room': 0.02,
+    'has_cellar': 0.01,
+}
+
+# Log price of a 70 m2 listing at price level 1, and its elasticity to area
+BASE_LOG_PRICE = np.log(750)
+AREA_ELASTICITY = 0.75
+PRICE_NOISE = 0.28
+
+class ListingsGenerator:
+    """
+    Deterministic generator of synthetic listings for a fixed city layout.
+    """
+    def __init__(self, seed=0, cities=None):
+        """
+        cities is the city vocabulary to draw from; by default the model's own
+        vocabulary, or generated names when the model bundle is absent.
+        """
+        self.seed = seed
+        if cities is None:
+            cities = load_city_vocabulary()
+        cities = np.asarray(sorted(set(cities)), dtype=object)
+
+        slugs = list(REGION_PROFILES)
+        shares = np.array([REGION_PROFILES[slug][0] for slug in slugs])
+        self.region_slugs = slugs
+        self.region_weights = shares / shares.sum()
+        self.region_levels = np.log([REGION_PROFILES[slug][1] for slug in slugs])
+
+        # Other slugs that region_mapping sends to each region: cities and spelling variants
+        self.city_slugs = {
+            region: [slug for slug, name in region_mapping.items()
+                     if slug not in REGION_PROFILES and name == region_mapping[region]]
+            for region in slugs
+        }
+        self.slug_categories = sorted(set(slugs) | {slug for s in self.city_slugs.values() for slug in s})
+        self.city_categories = list(cities)
+
+        # Fixed assignment of cities to regions, with Zipf popularity within each region
+        layout_rng = np.random.default_rng([seed, 0xC17])
+        owner = layout_rng.choice(len(slugs), size=len(cities), p=self.region_weights)
+        city_index = {city: i for i, city in enumerate(cities)}
+        self.region_cities = []
+        self.region_city_weights = []
+        for region, slug in enumerate(slugs):
+            members = list(layout_rng.permutation(np.flatnonzero(owner == region)))
+            capital = city_index.get(REGIONAL_CAPITALS[slug])
+            if capital is not None:
+                if capital in members:
+                    members.remove(capital)
+                members.insert(0, capital)
+            if not members:
+                members = [layout_rng.integers(len(cities))]
+            weights = 1.0 / np.arange(1, len(members) + 1) ** 1.1
+            self.region_cities.append(np.asarray(members, dtype=np.int64))
+            self.region_city_weights.append(np.cumsum(weights / weights.sum()))
+
+        # Per-city price level around its region's
+        self.city_levels = layout_rng.normal(0.0, 0.12, size=len(cities))
+
+    def block(self, index, n_rows=BLOCK_ROWS):
+        """
+        Generate block number index, truncated to its first n_rows rows.
+        """
+        rng = np.random.default_rng([self.seed, index])
+        regions = rng.choice(len(self.region_slugs), size=BLOCK_ROWS, p=self.region_weights)
+
+        cities = np.empty(BLOCK_ROWS, dtype=np.int64)
+        draws = rng.random(BLOCK_ROWS)
+        for region in np.unique(regions):
+            rows = regions == region
+            ranks = np.searchsorted(self.region_city_weights[region], draws[rows], side='right')
+            members = self.region_cities[region]
+            cities[rows] = members[np.minimum(ranks, len(members) - 1)]
+
+        area = np.clip(np.round(rng.lognormal(np.log(75), 0.45, BLOCK_ROWS)), 15, 600).astype(np.int32)
+        bathrooms = np.clip(1 + rng.poisson(np.maximum(area / 90.0 - 0.4, 0.05)), 1, 5).astype(np.int8)
+        total_floors = np.clip(rng.geometric(0.22, BLOCK_ROWS), 1, 20).astype(np.int16)
+        floor = np.floor(rng.random(BLOCK_ROWS) * (total_floors + 1)).astype(np.int16)
+        parking_spaces = rng.choice(3, size=BLOCK_ROWS, p=[0.7, 0.25, 0.05]).astype(np.int8)
+
+        amenity_draws = rng.random((BLOCK_ROWS, len(AMENITY_RATES)))
+        amenities = {
+            name: (amenity_draws[:, i] < rate).astype(np.int8)
+            for i, (name, rate) in enumerate(AMENITY_RATES.items())
+        }
+
+        log_price = (
+            BASE_LOG_PRICE
+            + AREA_ELASTICITY * np.log(area / 70.0)
+            + self.region_levels[regions] + self.city_levels[cities]
+            + 0.04 * (bathrooms - 1) + 0.03 * parking_spaces
+            + sum(AMENITY_EFFECTS[name] * values for name, values in amenities.items())
+            + rng.normal(0.0, PRICE_NOISE, BLOCK_ROWS)
+        )
+        price = np.clip(np.round(np.exp(log_price)), 50, 50000)
+
+        # Some listings have one of those other slugs in the region column
+        slug_codes = np.searchsorted(self.slug_categories, np.asarray(self.region_slugs, dtype=object)[regions])
+        as_city_slug = rng.random(BLOCK_ROWS) < CITY_SLUG_SHARE
+        for region, slugs in enumerate(self.city_slugs.values()):
+            rows = np.flatnonzero(as_city_slug & (regions == region))
+            if slugs and len(rows):
+                choice = rng.integers(len(slugs), size=len(rows))
+                slug_codes[rows] = np.searchsorted(self.slug_categories, np.asarray(slugs, dtype=object)[choice])
+
+        listings = pd.DataFrame({
+            'region': pd.Categorical.from_codes(slug_codes, self.slug_categories),
+            'city': pd.Categorical.from_codes(cities, self.city_categories),
+            'price': price,
+            'area': area,
+            'bathrooms': bathrooms,
+            'floor': floor,
+            'total_floors': total_floors,
+            'parking_spaces': parking_spaces,
+        })
+        for name, values in amenities.items():
+            listings[name] = values
+        return listings.iloc[:n_rows]
+
+    def chunks(self, n_rows, chunk_rows=1000000):
+        """
+        Yield the first n_rows listings as DataFrames of about chunk_rows rows.
+        """
+        blocks_per_chunk = max(1, chunk_rows // BLOCK_ROWS)
+        n_blocks = -(-n_rows // BLOCK_ROWS)
+        for first in range(0, n_blocks, blocks_per_chunk):
+            frames = []
+            for index in range(first, min(first + blocks_per_chunk, n_blocks)):
+                frames.append(self.block(index, min(BLOCK_ROWS, n_rows - index * BLOCK_ROWS)))
+            chunk = pd.concat(frames, ignore_index=True)
+            chunk.index += first * BLOCK_ROWS
+            yield chunk
+
+    def listings(self, n_rows):
+        """
+        Return the first n_rows listings as one DataFrame.
+        """
+        return pd.concat(self.chunks(n_rows), ignore_index=True)
+
+def load_city_vocabulary(path=CITY_VOCABULARY_PATH, fallback_size=3000):
+    """
+    Return the model's city vocabulary, or generated names if the bundle is absent.
+    """
+    if os.path.exists(path):
+        return np.load(path, allow_pickle=False).astype(object)
+    return np.array([f'Comune {i:04d}' for i in range(fallback_size)], dtype=object)
+
+def generate_listings(n_rows, seed=0):
+    """
+    Return n_rows synthetic listings in the processed CSV schema.
+    """
+    return ListingsGenerator(seed).listings(n_rows)
+
+def model_features(listings):
+    """
+    Add the model features the predictor expects (region_standardized,
+    log_area, floor_to_height_ratio) to a frame of synthetic listings.
+    """
+    from rental_store import standardize_regions
+    from score import derive_features
+
+    return derive_features(standardize_regions(listings.copy()))
+
+def write_listings(path, n_rows, seed=0, chunk_rows=1000000):
+    """
+    Write n_rows listings to a CSV or Parquet file, one chunk at a time.
+    """
+    generator = ListingsGenerator(seed)
+    temporary_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in generator.chunks(n_rows, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(temporary_path, table.schema)
+            writer.write_table(table)
+        writer.close()
+    else:
+        for i, chunk in enumerate(generator.chunks(n_rows, chunk_rows)):
+            chunk.to_csv(temporary_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    os.replace(temporary_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write seeded synthetic rental listings.")
+    parser.add_argument('output', help="Output .csv or .parquet path")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_listings(args.output, args.rows, args.seed, args.chunk_rows)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {args.rows} listings to {args.output} in {elapsed:.1f}s "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Shared fixtures. The app modules import each other by bare name, so app/ and
+benchmarks/ go on the path the way the benchmarks put them there.
+"""
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, os.path.join(project_root, 'app'))
+sys.path.insert(0, os.path.join(project_root, 'benchmarks'))
+
+MODELS_DIR = os.path.join(project_root, 'models')
+BUNDLE_PATH = os.path.join(MODELS_DIR, 'bundle')
+
+@pytest.fixture(scope='session')
+def predictor():
+    from prediction import RentalPricePredictor
+
+    return RentalPricePredictor(BUNDLE_PATH)
+
+@pytest.fixture(scope='session')
+def raw_listings():
+    """
+    Synthetic listings in the raw CSV schema: region slugs, no derived features.
+    """
+    from synthetic import ListingsGenerator
+
+    return ListingsGenerator(seed=7).listings(3000)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from drift import DriftMonitor, build_profile
+from train import amenity_flags, prepare_chunk
+
+def profile_sample(listings, keep_amenities=True):
+    # The sample score_held_out and `python -m app.drift profile` build
+    features, log_prices = prepare_chunk(listings.copy())
+    if keep_amenities:
+        features = features.assign(**amenity_flags(listings))
+    return features[np.isfinite(log_prices)].reset_index(drop=True)
+
+def test_trainer_sample_profile_has_no_single_bin_feature(predictor, raw_listings):
+    sample = profile_sample(raw_listings)
+    assert sample['luxury_score'].nunique() > 1
+
+    profile = build_profile(predictor, sample)
+
+    assert profile.single_bin_features() == []
+
+def test_profile_without_amenities_collapses_luxury_score(predictor, raw_listings):
+    profile = build_profile(predictor, profile_sample(raw_listings, keep_amenities=False))
+
+    assert profile.single_bin_features() == ['luxury_score']
+
+def test_record_and_batch_paths_count_the_same_bins(predictor, raw_listings):
+    sample = profile_sample(raw_listings)
+    profile = build_profile(predictor, sample)
+    predictions = predictor.predict_batch(sample)
+
+    single, batched = DriftMonitor(profile), DriftMonitor(profile)
+    for record, prediction in zip(sample.to_dict('records'), predictions):
+        single.observe(record, prediction)
+    batched.observe_batch(sample, predictions)
+
+    assert single.snapshot()['counts'] == batched.snapshot()['counts']
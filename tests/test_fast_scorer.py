@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from conftest import BUNDLE_PATH, MODELS_DIR
+from prediction import RentalPricePredictor, load_pickled_predictor
+
+FULL_LISTING = {
+    'log_area': np.log(85), 'bathrooms': 2, 'floor_to_height_ratio': 0.5,
+    'total_floors': 6, 'parking_spaces': 1,
+    'has_elevator': 1, 'has_doorman': 0, 'has_balcony': 1,
+    'has_external_exposure': 1, 'has_furnished': 0,
+    'has_terrace': 1, 'has_garden': 0, 'has_air_conditioning': 1,
+    'has_storage_room': 1, 'has_cellar': 0,
+    'region_standardized': 'Lombardia', 'city': 'Milano',
+}
+PARTIAL_LISTING = {'log_area': np.log(60), 'bathrooms': 1, 'region_standardized': 'Lazio'}
+NO_AMENITIES_LISTING = {
+    **FULL_LISTING,
+    'has_terrace': 0, 'has_garden': 0, 'has_air_conditioning': 0,
+    'has_storage_room': 0, 'has_cellar': 0,
+}
+LISTINGS = [FULL_LISTING, PARTIAL_LISTING, NO_AMENITIES_LISTING]
+
+@pytest.fixture(scope='module')
+def fast_predictor():
+    return RentalPricePredictor(BUNDLE_PATH, use_fast_scorer=True)
+
+@pytest.fixture(scope='module')
+def pickled_predictor():
+    return load_pickled_predictor(MODELS_DIR, monitor_drift=False)
+
+@pytest.mark.parametrize('listing', LISTINGS)
+def test_fast_predict_matches_pipeline_predict(predictor, fast_predictor, pickled_predictor, listing):
+    price = fast_predictor.predict(listing)
+
+    assert price == pytest.approx(predictor.predict(listing), rel=1e-6)
+    assert price == pytest.approx(pickled_predictor.predict(listing), rel=1e-6)
+
+def test_fast_predict_batch_matches_pipeline_predict_batch(predictor, fast_predictor):
+    np.testing.assert_allclose(
+        fast_predictor.predict_batch(LISTINGS), predictor.predict_batch(LISTINGS), rtol=1e-6
+    )
+
+@pytest.mark.parametrize('listing', LISTINGS)
+def test_fast_explain_matches_pipeline_explain(predictor, fast_predictor, listing):
+    expected = predictor.explain(listing)
+    explanation = fast_predictor.explain(listing)
+
+    assert explanation.keys() == expected.keys()
+    np.testing.assert_allclose(list(explanation.values()), list(expected.values()), rtol=1e-5, atol=1e-6)
+
+def test_transform_returns_a_row_of_its_own(fast_predictor):
+    row = fast_predictor.fast_scorer.transform(FULL_LISTING)
+    expected = row.copy()
+    fast_predictor.fast_scorer.transform(PARTIAL_LISTING)
+    fast_predictor.predict(PARTIAL_LISTING)
+
+    np.testing.assert_array_equal(row, expected)
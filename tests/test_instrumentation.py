@@ -0,0 +1,34 @@
+import threading
+
+from instrumentation import SamplingProfiler
+
+def counts(collapsed):
+    return [int(line.rsplit(' ', 1)[1]) for line in collapsed.splitlines() if line]
+
+def recurse(depth):
+    return 0 if depth == 0 else recurse(depth - 1) + 1
+
+def test_collapsed_while_sampling():
+    profiler = SamplingProfiler(interval=0.0001)
+    done = threading.Event()
+
+    def work():
+        # Varying depths keep adding new stacks to the counter
+        depth = 0
+        while not done.is_set():
+            recurse(depth % 60)
+            depth += 1
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    profiler.start()
+    try:
+        for _ in range(200):
+            counts(profiler.collapsed())
+    finally:
+        profiler.stop()
+        done.set()
+        worker.join()
+
+    assert profiler.samples > 0
+    assert sum(counts(profiler.collapsed())) == sum(profiler.stacks.values())
@@ -0,0 +1,55 @@
+import json
+import shutil
+
+import pytest
+
+from conftest import MODELS_DIR
+from model_registry import load_registry
+
+LISTING = {'log_area': 4.4, 'bathrooms': 1, 'region_standardized': 'Lazio', 'city': 'Roma'}
+
+@pytest.fixture
+def models_dir(tmp_path):
+    target = tmp_path / 'models'
+    shutil.copytree(MODELS_DIR, target)
+    return target
+
+def test_corrupt_bundle_falls_back_to_the_pickles(models_dir):
+    with open(models_dir / 'bundle' / 'booster.ubj', 'r+b') as f:
+        f.seek(100)
+        f.write(b'XXXX')
+
+    registry = load_registry(str(models_dir), poll_interval=None)
+    model = registry.get()
+
+    assert model.name == 'pickle'
+    assert model.predictor.preprocessor_path is not None
+    assert model.predictor.predict(LISTING) > 0
+
+@pytest.mark.parametrize('routing', [
+    ['bundle'],
+    'bundle',
+    None,
+    {'default': ['bundle'], 'weights': 'bundle'},
+    {'weights': {'bundle': 'heavy'}},
+    {'weights': {'bundle': None}},
+    {'weights': {'bundle': True}},
+    {'weights': {'bundle': float('nan')}},
+])
+def test_invalid_routing_is_ignored(models_dir, routing):
+    with open(models_dir / 'routing.json', 'w', encoding='utf-8') as f:
+        json.dump(routing, f)
+
+    registry = load_registry(str(models_dir), poll_interval=None)
+
+    assert registry.describe()['default'] == 'bundle'
+    assert registry.describe()['weights'] == {}
+    assert registry.route('user-1').name == 'bundle'
+
+def test_valid_routing_weights_are_kept(models_dir):
+    with open(models_dir / 'routing.json', 'w', encoding='utf-8') as f:
+        json.dump({'default': 'bundle', 'weights': {'bundle': 1, 'missing': 0.5}}, f)
+
+    registry = load_registry(str(models_dir), poll_interval=None)
+
+    assert registry.describe()['weights'] == {'bundle': 1.0}
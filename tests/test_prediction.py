@@ -0,0 +1,11 @@
+import pytest
+
+@pytest.mark.parametrize('listing', [{'log_area': 'x'}, {'bathrooms': 'abc'}])
+def test_explain_rejects_invalid_values_with_value_error(predictor, listing):
+    with pytest.raises(ValueError, match='Invalid listing features'):
+        predictor.explain(listing)
+
+@pytest.mark.parametrize('listing', [{'log_area': 'x'}, {'bathrooms': 'abc'}])
+def test_explain_batch_rejects_invalid_values_with_value_error(predictor, listing):
+    with pytest.raises(ValueError, match='Invalid listing features'):
+        predictor.explain_batch([{'area': 80}, listing])
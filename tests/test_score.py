@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from conftest import MODELS_DIR
+from prediction import load_default_predictor
+from rental_store import standardize_regions
+from score import derive_features, score_file
+
+def test_derive_features_maps_region_slugs(raw_listings):
+    derived = derive_features(raw_listings.copy())
+    expected = standardize_regions(raw_listings.copy())
+
+    assert derived['region_standardized'].notna().all()
+    pd.testing.assert_series_equal(
+        derived['region_standardized'].astype(object), expected['region_standardized'].astype(object)
+    )
+
+def test_score_file_matches_predict_batch_on_standardized_rows(raw_listings, tmp_path):
+    input_path, output_path = tmp_path / 'listings.csv', tmp_path / 'scored.csv'
+    raw_listings.to_csv(input_path, index=False)
+
+    rows = score_file(str(input_path), str(output_path), MODELS_DIR, chunk_size=1000, workers=1)
+    scored = pd.read_csv(output_path)
+
+    predictor = load_default_predictor(MODELS_DIR)
+    standardized = derive_features(standardize_regions(pd.read_csv(input_path)))
+    prices, lower_bounds, upper_bounds = predictor.predict_batch_with_confidence(standardized)
+
+    assert rows == len(raw_listings)
+    np.testing.assert_allclose(scored['predicted_price'], prices, rtol=1e-6)
+    np.testing.assert_allclose(scored['lower_bound'], lower_bounds, rtol=1e-6)
+    np.testing.assert_allclose(scored['upper_bound'], upper_bounds, rtol=1e-6)
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import pytest
+
+from comparables import ComparablesIndex
+from model_registry import ModelRegistry
+from rental_store import standardize_regions
+from service import create_app
+
+def call(app, method, path, body=None):
+    """
+    Send one HTTP request through the ASGI app and return the status and JSON body.
+    """
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': json.dumps(body).encode('utf-8') if body is not None else b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app({'type': 'http', 'method': method, 'path': path, 'query_string': b''}, receive, send))
+    return messages[0]['status'], json.loads(messages[1]['body'])
+
+@pytest.fixture(scope='module')
+def app(predictor, raw_listings):
+    app = create_app(registry=ModelRegistry.from_predictor(predictor))
+    app._comparables = ComparablesIndex.from_listings(standardize_regions(raw_listings.copy()))
+    return app
+
+def test_comparables_of_a_valid_listing(app, raw_listings):
+    region = standardize_regions(raw_listings.copy())['region_standardized'].dropna().iloc[0]
+    status, response = call(app, 'POST', '/comparables', {'listing': {'area': 80, 'region_standardized': region}, 'k': 3})
+
+    assert status == 200
+    assert len(response['comparables']) == 3
+
+@pytest.mark.parametrize('listing', [{'area': 'x'}, {'bathrooms': 'abc'}, {'area': [80]}, {'log_area': {}}])
+def test_comparables_answer_invalid_values_with_400(app, listing):
+    status, response = call(app, 'POST', '/comparables', {'listing': listing})
+
+    assert status == 400
+    assert response == {'error': 'Invalid listing features'}